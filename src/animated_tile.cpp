@@ -14,6 +14,10 @@
 #include "viewport_func.h"
 #include "framerate_type.h"
 
+#ifdef WITH_PYTHON
+#include "python/call_py.hpp"
+#endif
+
 #include "safeguards.h"
 
 /** The table/list with animated tiles. */
@@ -75,6 +79,9 @@ void AddAnimatedTile(TileIndex tile, bool mark_dirty)
 void AnimateAnimatedTiles()
 {
 	PerformanceAccumulator landscape_framerate(PFE_GL_LANDSCAPE);
+#ifdef WITH_PYTHON
+	PyTTD::DirtyPause dirty_pause;
+#endif
 
 	for (auto it = std::begin(_animated_tiles); it != std::end(_animated_tiles); /* nothing */) {
 		TileIndex &tile = *it;
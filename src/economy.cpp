@@ -59,6 +59,10 @@
 #include "table/strings.h"
 #include "table/pricebase.h"
 
+#ifdef WITH_PYTHON
+#include "python/call_py.hpp"
+#endif
+
 #include "safeguards.h"
 
 
@@ -556,6 +560,9 @@ void ChangeOwnershipOfCompanyItems(Owner old_owner, Owner new_owner)
 	cur_company.Restore();
 
 	MarkWholeScreenDirty();
+#ifdef WITH_PYTHON
+	PyTTD::MarkWholeMapChanged();
+#endif
 }
 
 /**
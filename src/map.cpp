@@ -15,6 +15,10 @@
 #include "string_func.h"
 #include "pathfinder/water_regions.h"
 
+#ifdef WITH_PYTHON
+#include "python/call_py.hpp"
+#endif
+
 #include "safeguards.h"
 
 /* static */ uint Map::log_x;     ///< 2^_map_log_x == _map_size_x
@@ -60,6 +64,11 @@
 	Tile::extended_tiles = CallocT<Tile::TileExtended>(Map::size);
 
 	AllocateWaterRegions();
+
+#ifdef WITH_PYTHON
+	/* A new game, or a loaded one: everything changed. */
+	PyTTD::MarkWholeMapChanged();
+#endif
 }
 
 
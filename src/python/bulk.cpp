@@ -0,0 +1,427 @@
+/*
+ * This file is part of OpenTTD.
+ * OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+ * OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include <nanobind/nanobind.h>
+#include <nanobind/stl/string.h>
+#include <nanobind/stl/vector.h>
+
+#include <algorithm>
+#include <array>
+#include <cstring>
+#include <memory>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+#include "python/bulk.hpp"
+#include "python/wrap.hpp"
+#include "python/call_py.hpp"
+
+#include "map_func.h"
+#include "tile_map.h"
+#include "road_map.h"
+#include "settings_type.h"
+#include "script/api/script_tile.hpp"
+#include "script/api/script_road.hpp"
+#include "script/api/script_rail.hpp"
+#include "script/api/script_bridge.hpp"
+#include "script/api/script_tunnel.hpp"
+#include "script/api/script_marine.hpp"
+
+namespace PyTTD {
+	Buffer::Buffer(py::handle obj, bool writable)
+	{
+		int flags = PyBUF_C_CONTIGUOUS;
+		if (writable)
+			flags |= PyBUF_WRITABLE;
+		if (PyObject_GetBuffer(obj.ptr(), &view, flags) != 0)
+			throw py::python_error();
+	}
+
+	Buffer::~Buffer()
+	{
+		PyBuffer_Release(&view);
+	}
+
+	/**
+	 * A tile property that can be read in bulk.
+	 *
+	 * The names match the properties of openttd.tile.Tile, the types are
+	 * NumPy type strings.
+	 */
+	struct TileColumn {
+		const char *name;
+		const char *dtype;
+		size_t size;
+		// read a list of tiles
+		void (*fill)(const uint32_t *tiles, size_t n, uint8_t *out);
+		// read a consecutive range of tiles
+		void (*fill_range)(uint32_t first, size_t n, uint8_t *out);
+	};
+
+	template <typename T, auto F>
+	static void FillColumn(const uint32_t *tiles, size_t n, uint8_t *out)
+	{
+		T *o = reinterpret_cast<T *>(out);
+		for (size_t i = 0; i < n; i++)
+			o[i] = static_cast<T>(F(TileIndex(tiles[i])));
+	}
+
+	template <typename T, auto F>
+	static void FillRange(uint32_t first, size_t n, uint8_t *out)
+	{
+		T *o = reinterpret_cast<T *>(out);
+		for (size_t i = 0; i < n; i++)
+			o[i] = static_cast<T>(F(TileIndex(first + i)));
+	}
+
+	// Map layers that don't have a script API equivalent
+
+	static uint8_t GetTileTypeLayer(TileIndex tile)
+	{
+		return ::GetTileType(tile);
+	}
+
+	// Road bits in the lower half, tram bits in the upper half.
+	static uint8_t GetRoadBitsLayer(TileIndex tile)
+	{
+		return ::GetAnyRoadBits(tile, RTT_ROAD) | (::GetAnyRoadBits(tile, RTT_TRAM) << 4);
+	}
+
+	// Bit 0: water, 1: sea, 2: river, 3: canal, 4: coast.
+	static uint8_t GetWaterLayer(TileIndex tile)
+	{
+		return (ScriptTile::IsWaterTile(tile) ? 1 : 0)
+			| (ScriptTile::IsSeaTile(tile) ? 2 : 0)
+			| (ScriptTile::IsRiverTile(tile) ? 4 : 0)
+			| (ScriptMarine::IsCanalTile(tile) ? 8 : 0)
+			| (ScriptTile::IsCoastTile(tile) ? 16 : 0);
+	}
+
+#define COL(name, T, dtype, F) { name, dtype, sizeof(T), &FillColumn<T, &F>, &FillRange<T, &F> }
+
+	static const TileColumn tile_columns[] = {
+		COL("is_buildable", uint8_t, "?", ScriptTile::IsBuildable),
+		COL("is_sea", uint8_t, "?", ScriptTile::IsSeaTile),
+		COL("is_river", uint8_t, "?", ScriptTile::IsRiverTile),
+		COL("is_water", uint8_t, "?", ScriptTile::IsWaterTile),
+		COL("is_coast", uint8_t, "?", ScriptTile::IsCoastTile),
+		COL("is_station", uint8_t, "?", ScriptTile::IsStationTile),
+		COL("has_tree", uint8_t, "?", ScriptTile::HasTreeOnTile),
+		COL("is_farm", uint8_t, "?", ScriptTile::IsFarmTile),
+		COL("has_rock", uint8_t, "?", ScriptTile::IsRockTile),
+		COL("is_rough", uint8_t, "?", ScriptTile::IsRoughTile),
+		COL("in_snow", uint8_t, "?", ScriptTile::IsSnowTile),
+		COL("in_desert", uint8_t, "?", ScriptTile::IsDesertTile),
+		COL("terrain", uint8_t, "u1", ScriptTile::GetTerrainType),
+		COL("slope", uint8_t, "u1", ScriptTile::GetSlope),
+		COL("min_height", uint8_t, "u1", ScriptTile::GetMinHeight),
+		COL("max_height", uint8_t, "u1", ScriptTile::GetMaxHeight),
+		COL("owner", int16_t, "i2", ScriptTile::GetOwner),
+		COL("authority_town", uint16_t, "u2", ScriptTile::GetTownAuthority),
+		COL("closest_town", uint16_t, "u2", ScriptTile::GetClosestTown),
+
+		COL("is_road", uint8_t, "?", ScriptRoad::IsRoadTile),
+		COL("is_road_depot", uint8_t, "?", ScriptRoad::IsRoadDepotTile),
+		COL("is_road_station", uint8_t, "?", ScriptRoad::IsRoadStationTile),
+		COL("is_drivethru_road_station", uint8_t, "?", ScriptRoad::IsDriveThroughRoadStationTile),
+		COL("count_adjacent_roads", uint8_t, "u1", ScriptRoad::GetNeighbourRoadCount),
+
+		COL("is_rail", uint8_t, "?", ScriptRail::IsRailTile),
+		COL("has_bridge", uint8_t, "?", ScriptBridge::IsBridgeTile),
+		COL("has_tunnel", uint8_t, "?", ScriptTunnel::IsTunnelTile),
+
+		COL("tile_type", uint8_t, "u1", GetTileTypeLayer),
+		COL("road_bits", uint8_t, "u1", GetRoadBitsLayer),
+		COL("water", uint8_t, "u1", GetWaterLayer),
+	};
+
+#undef COL
+
+	static const TileColumn &find_column(const std::string &name)
+	{
+		for (auto &col : tile_columns) {
+			if (name == col.name)
+				return col;
+		}
+		throw std::invalid_argument(fmt::format("Unknown tile property: {}", name));
+	}
+
+	/**
+	 * Read a couple of properties of many tiles at once.
+	 *
+	 * @param tiles A buffer of uint32 tile indices.
+	 * @param names The properties to read.
+	 * @return a list with one bytes object per property.
+	 */
+	static py::list query_tiles(py::handle tiles, const std::vector<std::string> &names)
+	{
+		Buffer buf(tiles);
+		if (buf.size() % sizeof(uint32_t))
+			throw std::invalid_argument("The tile buffer must contain uint32 values");
+		const uint32_t *idx = static_cast<const uint32_t *>(buf.data());
+		size_t n = buf.size() / sizeof(uint32_t);
+
+		uint32_t size = Map::Size();
+		for (size_t i = 0; i < n; i++) {
+			if (idx[i] >= size)
+				throw std::domain_error(fmt::format("Tile {} is out of bounds", idx[i]));
+		}
+
+		std::vector<const TileColumn *> cols;
+		for (auto &name : names)
+			cols.push_back(&find_column(name));
+		std::vector<std::vector<uint8_t>> data(cols.size());
+		for (size_t c = 0; c < cols.size(); c++)
+			data[c].resize(n * cols[c]->size);
+
+		_WRAP1_NEW
+		for (size_t c = 0; c < cols.size(); c++)
+			cols[c]->fill(idx, n, data[c].data());
+		_WRAP2_NEW
+
+		py::list res;
+		for (auto &d : data)
+			res.append(py::bytes(reinterpret_cast<const char *>(d.data()), d.size()));
+		return res;
+	}
+
+	/**
+	 * Copy a rectangle of some map layers to a set of buffers.
+	 *
+	 * Each buffer holds a whole layer, in tile index order.
+	 *
+	 * @param names The properties to read.
+	 * @param layers One writable buffer per property.
+	 */
+	static void fill_map(const std::vector<std::string> &names, py::list layers, uint32_t x, uint32_t y, uint32_t w, uint32_t h)
+	{
+		if (names.size() != layers.size())
+			throw std::invalid_argument("Need one buffer per layer");
+		if (uint64_t(x) + w > Map::SizeX() || uint64_t(y) + h > Map::SizeY())
+			throw std::domain_error("Rectangle is out of bounds");
+
+		std::vector<const TileColumn *> cols;
+		std::vector<std::unique_ptr<Buffer>> bufs;
+		for (size_t c = 0; c < names.size(); c++) {
+			auto col = &find_column(names[c]);
+			auto buf = std::make_unique<Buffer>(layers[c], true);
+			if (buf->size() != Map::Size() * col->size)
+				throw std::invalid_argument(fmt::format("Buffer for {} has the wrong size", names[c]));
+			cols.push_back(col);
+			bufs.push_back(std::move(buf));
+		}
+
+		_WRAP1_NEW
+		for (uint32_t row = y; row < y + h; row++) {
+			uint32_t first = TileXY(x, row).base();
+			for (size_t c = 0; c < cols.size(); c++)
+				cols[c]->fill_range(first, w, static_cast<uint8_t *>(bufs[c]->data()) + first * cols[c]->size);
+		}
+		_WRAP2_NEW
+	}
+
+	/*
+	 * Dirty map tracking.
+	 *
+	 * The map is split into blocks of 2^DIRTY_SHIFT tiles square. Every
+	 * tile the game marks dirty (for redrawing) marks its block, except
+	 * while tiles are animated. Changes that are not tied to a tile (town
+	 * founded, company merged, a new or loaded map) mark some or all
+	 * blocks. Redrawing the whole screen doesn't: that's cosmetic. Each
+	 * incremental snapshot owns one bit in the block flags.
+	 *
+	 * Redrawing is a superset of map changes, so refresh_dirty compares
+	 * the data and only reports the areas that actually changed.
+	 *
+	 * All of this is accessed with the game lock held.
+	 */
+	static constexpr uint DIRTY_SHIFT = 4;
+	static constexpr uint DIRTY_SLOTS = 8;
+
+	uint8_t dirty_mask = 0;
+	static std::vector<uint8_t> dirty_blocks;
+	static uint32_t dirty_blocks_x = 0;
+
+	void MarkDirty(TileIndex tile)
+	{
+		size_t idx = (TileY(tile) >> DIRTY_SHIFT) * dirty_blocks_x + (TileX(tile) >> DIRTY_SHIFT);
+		if (idx < dirty_blocks.size())
+			dirty_blocks[idx] |= dirty_mask;
+	}
+
+	void MarkTownDirty(TileIndex xy)
+	{
+		if (dirty_blocks_x == 0)
+			return;
+		uint r = _settings_game.economy.dist_local_authority;
+		uint32_t by_max = dirty_blocks.size() / dirty_blocks_x;
+		uint32_t bx0 = (TileX(xy) > r ? TileX(xy) - r : 0) >> DIRTY_SHIFT;
+		uint32_t by0 = (TileY(xy) > r ? TileY(xy) - r : 0) >> DIRTY_SHIFT;
+		uint32_t bx1 = std::min<uint32_t>((TileX(xy) + r) >> DIRTY_SHIFT, dirty_blocks_x - 1);
+		uint32_t by1 = std::min<uint32_t>((TileY(xy) + r) >> DIRTY_SHIFT, by_max - 1);
+		for (uint32_t by = by0; by <= by1; by++) {
+			for (uint32_t bx = bx0; bx <= bx1; bx++)
+				dirty_blocks[by * dirty_blocks_x + bx] |= dirty_mask;
+		}
+	}
+
+	void MarkAllDirty()
+	{
+		for (auto &b : dirty_blocks)
+			b |= dirty_mask;
+	}
+
+	// Adapt to the current map size
+	static void dirty_resize()
+	{
+		uint32_t bx = (Map::SizeX() + (1 << DIRTY_SHIFT) - 1) >> DIRTY_SHIFT;
+		uint32_t by = (Map::SizeY() + (1 << DIRTY_SHIFT) - 1) >> DIRTY_SHIFT;
+		if (bx == dirty_blocks_x && bx * by == dirty_blocks.size())
+			return;
+		// A new map: everything changed.
+		dirty_blocks_x = bx;
+		dirty_blocks.assign(bx * by, dirty_mask);
+	}
+
+	/**
+	 * Allocate a dirty-tracking slot.
+	 */
+	static uint dirty_register()
+	{
+		uint slot = DIRTY_SLOTS;
+
+		_WRAP1_NEW
+		for (uint i = 0; i < DIRTY_SLOTS; i++) {
+			if (!(dirty_mask & (1 << i))) {
+				slot = i;
+				break;
+			}
+		}
+		if (slot < DIRTY_SLOTS) {
+			dirty_resize();
+			for (auto &b : dirty_blocks)
+				b &= ~(1 << slot);
+			dirty_mask |= 1 << slot;
+		}
+		_WRAP2_NEW
+
+		if (slot == DIRTY_SLOTS)
+			throw std::runtime_error("Too many incremental map snapshots");
+		return slot;
+	}
+
+	static void dirty_unregister(uint slot)
+	{
+		if (slot >= DIRTY_SLOTS)
+			throw std::invalid_argument("Invalid dirty tracking slot");
+
+		_WRAP1_NEW
+		dirty_mask &= ~(1 << slot);
+		_WRAP2_NEW
+	}
+
+	/**
+	 * Re-read those parts of some map layers that changed since the last
+	 * call with this slot.
+	 *
+	 * @param slot The snapshot's tracking slot.
+	 * @param names The properties to read.
+	 * @param layers One writable buffer per property.
+	 * @return a list of (x, y, w, h) rectangles whose data changed.
+	 */
+	static py::list refresh_dirty(uint slot, const std::vector<std::string> &names, py::list layers)
+	{
+		if (slot >= DIRTY_SLOTS)
+			throw std::invalid_argument("Invalid dirty tracking slot");
+		if (names.size() != layers.size())
+			throw std::invalid_argument("Need one buffer per layer");
+
+		std::vector<const TileColumn *> cols;
+		std::vector<std::unique_ptr<Buffer>> bufs;
+		for (size_t c = 0; c < names.size(); c++) {
+			auto col = &find_column(names[c]);
+			auto buf = std::make_unique<Buffer>(layers[c], true);
+			if (buf->size() != Map::Size() * col->size)
+				throw std::invalid_argument(fmt::format("Buffer for {} has the wrong size", names[c]));
+			cols.push_back(col);
+			bufs.push_back(std::move(buf));
+		}
+
+		// x, y, w, h in tiles
+		std::vector<std::array<uint32_t, 4>> rects;
+		uint8_t bit = 1 << slot;
+
+		std::vector<uint8_t> tmp;
+
+		_WRAP1_NEW
+		dirty_resize();
+		uint32_t bs = 1 << DIRTY_SHIFT;
+		for (size_t start = 0; start < dirty_blocks.size(); start++) {
+			if (!(dirty_blocks[start] & bit))
+				continue;
+
+			// Merge horizontal runs of dirty blocks.
+			uint32_t bx = start % dirty_blocks_x;
+			size_t row_end = start - bx + dirty_blocks_x;
+			size_t end = start;
+			while (end < row_end && (dirty_blocks[end] & bit)) {
+				dirty_blocks[end] &= ~bit;
+				end++;
+			}
+			uint32_t x = bx << DIRTY_SHIFT;
+			uint32_t y = (start / dirty_blocks_x) << DIRTY_SHIFT;
+			uint32_t w = std::min<uint32_t>((end - start) << DIRTY_SHIFT, Map::SizeX() - x);
+			uint32_t h = std::min<uint32_t>(bs, Map::SizeY() - y);
+			start = end - 1;
+
+			bool changed = false;
+			for (uint32_t row = y; row < y + h; row++) {
+				uint32_t first = TileXY(x, row).base();
+				for (size_t c = 0; c < cols.size(); c++) {
+					size_t n = w * cols[c]->size;
+					uint8_t *out = static_cast<uint8_t *>(bufs[c]->data()) + first * cols[c]->size;
+					tmp.resize(n);
+					cols[c]->fill_range(first, w, tmp.data());
+					if (std::memcmp(out, tmp.data(), n) != 0) {
+						std::memcpy(out, tmp.data(), n);
+						changed = true;
+					}
+				}
+			}
+			if (changed)
+				rects.push_back({x, y, w, h});
+		}
+		_WRAP2_NEW
+
+		py::list res;
+		for (auto &r : rects)
+			res.append(py::make_tuple(r[0], r[1], r[2], r[3]));
+		return res;
+	}
+
+	void init_ttd_bulk(py::module_ &mg)
+	{
+		auto m = mg.def_submodule("bulk", "Bulk access to game data");
+
+		py::dict columns;
+		for (auto &col : tile_columns)
+			columns[col.name] = col.dtype;
+		m.attr("tile_columns") = columns;
+
+		m.def("query_tiles", &query_tiles, py::arg("tiles"), py::arg("names"),
+				"Read some properties of many tiles, under a single game lock");
+		m.def("fill_map", &fill_map, py::arg("names"), py::arg("layers"),
+				py::arg("x"), py::arg("y"), py::arg("w"), py::arg("h"),
+				"Copy a rectangle of some map layers to buffers, under a single game lock");
+
+		m.def("dirty_register", &dirty_register, "Start tracking changes to the map");
+		m.def("dirty_unregister", &dirty_unregister, py::arg("slot"), "Stop tracking changes to the map");
+		m.def("refresh_dirty", &refresh_dirty, py::arg("slot"), py::arg("names"), py::arg("layers"),
+				"Re-read the changed parts of some map layers, under a single game lock");
+	}
+}
@@ -0,0 +1,41 @@
+/*
+ * This file is part of OpenTTD.
+ * OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+ * OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+/** @file python/bulk.hpp Bulk queries that read many tiles under a single game lock. */
+
+#ifndef PY_BULK_H
+#define PY_BULK_H
+
+#include <nanobind/nanobind.h>
+
+namespace PyTTD {
+	namespace py = nanobind;
+
+	/**
+	 * RAII wrapper for a contiguous Python buffer.
+	 */
+	class Buffer {
+	public:
+		Buffer(py::handle obj, bool writable = false);
+		~Buffer();
+
+		// copy/move/assign is forbidden
+		Buffer(Buffer const&) = delete;
+		Buffer(Buffer &&) = delete;
+		Buffer& operator=(Buffer const&) = delete;
+
+		inline void *data() const { return view.buf; }
+		inline size_t size() const { return view.len; }
+
+	private:
+		Py_buffer view;
+	};
+
+	void init_ttd_bulk(py::module_ &m);
+}
+
+#endif /* PY_BULK_H */
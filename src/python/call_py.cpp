@@ -10,6 +10,7 @@
 #include "command_type.h"
 #include "framerate_type.h"
 #include "python/call_py.hpp"
+#include "python/msg_command.hpp"
 #include "python/queues.hpp"
 #include "python/task.hpp"
 
@@ -83,20 +84,7 @@ namespace PyTTD {
 
 	bool CheckPending(Commands cmd, const CommandDataBuffer &data)
 	{
-		PerformanceMeasurer framerate(PFE_PYTHON);
-		nanobind::gil_scoped_acquire _acquire;
-		py::bytes buf{data.data(),data.size()};
-		try {
-			nanobind::module_ ttd = nanobind::module_::import_("_ttd");
-			py::object main = ttd.attr("_main");
-			return py::cast<bool>(main.attr("check_pending")(cmd, buf));
-		} catch (const std::exception &ex) {
-			std::cerr << typeid(ex).name() << std::endl;
-			std::cerr << "  what(): " << ex.what() << std::endl;
-
-			return false;
-		}
-		return false;
+		return Msg::CmdRelay::IsPending(cmd, data);
 	}
 
 }
@@ -12,6 +12,7 @@
 #include <string>
 #include "company_type.h"
 #include "command_type.h"
+#include "tile_type.h"
 
 
 namespace PyTTD {
@@ -39,6 +40,26 @@ namespace PyTTD {
 
 	bool CheckPending(Commands cmd, const CommandDataBuffer &data);
 	CommandCallbackData CcPython;
+
+	/* Track changed map areas for incremental map snapshots */
+	extern uint8_t dirty_mask;
+	void MarkDirty(TileIndex tile);
+	void MarkTownDirty(TileIndex xy);
+	void MarkAllDirty();
+	inline void MarkTileDirty(TileIndex tile) { if (dirty_mask) MarkDirty(tile); }
+	/* A town was founded or removed: the local authority of the tiles around it changes */
+	inline void MarkTownChanged(TileIndex xy) { if (dirty_mask) MarkTownDirty(xy); }
+	/* Changes that aren't tied to specific tiles: the owner after a merger, a new map */
+	inline void MarkWholeMapChanged() { if (dirty_mask) MarkAllDirty(); }
+
+	/* Tile animation only changes graphics, which no map layer covers */
+	class DirtyPause {
+	public:
+		DirtyPause() : mask(dirty_mask) { dirty_mask = 0; }
+		~DirtyPause() { dirty_mask = mask; }
+	private:
+		uint8_t mask;
+	};
 }
 
 #endif
@@ -44,8 +44,52 @@ private_re = re.compile(r'^\s*private')
 protected_re = re.compile(r'^\s*protected')
 
 upcase_re = re.compile("[A-Z0-9]+")
+getter_re = re.compile("^(Get|Is|Has|Are|Can)[A-Z]")
+# Return types that aren't plain values.
+nonscalar_re = re.compile(r"[*&]|std::|Text")
+
+# Getters that may share the game lock with other readers (see
+# LockGameShared in wrap.hpp). They only read the map array or pool items.
+# Anything else might run NewGRF callbacks (whose resolver uses global
+# state), format strings, run a query command, or set the script's last
+# error in a precondition check; such getters take the lock exclusively.
+shared_getters = {
+    "ScriptTile": {
+        "IsSeaTile", "IsRiverTile", "IsWaterTile", "IsCoastTile", "IsStationTile",
+        "IsSteepSlope", "IsHalftileSlope", "HasTreeOnTile", "IsFarmTile",
+        "IsRockTile", "IsRoughTile", "IsSnowTile", "IsDesertTile",
+        "GetTerrainType", "GetSlope", "GetComplementSlope",
+        "GetMinHeight", "GetMaxHeight", "GetCornerHeight", "GetOwner",
+        "GetDistanceManhattanToTile", "GetDistanceSquareToTile",
+        "GetTownAuthority", "GetClosestTown",
+    },
+    "ScriptRail": {
+        "IsRailTile", "IsLevelCrossingTile", "IsRailDepotTile",
+        "IsRailStationTile", "IsRailWaypointTile",
+    },
+    "ScriptBridge": {"IsBridgeTile", "GetBridgeID"},
+    "ScriptTunnel": {"IsTunnelTile", "GetOtherTunnelEnd"},
+    "ScriptMarine": {
+        "IsWaterDepotTile", "IsDockTile", "IsBuoyTile", "IsLockTile", "IsCanalTile",
+    },
+    "ScriptTown": {
+        "GetTownCount", "IsValidTown", "GetPopulation", "GetHouseCount",
+        "GetLocation", "GetDistanceManhattanToTile", "GetDistanceSquareToTile",
+        "IsWithinTownInfluence", "IsCity",
+    },
+    "ScriptIndustry": {
+        "GetIndustryCount", "IsValidIndustry", "GetIndustryID", "GetLocation",
+        "GetAmountOfStationsAround", "GetDistanceManhattanToTile",
+        "GetDistanceSquareToTile", "IsBuiltOnWater", "GetIndustryType",
+    },
+}
+
+# Classes whose static methods only read data that can't change while a
+# game is running. They are called without taking the game lock.
+const_classes = {"ScriptMap"}
 
 cls_def = None
+mod_name = None
 
 def strip_var(p: str) -> str:
     """removes the last word
@@ -189,9 +233,11 @@ for num_line,line in enumerate(api_file.read_text().split("\n")):
                         api_cls = "List"
                     if do_events:
                         print(f'{{ auto m = me.def_submodule("{api_cls}");')
+                        mod_name = "events"
 
                     else:
-                        print(f'void init_{(list_name or api_cls).lower()}([[maybe_unused]] py::module_ &m)')
+                        mod_name = (list_name or api_cls).lower()
+                        print(f'void init_{mod_name}([[maybe_unused]] py::module_ &m)')
                         print('{');
                     cls_def = f'    auto cls_{cls_name} = py::class_<{cls_name}, {cls_super}>(m, "{api_cls}");'
 
@@ -392,6 +438,8 @@ for num_line,line in enumerate(api_file.read_text().split("\n")):
                     print(f"// TODO {cls_name} {params}")
                 else:
                     print(f'    cls_{cls_name}.def(wrap_new([](){{ return new {cls_name} (); }}));');
+                    if cls_name == "ScriptList":
+                        print(f'    list_extras(cls_{cls_name});')
             continue
 
         if api_selected is None:
@@ -410,12 +458,30 @@ for num_line,line in enumerate(api_file.read_text().split("\n")):
                 continue
 
             if is_static:
-                print(f'    m.def("{to_snake(name)}", wrap {{ {cls_name}::{name} }});')
+                if typ is None or typ.strip() == "void":
+                    wrapper = "wrap"
+                elif cls_name in const_classes:
+                    wrapper = "wrap_const"
+                elif getter_re.match(name):
+                    if name in shared_getters.get(cls_name, ()):
+                        if nonscalar_re.search(typ):
+                            print(f"{cls_name}::{name} doesn't return a plain value, not shared.", file=sys.stderr)
+                            wrapper = "wrap_ro"
+                        else:
+                            wrapper = "wrap_shared"
+                    else:
+                        wrapper = "wrap_ro"
+                else:
+                    wrapper = "wrap"
+                if wrapper == "wrap_const":
+                    print(f'    m.def("{to_snake(name)}", {wrapper} {{ {cls_name}::{name} }});')
+                else:
+                    print(f'    m.def("{to_snake(name)}", {wrapper} {{ {cls_name}::{name}, "{mod_name}.{api_cls + "." if do_events else ""}{to_snake(name)}" }});')
             else:
                 if cls_def is not None:
                     print(cls_def)
                     cls_def = None
-                print(f'    cls_{cls_name}.def("{to_snake(name)}", wrap<decltype(&{cls_name}::{name})> {{& {cls_name}::{name} }});')
+                print(f'    cls_{cls_name}.def("{to_snake(name)}", wrap<decltype(&{cls_name}::{name})> {{& {cls_name}::{name}, "{mod_name}.{api_cls}.{to_snake(name)}" }});')
 
 if list_name is not None:
     print("}")
@@ -106,7 +106,8 @@ namespace PyTTD {
 	{
 		if (! Task::IsRunning())
 			return;
-		Task::Send(NewMsg<Msg::CmdResult>(cmd, result, data, result_data));
+		uint32_t seq = Msg::CmdRelay::TakePending(cmd, data);
+		Task::Send(NewMsg<Msg::CmdResult>(seq, cmd, result, data, result_data));
 	}
 
 	CommandCallbackData *Instance::GetDoCommandCallback()
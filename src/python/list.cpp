@@ -0,0 +1,247 @@
+/*
+ * This file is part of OpenTTD.
+ * OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+ * OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+#include <nanobind/nanobind.h>
+
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+#include "python/list.hpp"
+#include "python/wrap.hpp"
+
+#include "script/api/script_tile.hpp"
+#include "script/api/script_town.hpp"
+#include "script/api/script_industry.hpp"
+#include "script/api/script_station.hpp"
+#include "script/api/script_vehicle.hpp"
+
+namespace PyTTD {
+	// Copy the list to a buffer, in iteration order. The game must be locked.
+	static void list_copy(ScriptList &list, bool with_values, std::vector<int64_t> &data)
+	{
+		data.reserve(list.Count() * (with_values ? 2 : 1));
+		for (SQInteger item = list.Begin(); !list.IsEnd(); item = list.Next()) {
+			data.push_back(item);
+			if (with_values)
+				data.push_back(list.GetValue(item));
+		}
+	}
+
+	static py::bytes to_bytes(const std::vector<int64_t> &data)
+	{
+		return py::bytes(reinterpret_cast<const char *>(data.data()), data.size() * sizeof(int64_t));
+	}
+
+	/**
+	 * Read the whole list, in iteration order, under a single game lock.
+	 *
+	 * @param with_values also return the values.
+	 * @return a buffer of int64 items, or of (item, value) pairs.
+	 */
+	static py::bytes list_read(ScriptList &list, bool with_values)
+	{
+		std::vector<int64_t> data;
+
+		_WRAP1_NEW
+		list_copy(list, with_values, data);
+		_WRAP2_NEW
+
+		return to_bytes(data);
+	}
+
+	/**
+	 * A built-in valuator, i.e. a replacement for a Squirrel function
+	 * passed to ScriptList::Valuate.
+	 */
+	struct ListValuator {
+		const char *name;
+		size_t nargs;
+		SQInteger (*fn)(SQInteger item, const int64_t *args);
+	};
+
+	static inline TileIndex ArgTile(int64_t arg) { return TileIndex(static_cast<uint32_t>(arg)); }
+	static inline CargoID ArgCargo(int64_t arg) { return static_cast<CargoID>(arg); }
+
+	static const ListValuator list_valuators[] = {
+		{ "tile.distance_manhattan", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTile::GetDistanceManhattanToTile(ArgTile(i), ArgTile(a[0])); } },
+		{ "tile.distance_square", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTile::GetDistanceSquareToTile(ArgTile(i), ArgTile(a[0])); } },
+		{ "tile.is_buildable", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptTile::IsBuildable(ArgTile(i)); } },
+		{ "tile.slope", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptTile::GetSlope(ArgTile(i)); } },
+		{ "tile.min_height", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptTile::GetMinHeight(ArgTile(i)); } },
+		{ "tile.max_height", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptTile::GetMaxHeight(ArgTile(i)); } },
+		{ "tile.cargo_acceptance", 4, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTile::GetCargoAcceptance(ArgTile(i), ArgCargo(a[0]), a[1], a[2], a[3]); } },
+		{ "tile.cargo_production", 4, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTile::GetCargoProduction(ArgTile(i), ArgCargo(a[0]), a[1], a[2], a[3]); } },
+
+		{ "town.population", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptTown::GetPopulation(static_cast<TownID>(i)); } },
+		{ "town.house_count", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptTown::GetHouseCount(static_cast<TownID>(i)); } },
+		{ "town.distance_manhattan", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTown::GetDistanceManhattanToTile(static_cast<TownID>(i), ArgTile(a[0])); } },
+		{ "town.distance_square", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTown::GetDistanceSquareToTile(static_cast<TownID>(i), ArgTile(a[0])); } },
+		{ "town.last_month_production", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTown::GetLastMonthProduction(static_cast<TownID>(i), ArgCargo(a[0])); } },
+		{ "town.last_month_supplied", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTown::GetLastMonthSupplied(static_cast<TownID>(i), ArgCargo(a[0])); } },
+
+		{ "industry.distance_manhattan", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptIndustry::GetDistanceManhattanToTile(static_cast<IndustryID>(i), ArgTile(a[0])); } },
+		{ "industry.distance_square", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptIndustry::GetDistanceSquareToTile(static_cast<IndustryID>(i), ArgTile(a[0])); } },
+		{ "industry.last_month_production", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptIndustry::GetLastMonthProduction(static_cast<IndustryID>(i), ArgCargo(a[0])); } },
+		{ "industry.last_month_transported", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptIndustry::GetLastMonthTransported(static_cast<IndustryID>(i), ArgCargo(a[0])); } },
+
+		{ "station.distance_manhattan", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptStation::GetDistanceManhattanToTile(static_cast<StationID>(i), ArgTile(a[0])); } },
+		{ "station.distance_square", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptStation::GetDistanceSquareToTile(static_cast<StationID>(i), ArgTile(a[0])); } },
+		{ "station.cargo_waiting", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptStation::GetCargoWaiting(static_cast<StationID>(i), ArgCargo(a[0])); } },
+		{ "station.cargo_rating", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptStation::GetCargoRating(static_cast<StationID>(i), ArgCargo(a[0])); } },
+
+		{ "vehicle.age", 0, [](SQInteger i, const int64_t *) -> SQInteger { return ScriptVehicle::GetAge(static_cast<VehicleID>(i)); } },
+		{ "vehicle.profit_this_year", 0, [](SQInteger i, const int64_t *) -> SQInteger { return (int64_t)ScriptVehicle::GetProfitThisYear(static_cast<VehicleID>(i)); } },
+		{ "vehicle.profit_last_year", 0, [](SQInteger i, const int64_t *) -> SQInteger { return (int64_t)ScriptVehicle::GetProfitLastYear(static_cast<VehicleID>(i)); } },
+		{ "vehicle.distance_manhattan", 1, [](SQInteger i, const int64_t *a) -> SQInteger { return ScriptTile::GetDistanceManhattanToTile(ScriptVehicle::GetLocation(static_cast<VehicleID>(i)), ArgTile(a[0])); } },
+	};
+
+	/** One step of a list query. */
+	struct ListStep {
+		enum Op {
+			VALUATE,
+			SORT,
+			KEEP_ABOVE,
+			KEEP_BELOW,
+			KEEP_BETWEEN,
+			KEEP_VALUE,
+			REMOVE_VALUE,
+			KEEP_TOP,
+			KEEP_BOTTOM,
+		};
+		Op op;
+		const ListValuator *valuator = nullptr;
+		std::vector<int64_t> args;
+	};
+
+	static const struct {
+		const char *name;
+		ListStep::Op op;
+		size_t nargs;
+	} list_ops[] = {
+		{ "sort", ListStep::SORT, 2 },
+		{ "keep_above", ListStep::KEEP_ABOVE, 1 },
+		{ "keep_below", ListStep::KEEP_BELOW, 1 },
+		{ "keep_between", ListStep::KEEP_BETWEEN, 2 },
+		{ "keep_value", ListStep::KEEP_VALUE, 1 },
+		{ "remove_value", ListStep::REMOVE_VALUE, 1 },
+		{ "keep_top", ListStep::KEEP_TOP, 1 },
+		{ "keep_bottom", ListStep::KEEP_BOTTOM, 1 },
+	};
+
+	static ListStep parse_step(py::tuple step)
+	{
+		if (step.size() == 0)
+			throw std::invalid_argument("Empty list query step");
+
+		ListStep res;
+		auto name = py::cast<std::string>(step[0]);
+		size_t skip = 1;
+		size_t nargs = 0;
+
+		if (name == "valuate") {
+			if (step.size() < 2)
+				throw std::invalid_argument("'valuate' needs a valuator");
+			auto vname = py::cast<std::string>(step[1]);
+			for (auto &v : list_valuators) {
+				if (vname == v.name) {
+					res.valuator = &v;
+					break;
+				}
+			}
+			if (res.valuator == nullptr)
+				throw std::invalid_argument(fmt::format("Unknown valuator: {}", vname));
+			res.op = ListStep::VALUATE;
+			nargs = res.valuator->nargs;
+			skip = 2;
+		} else {
+			bool found = false;
+			for (auto &op : list_ops) {
+				if (name == op.name) {
+					res.op = op.op;
+					nargs = op.nargs;
+					found = true;
+					break;
+				}
+			}
+			if (!found)
+				throw std::invalid_argument(fmt::format("Unknown list query step: {}", name));
+		}
+
+		if (step.size() != skip + nargs)
+			throw std::invalid_argument(fmt::format("'{}' needs {} arguments", name, nargs));
+		for (size_t i = skip; i < step.size(); i++)
+			res.args.push_back(py::cast<int64_t>(py::int_(step[i])));
+		return res;
+	}
+
+	// Execute a step. The game must be locked.
+	static void run_step(ScriptList &list, const ListStep &step)
+	{
+		auto &a = step.args;
+		switch (step.op) {
+			case ListStep::VALUATE: {
+				std::vector<SQInteger> items;
+				items.reserve(list.items.size());
+				for (auto &it : list.items)
+					items.push_back(it.first);
+				for (auto item : items)
+					list.SetValue(item, step.valuator->fn(item, a.data()));
+				break;
+			}
+			case ListStep::SORT:
+				list.Sort(a[0] ? ScriptList::SORT_BY_VALUE : ScriptList::SORT_BY_ITEM, a[1] != 0);
+				break;
+			case ListStep::KEEP_ABOVE: list.KeepAboveValue(a[0]); break;
+			case ListStep::KEEP_BELOW: list.KeepBelowValue(a[0]); break;
+			case ListStep::KEEP_BETWEEN: list.KeepBetweenValue(a[0], a[1]); break;
+			case ListStep::KEEP_VALUE: list.KeepValue(a[0]); break;
+			case ListStep::REMOVE_VALUE: list.RemoveValue(a[0]); break;
+			case ListStep::KEEP_TOP: list.KeepTop(a[0]); break;
+			case ListStep::KEEP_BOTTOM: list.KeepBottom(a[0]); break;
+		}
+	}
+
+	/**
+	 * Run a sequence of valuations and filters on the list, under a
+	 * single game lock.
+	 *
+	 * @param steps A list of tuples: (operation, args…).
+	 * @return the remaining (item, value) pairs, as a buffer of int64.
+	 */
+	static py::bytes list_query(ScriptList &list, py::list steps)
+	{
+		std::vector<ListStep> todo;
+		for (auto step : steps)
+			todo.push_back(parse_step(py::cast<py::tuple>(step)));
+
+		std::vector<int64_t> data;
+
+		_WRAP1_NEW
+		for (auto &step : todo)
+			run_step(list, step);
+		list_copy(list, true, data);
+		_WRAP2_NEW
+
+		return to_bytes(data);
+	}
+
+	void list_extras(py::class_<ScriptList, ScriptObject> &cls)
+	{
+		cls.def("to_array", [](ScriptList &list) { return list_read(list, false); },
+				"Return all items as a buffer of int64");
+		cls.def("items", [](ScriptList &list) { return list_read(list, true); },
+				"Return all items and their values as a buffer of int64 pairs");
+		cls.def("query", &list_query, py::arg("steps"),
+				"Valuate and filter the list, return the remaining (item, value) pairs as a buffer of int64");
+
+		py::list valuators;
+		for (auto &v : list_valuators)
+			valuators.append(py::make_tuple(v.name, v.nargs));
+		cls.attr("valuators") = valuators;
+	}
+}
@@ -0,0 +1,27 @@
+/*
+ * This file is part of OpenTTD.
+ * OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+ * OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+ * See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+ */
+
+/** @file python/list.hpp Python-only additions to ScriptList. */
+
+#ifndef PY_LIST_H
+#define PY_LIST_H
+
+#include <nanobind/nanobind.h>
+
+#include "script/api/script_list.hpp"
+
+namespace PyTTD {
+	namespace py = nanobind;
+
+	/**
+	 * Add methods that don't exist in the script API to the list class.
+	 * Called by the generated list bindings.
+	 */
+	void list_extras(py::class_<ScriptList, ScriptObject> &cls);
+}
+
+#endif /* PY_LIST_H */
@@ -61,21 +61,37 @@ namespace PyTTD {
 			.def_prop_ro("mode", &ModeChange::GetMode);
 		py::class_<Msg::PauseState, MsgBase>(m, "PauseState", py::dynamic_attr())
 			.def_prop_ro("paused", &PauseState::GetState);
+		py::class_<Msg::Tick, MsgBase>(m, "Tick", py::dynamic_attr())
+			.def_prop_ro("tick", &Tick::GetTick)
+			.def_prop_ro("date", &Tick::GetDate);
 
 		/* msg_command */
 		py::class_<Msg::CmdRelay, MsgBase>(m, "CmdRelay", py::dynamic_attr())
 			.def(py::new_([](
 				Commands cmd,
 				py::bytes data,
-				CompanyID company)
+				CompanyID company,
+				uint32_t seq)
 				//intptr_t callback)
-				 { return new Msg::CmdRelay(cmd,data,company);}), // ,(CommandCallbackData *)callback);}),
+				 { return new Msg::CmdRelay(cmd,data,company,seq);}), // ,(CommandCallbackData *)callback);}),
 				py::arg("cmd"),
 				py::arg("data"),
-				py::arg("company"));
+				py::arg("company"),
+				py::arg("seq") = 0);
 				//py::arg("callback"));
 
+		py::class_<Msg::CmdBatch, MsgBase>(m, "CmdBatch", py::dynamic_attr())
+			.def(py::init<>())
+			.def("add", &CmdBatch::Add,
+				py::arg("cmd"),
+				py::arg("data"),
+				py::arg("company"),
+				py::arg("seq"))
+			.def("__len__", &CmdBatch::Size)
+			;
+
 		py::class_<Msg::CmdResult, MsgBase>(m, "CmdResult", py::dynamic_attr())
+			.def_prop_ro("seq", &CmdResult::GetSeq)
 			.def_prop_ro("cmd", &CmdResult::GetCmd)
 			.def_prop_ro("data", [](const CmdResult &x) {
 				auto d = x.GetData();
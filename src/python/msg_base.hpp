@@ -15,6 +15,18 @@
 
 namespace PyTTD {
 
+	/**
+	 * Priority classes of messages to Python. Lower values are delivered first.
+	 */
+	enum class MsgLane : uint8_t {
+		RESULT,  ///< Command results, which scripts are waiting for.
+		CONTROL, ///< Start/stop, mode and pause changes.
+		TICK,    ///< The game tick counter. Only the latest one is kept.
+		CONSOLE, ///< Console commands.
+		TRACE,   ///< Command traces. Dropped when too many are pending.
+		END,
+	};
+
 	/**
 	 * Base class for messages from/to Python.
 	 */
@@ -22,6 +34,7 @@ namespace PyTTD {
 	class MsgBase {
 	public:
 		virtual void Process() {};
+		virtual MsgLane Lane() const { return MsgLane::CONTROL; }
 
 		MsgBase() = default;
 		virtual ~MsgBase() = default;
@@ -5,7 +5,13 @@
  * See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
  */
 
+#include <algorithm>
+#include <deque>
+
 #include "python/msg_command.hpp"
+#include "python/task.hpp"
+#include "timer/timer_game_tick.h"
+#include "table/strings.h"
 #include "network/network.h"
 #include "network/network_internal.h"
 
@@ -15,9 +21,82 @@ extern CommandCallbackData CcGame;
 
 namespace PyTTD::Msg {
 
-	CmdRelay::CmdRelay(Commands cmd, const CommandDataBuffer &data, CompanyID company // , CommandCallbackData *callback
-	) : command(new CommandPacket() //, callback(callback)
-	) {
+	/*
+	 * Commands we sent to OpenTTD, so that we can tag their results with
+	 * the sequence number Python gave them.
+	 *
+	 * This is only used by the game thread.
+	 */
+	struct PendingCmd {
+		uint32_t seq;
+		Commands cmd;
+		CommandDataBuffer data;
+		uint64_t tick; // when it was sent
+	};
+
+	/*
+	 * A command that we execute locally calls back while we run it, so
+	 * its result is matched by its sequence number.
+	 */
+	static const PendingCmd *executing = nullptr;
+	static bool executed;
+
+	/*
+	 * Commands sent via the network call back a few frames later, so
+	 * these are matched by their data, in order.
+	 *
+	 * A command that fails before it's scheduled never calls back. Its
+	 * entry expires after PENDING_TICKS, so that it doesn't steal the
+	 * result of a later identical command for too long.
+	 */
+	static std::deque<PendingCmd> pending;
+	static constexpr uint64_t PENDING_TICKS = 1000;
+
+	static void ExpirePending()
+	{
+		uint64_t now = TimerGameTick::counter;
+		// The counter is reset when a game is started or loaded.
+		std::erase_if(pending, [now](const PendingCmd &p) {
+			return p.tick > now || p.tick + PENDING_TICKS < now;
+		});
+	}
+
+	static bool IsExecuting(Commands cmd, const CommandDataBuffer &data)
+	{
+		return executing != nullptr && executing->cmd == cmd && executing->data == data;
+	}
+
+	static std::deque<PendingCmd>::iterator FindPending(Commands cmd, const CommandDataBuffer &data)
+	{
+		// Results usually arrive in order, so this is almost always
+		// the first entry.
+		return std::find_if(pending.begin(), pending.end(), [&](const PendingCmd &p) {
+			return p.cmd == cmd && p.data == data;
+		});
+	}
+
+	bool CmdRelay::IsPending(Commands cmd, const CommandDataBuffer &data)
+	{
+		return IsExecuting(cmd, data) || FindPending(cmd, data) != pending.end();
+	}
+
+	uint32_t CmdRelay::TakePending(Commands cmd, const CommandDataBuffer &data)
+	{
+		if (IsExecuting(cmd, data)) {
+			executed = true;
+			return executing->seq;
+		}
+		auto p = FindPending(cmd, data);
+		if (p == pending.end())
+			return 0;
+		uint32_t seq = p->seq;
+		pending.erase(p);
+		return seq;
+	}
+
+	CmdRelay::CmdRelay(Commands cmd, const CommandDataBuffer &data, CompanyID company, uint32_t seq // , CommandCallbackData *callback
+	) : command(new CommandPacket()), seq(seq) //, callback(callback)
+	{
 		command->cmd = cmd;
 		command->data = data;
 		command->company = company;
@@ -28,13 +107,32 @@ namespace PyTTD::Msg {
 	}
 
 	void CmdRelay::Process() {
+		PendingCmd p{seq, command->cmd, command->data, TimerGameTick::counter};
+
 		if(! _networking) {
+			executing = &p;
+			executed = false;
 			UnsafeCallCmd(*command);
+			executing = nullptr;
+
+			if (!executed && Task::IsRunning()) {
+				// The command was rejected before it ran, so there was
+				// no callback. Usually that's because the game is paused.
+				CommandCost res = (_pause_mode != PM_UNPAUSED) ? CommandCost(STR_ERROR_NOT_ALLOWED_WHILE_PAUSED) : CMD_ERROR;
+				Task::Send(NewMsg<CmdResult>(seq, command->cmd, res, command->data, CommandDataBuffer{}));
+			}
 		} else {
+			ExpirePending();
+			pending.push_back(std::move(p));
 			NetworkSendCommand(command->cmd, command->err_msg, (CommandCallback *) &CcGame // CcPython
 			, command->company, command->data);
 		}
 
 		_current_company = _local_company;
 	}
+
+	void CmdBatch::Process() {
+		for (auto &cmd : cmds)
+			cmd->Process();
+	}
 }
@@ -21,11 +21,11 @@ namespace PyTTD::Msg {
 	// Send a command to OpenTTD for execution
 	class NB_IMPORT CmdRelay : public MsgBase {
 	public:
-		CmdRelay(Commands cmd, const CommandDataBuffer &data, CompanyID company //, CommandCallbackData *callback
+		CmdRelay(Commands cmd, const CommandDataBuffer &data, CompanyID company, uint32_t seq //, CommandCallbackData *callback
 		);
 
-		CmdRelay(Commands cmd, py::bytes data, CompanyID company //, CommandCallbackData *callback
-		) : CmdRelay(cmd, std::vector<uint8_t>((const uint8_t *)data.data(),((const uint8_t *)data.data())+data.size()), company //, callback
+		CmdRelay(Commands cmd, py::bytes data, CompanyID company, uint32_t seq //, CommandCallbackData *callback
+		) : CmdRelay(cmd, std::vector<uint8_t>((const uint8_t *)data.data(),((const uint8_t *)data.data())+data.size()), company, seq //, callback
 		) {}
 
 		inline Commands GetCmd() { return command->cmd; }
@@ -33,25 +33,56 @@ namespace PyTTD::Msg {
 		inline CompanyID GetCompany() { return command->company; }
 		inline StringID GetErrMsg() { return command->err_msg; }
 		inline CommandCallback *GetCallback() { return command->callback; }
+		inline uint32_t GetSeq() { return seq; }
 		// inline CommandCallbackData *GetDataCallback() { return callback; }
+
+		// Is a command with this data waiting for its result?
+		static bool IsPending(Commands cmd, const CommandDataBuffer &data);
+
+		// Return (and forget) the sequence number of the command with
+		// this data that's executing right now, or else of the oldest
+		// pending one; zero if there is none.
+		static uint32_t TakePending(Commands cmd, const CommandDataBuffer &data);
 	private:
 		CommandPacketPtr command;
+		uint32_t seq;
 		// CommandCallbackData *callback;
 
 		void Process() override;
+
+		friend class CmdBatch;
+	};
+
+	// Send several commands to OpenTTD, to be executed back-to-back
+	class NB_IMPORT CmdBatch : public MsgBase {
+	public:
+		CmdBatch() = default;
+
+		inline void Add(Commands cmd, py::bytes data, CompanyID company, uint32_t seq) {
+			cmds.push_back(std::make_unique<CmdRelay>(cmd, data, company, seq));
+		}
+		inline size_t Size() { return cmds.size(); }
+	private:
+		std::vector<std::unique_ptr<CmdRelay>> cmds;
+
+		void Process() override;
 	};
 
 	// send a completed command to Python
 	class CmdResult : public MsgBase {
 	public:
-		CmdResult(Commands cmd, const CommandCost &result, const CommandDataBuffer &data, const CommandDataBuffer &result_data)
-			: cmd(cmd), result(result), data(data), result_data(result_data) {}
+		CmdResult(uint32_t seq, Commands cmd, const CommandCost &result, const CommandDataBuffer &data, const CommandDataBuffer &result_data)
+			: seq(seq), cmd(cmd), result(result), data(data), result_data(result_data) {}
 
+		MsgLane Lane() const override { return MsgLane::RESULT; }
+
+		inline uint32_t GetSeq() const { return seq; }
 		inline const Commands &GetCmd() const { return cmd; }
 		inline const CommandCost &GetResult() const { return result; }
 		inline const CommandDataBuffer &GetData() const { return data; }
 		inline const CommandDataBuffer &GetResultData() const { return result_data; }
 	private:
+		uint32_t seq;
 		Commands cmd;
 		CommandCost result;
 		CommandDataBuffer data;
@@ -63,6 +94,8 @@ namespace PyTTD::Msg {
 	public:
 		CmdResult3(Commands cmd, const CommandCost &result, TileIndex tile, CompanyID company, py::object data) : cmd(cmd), result(result), tile(tile), company(company), data(data) {}
 
+		MsgLane Lane() const override { return MsgLane::RESULT; }
+
 		inline Commands GetCmd() { return cmd; }
 		inline CommandCost GetResult() { return result; }
 		inline TileIndex GetTile() { return tile; }
@@ -82,6 +115,8 @@ namespace PyTTD::Msg {
 		CmdTrace(Commands cmd, const CommandCost &result, const CommandDataBuffer &data, const CommandDataBuffer &result_data)
 			: cmd(cmd), result(result), data(data), result_data(result_data) {}
 
+		MsgLane Lane() const override { return MsgLane::TRACE; }
+
 		inline const Commands &GetCmd() { return cmd; }
 		inline const CommandCost &GetResult() { return result; }
 		inline const CommandDataBuffer &GetData() { return data; }
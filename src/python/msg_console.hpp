@@ -20,6 +20,7 @@ namespace PyTTD::Msg {
 	class ConsoleCmd : public MsgBase {
 	public:
 		ConsoleCmd(int argc, const char* const argv[]);
+		MsgLane Lane() const override { return MsgLane::CONSOLE; }
 
 		const std::vector<std::string> &GetArgs() { return args; }
 	private:
@@ -41,6 +42,7 @@ namespace PyTTD::Msg {
 	class CommandRun : public MsgBase {
 	public:
 		CommandRun(const std::string &msg);
+		MsgLane Lane() const override { return MsgLane::CONSOLE; }
 
 		const std::string &GetMsg() { return msg; }
 	private:
@@ -31,6 +31,19 @@ namespace PyTTD::Msg {
 	private:
 		PauseMode paused;
 	};
+
+	// The game tick counter advanced
+	class Tick : public MsgBase {
+	public:
+		Tick(uint64_t tick, int32_t date) : tick(tick), date(date) {}
+		MsgLane Lane() const override { return MsgLane::TICK; }
+
+		uint64_t GetTick() const { return tick; }
+		int32_t GetDate() const { return date; }
+	private:
+		uint64_t tick;
+		int32_t date; ///< economy date, as ScriptDate
+	};
 }
 
 #endif
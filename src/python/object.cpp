@@ -20,6 +20,7 @@
 #include "python/instance.hpp"
 #include "python/task.hpp"
 #include "python/call_py.hpp"
+#include "python/wrap.hpp"
 
 #include "script/api/script_object.hpp"
 #include "script/script_storage.hpp"
@@ -101,6 +102,34 @@ namespace PyTTD {
 			.def("wait", &Task::PyWaitNewMsg, "Wait for new messages")
 			.def("send", &Task::PySend, "Send a message")
 			.def("recv", &Task::PyRecv, "Read the next message")
+			.def("recv_many", [](Task &t) {
+				py::list res;
+				for (auto &msg : t.PyRecvMany())
+					res.append(py::cast(std::move(msg)));
+				return res;
+			}, "Read all pending messages")
+			.def("queue_stats", [](Task &t) {
+				static const char *names[] = { "result", "control", "tick", "console", "trace" };
+				static_assert(std::size(names) == QToPy::N_LANES);
+
+				auto st = t.PyQueueStats();
+				py::dict res;
+				for (size_t i = 0; i < QToPy::N_LANES; i++)
+					res[names[i]] = st.depth[i];
+				res["dropped"] = st.dropped;
+				return res;
+			}, "Pending messages per lane, and the number of dropped traces")
+			.def("fileno", &Task::PyFileno, "A file descriptor that's readable when messages are pending, or -1")
+			.def("clear_wakeup", &Task::PyClearWakeup, "Reset the file descriptor")
+			;
+		py::class_<LockSession>(m, "LockSession")
+			.def(py::init<double>(), py::arg("max_hold") = 0.05)
+			.def("__enter__", [](LockSession &s) -> LockSession& { s.Enter(); return s; }, py::rv_policy::reference)
+			.def("__exit__", [](LockSession &s, py::args) { s.Exit(); }, "Release the game lock")
+			.def_static("active", []() { return LockSession::current != nullptr; }, "Does this thread hold the game lock?")
+			.def("release", &LockSession::Release, "Temporarily release the game lock")
+			.def_static("release_all", &LockSession::ReleaseAll, "Release the game lock of all of this thread's sessions")
+			.def_static("expire_all", &LockSession::ExpireAll, "Release the game lock of this thread's sessions that held it for too long")
 			;
 
 		// intentionally not in a submodule
@@ -66,6 +66,7 @@ _content = {
 	'Cargo':'cargo',
 	'Company':'company',
 	'Dir':'tile',
+	'MapSnapshot':'map',
 	'Sign':'sign',
 	'Signs':'sign',
 	'RoadType':'road',
@@ -19,18 +19,28 @@ import warnings
 import importlib
 import shlex
 import ast
+import weakref
+import heapq
+import itertools
+import random
+import datetime
 from functools import partial
 from attrs import define,field
-from contextvars import ContextVar
-from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from contextlib import contextmanager, asynccontextmanager
 from importlib import import_module
 from io import StringIO
 from inspect import cleandoc
 from concurrent.futures import CancelledError
 
+try:
+    from anyio import wait_readable as _wait_readable
+except ImportError:  # anyio < 4.7
+    from trio.lowlevel import wait_readable as _wait_readable
+
 from .error import TTDResultError
 from .util import maybe_async,maybe_async_threaded,PlusSet
-from ._util import capture
+from ._util import capture, estimate_cache
 
 import logging
 
@@ -38,7 +48,8 @@ import logging
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Callable
+    from typing import Callable, Iterable, Iterator
+    from openttd.lib.cmdlog import Recorder
 
     class Command:
         pass
@@ -71,6 +82,492 @@ def _err():
 
 _STOP = ContextVar("_STOP", default=_err)
 
+# The current command batch, if any
+_batch = ContextVar("_batch", default=None)
+
+# The current script's command window and timeout
+_cmd_window = ContextVar("_cmd_window", default=None)
+_cmd_timeout = ContextVar("_cmd_timeout", default=10)
+
+# The pool that `maybe_async_threaded` runs jobs in, if not anyio's default
+_jobs = ContextVar("_jobs", default=None)
+# (pool, token) of the job slot held by this worker thread
+_job = ContextVar("_job", default=None)
+# the current script's `openttd.base.Budget`
+_budget = ContextVar("_budget", default=None)
+
+
+@contextmanager
+def command_timeout(timeout: float):
+    """
+    Change the time to wait for a command's result.
+
+    Time during which the game is paused doesn't count.
+    """
+    token = _cmd_timeout.set(timeout)
+    try:
+        yield
+    finally:
+        _cmd_timeout.reset(token)
+
+
+class CmdWindow:
+    """
+    Limits the number of commands a script may have in flight.
+
+    In async mode, a command is sent immediately if the window has room;
+    otherwise it's queued and sent as soon as an earlier command has
+    completed. In sync mode the caller simply waits.
+
+    A command holds its slot until its reply arrives, even if its caller
+    has timed out or was cancelled.
+
+    All methods must be called from the main event loop.
+    """
+    def __init__(self, size: int, name: str):
+        self.size = size
+        self.name = name
+        self._sem = None
+        self._batch_lock = None
+
+        self.in_flight = 0
+        self.sent = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    @property
+    def sem(self):
+        # created lazily because we need to be in async context
+        if self._sem is None:
+            self._sem = anyio.Semaphore(self.size)
+        return self._sem
+
+    def try_acquire(self) -> bool:
+        try:
+            self.sem.acquire_nowait()
+        except anyio.WouldBlock:
+            return False
+        self.in_flight += 1
+        self.sent += 1
+        return True
+
+    async def acquire(self):
+        if self.try_acquire():
+            return
+        t = anyio.current_time()
+        await self.sem.acquire()
+        t = anyio.current_time() - t
+
+        self.in_flight += 1
+        self.sent += 1
+        self.waited += 1
+        self.wait_time += t
+        self.max_wait = max(self.max_wait, t)
+
+    async def acquire_many(self, n: int):
+        """
+        Take @n slots, for a command batch.
+
+        Batches take their slots one after the other, so that two of them
+        can't deadlock each other by holding part of the window.
+        """
+        if self._batch_lock is None:
+            self._batch_lock = anyio.Lock()
+        async with self._batch_lock:
+            got = 0
+            try:
+                while got < n:
+                    await self.acquire()
+                    got += 1
+            except BaseException:
+                for _ in range(got):
+                    self.release()
+                raise
+
+    def release(self):
+        self.in_flight -= 1
+        self.sem.release()
+
+    def info(self) -> str:
+        avg = self.wait_time / self.waited if self.waited else 0
+        return f"{self.in_flight}/{self.size} in flight, {self.sent} sent, {self.waited} waited (avg {avg*1000:.1f} ms, max {self.max_wait*1000:.1f} ms), {self.timeouts} timed out"
+
+
+class JobPool:
+    """
+    Runs synchronous jobs in worker threads, at most `size` at a time.
+
+    Jobs beyond that wait for a free slot. The threads themselves are
+    reused by anyio, so this limits concurrency rather than thread
+    creation. A job that waits for another job (see `released`) gives up
+    its slot in the meantime, so nested jobs can't deadlock the pool.
+
+    All methods except `released` must be called from the main event loop.
+    """
+    def __init__(self, size: int, name: str):
+        self.size = size
+        self.name = name
+        self._limiter = None
+        self._released = set()
+
+        self.submitted = 0
+        self.done = 0
+        self.waited = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.max_queued = 0
+
+    @property
+    def limiter(self):
+        # created lazily because we need to be in async context
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(self.size)
+        return self._limiter
+
+    @property
+    def running(self) -> int:
+        return self.limiter.borrowed_tokens
+
+    @property
+    def queued(self) -> int:
+        return self.limiter.statistics().tasks_waiting
+
+    async def run(self, proc, *a):
+        """
+        Run ``proc(*a)`` in a worker thread and return its result.
+
+        Cancelling this doesn't abandon a job that's already running;
+        use `test_stop` (i.e. `HLT`) to ask it to end.
+        """
+        self.submitted += 1
+        lim = self.limiter
+        job = object()
+        try:
+            lim.acquire_on_behalf_of_nowait(job)
+        except anyio.WouldBlock:
+            self.max_queued = max(self.max_queued, self.queued + 1)
+            t = anyio.current_time()
+            await lim.acquire_on_behalf_of(job)
+            t = anyio.current_time() - t
+            self.waited += 1
+            self.wait_time += t
+            self.max_wait = max(self.max_wait, t)
+        try:
+            return await anyio.to_thread.run_sync(self._in_thr, job, proc, a, abandon_on_cancel=False)
+        finally:
+            if job in self._released:
+                # the job didn't get its slot back
+                self._released.discard(job)
+            else:
+                lim.release_on_behalf_of(job)
+            self.done += 1
+
+    def _in_thr(self, job, proc, a):
+        _job.set((self, job))
+        if (budget := _budget.get()) is not None:
+            # the thread may have run somebody else's job before
+            budget.start()
+        return proc(*a)
+
+    def _release(self, job):
+        self._released.add(job)
+        self.limiter.release_on_behalf_of(job)
+
+    async def _reacquire(self, job):
+        await self.limiter.acquire_on_behalf_of(job)
+        self._released.discard(job)
+
+    @staticmethod
+    @contextmanager
+    def released():
+        """
+        Free the current thread's job slot while the block runs, e.g.
+        while waiting for a child job that might need it.
+
+        Call this from a worker thread. It does nothing if the thread
+        doesn't run a pool job.
+        """
+        cur = _job.get()
+        if cur is None:
+            yield
+            return
+        pool, job = cur
+        _from_thread_sync(pool._release, job)
+        try:
+            yield
+        finally:
+            _from_thread(pool._reacquire, job)
+
+    def info(self) -> str:
+        avg = self.wait_time / self.waited if self.waited else 0
+        return f"{self.running}/{self.size} running, {self.queued} queued (max {self.max_queued}), {self.done}/{self.submitted} done, {self.waited} waited (avg {avg*1000:.1f} ms, max {self.max_wait*1000:.1f} ms)"
+
+
+class Dispatcher:
+    """
+    Runs the handlers of incoming messages with bounded concurrency.
+
+    Each message type gets `limits[name]` workers (default: `default`)
+    which share a queue of `depth` messages. Types in `ordered` are
+    handled one at a time per key instead, in the order they arrive;
+    the key is supplied by the caller. When a queue is full, `put`
+    waits, which in turn throttles reading messages from OpenTTD.
+
+    All methods must be called from the main event loop.
+    """
+    def __init__(self, tg, handler, limits: dict[str,int], ordered: Iterable[str] = (), default: int = 10, depth: int = 100):
+        self._tg = tg
+        self._handler = handler
+        self.limits = limits
+        self.ordered = frozenset(ordered)
+        self.default = default
+        self.depth = depth
+
+        self._pool = {}  # type name > send stream
+        self._serial = {}  # key > [send stream, messages not yet handled]
+
+        self.pending = {}  # type name > messages queued or running
+        self.max_pending = {}
+        self.handled = {}
+
+    async def put(self, msg, key=None):
+        name = type(msg).__name__
+        n = self.pending.get(name, 0) + 1
+        self.pending[name] = n
+        if self.max_pending.get(name, 0) < n:
+            self.max_pending[name] = n
+
+        if name in self.ordered:
+            try:
+                lane = self._serial[key]
+            except KeyError:
+                w,r = anyio.create_memory_object_stream(self.depth)
+                lane = self._serial[key] = [w, 0]
+                self._tg.start_soon(self._serial_worker, key, r)
+            # counted before sending so that the worker doesn't quit early
+            lane[1] += 1
+            await lane[0].send(msg)
+            return
+
+        try:
+            w = self._pool[name]
+        except KeyError:
+            w,r = anyio.create_memory_object_stream(self.depth)
+            self._pool[name] = w
+            for _ in range(self.limits.get(name, self.default)):
+                self._tg.start_soon(self._worker, r)
+        await w.send(msg)
+
+    async def _run(self, msg):
+        name = type(msg).__name__
+        try:
+            await self._handler(msg)
+        except Exception:
+            logger.exception("Error processing %r", msg)
+        finally:
+            self.pending[name] -= 1
+            self.handled[name] = self.handled.get(name, 0) + 1
+
+    async def _worker(self, r):
+        async for msg in r:
+            await self._run(msg)
+
+    async def _serial_worker(self, key, r):
+        lane = self._serial[key]
+        with r:
+            async for msg in r:
+                await self._run(msg)
+                lane[1] -= 1
+                if not lane[1]:
+                    # idle: go away. A new worker starts with the next message.
+                    del self._serial[key]
+                    lane[0].close()
+                    return
+
+    def info(self) -> Iterator[str]:
+        for name in sorted(self.handled.keys() | self.pending.keys()):
+            workers = "ordered" if name in self.ordered else f"{self.limits.get(name, self.default)} workers"
+            yield f"{name}: {self.pending.get(name, 0)} pending (max {self.max_pending.get(name, 0)}), {self.handled.get(name, 0)} handled, {workers}"
+
+
+class TimerJob:
+    """
+    A callback registered with `TickScheduler`.
+
+    Call `cancel` to remove it.
+    """
+    def __init__(self, sched, proc, a, interval, tg, ctx):
+        self._sched = sched
+        self.proc = proc
+        self.a = a
+        self.interval = interval
+        self.due = None
+        self._tg = tg
+        self._ctx = ctx
+
+        self.runs = 0
+        self.skipped = 0
+        self.running = False
+        self.cancelled = False
+
+    def __repr__(self):
+        every = f" every {self.interval}" if self.interval else ""
+        return f"<TimerJob {getattr(self.proc, '__qualname__', self.proc)}{every} due {self.due}>"
+
+    def cancel(self):
+        self.cancelled = True
+        self._sched.jobs.discard(self)
+
+    def _fire(self):
+        if self.running:
+            # The previous run isn't done yet. Don't pile up.
+            self.skipped += 1
+            return
+        self.running = True
+        try:
+            self._ctx.run(self._tg.start_soon, self._run)
+        except RuntimeError:  # the task group has ended
+            self.running = False
+            self.cancel()
+
+    async def _run(self):
+        try:
+            await maybe_async_threaded(self.proc, *self.a)
+        except Exception:
+            logger.exception("Error in timer %r", self)
+        finally:
+            self.running = False
+            self.runs += 1
+
+
+class TickScheduler:
+    """
+    Runs callbacks at specific game ticks or dates, or periodically.
+
+    Jobs are kept in buckets per due tick (or, for dates, in a heap),
+    so a tick with nothing to do costs a dictionary lookup. Each job
+    runs as a task in the task group it was registered with, in the
+    context it was registered in. A periodic job that's still running
+    when it's due again is skipped.
+
+    All methods must be called from the main event loop.
+    """
+    def __init__(self):
+        self._buckets:dict[int,list[TimerJob]] = {}
+        self._dates:list[tuple[int,int,TimerJob]] = []
+        self._seq = 0
+        self.tick = None
+        self.date = None
+        self.jobs = set()
+
+    def _now(self) -> int:
+        if self.tick is None:
+            return _main.get().tick
+        return self.tick
+
+    def _add(self, job, due):
+        job.due = due
+        self._buckets.setdefault(due, []).append(job)
+        self.jobs.add(job)
+        return job
+
+    def every(self, ticks:int, proc, a=(), *, first:int|None = None, tg=None, ctx=None) -> TimerJob:
+        """
+        Call @proc every @ticks game ticks.
+
+        The first call happens after @first ticks. The default is a
+        random number between 1 and @ticks, which spreads jobs with the
+        same interval across that interval.
+        """
+        if ticks < 1:
+            raise ValueError("The interval must be at least one tick")
+        if first is None:
+            first = random.randint(1, ticks)
+        job = TimerJob(self, proc, a, ticks, tg or _main.get()._tg, ctx or copy_context())
+        return self._add(job, self._now() + max(first, 1))
+
+    def at_tick(self, tick:int, proc, a=(), *, tg=None, ctx=None) -> TimerJob:
+        """
+        Call @proc when the game tick counter reaches @tick.
+        """
+        job = TimerJob(self, proc, a, None, tg or _main.get()._tg, ctx or copy_context())
+        return self._add(job, max(tick, self._now() + 1))
+
+    def at_date(self, date:int|datetime.date, proc, a=(), *, tg=None, ctx=None) -> TimerJob:
+        """
+        Call @proc when the game (economy) date reaches @date.
+
+        @date is a day number as used by `openttd.date`, or a
+        `datetime.date`.
+        """
+        if isinstance(date, datetime.date):
+            date = date.toordinal() + 365  # OpenTTD counts from year zero
+        job = TimerJob(self, proc, a, None, tg or _main.get()._tg, ctx or copy_context())
+        job.due = date
+        self._seq += 1
+        heapq.heappush(self._dates, (date, self._seq, job))
+        self.jobs.add(job)
+        return job
+
+    def drop(self, tg) -> None:
+        """
+        Cancel all jobs that run in this task group.
+        """
+        for job in list(self.jobs):
+            if job._tg is tg:
+                job.cancel()
+
+    def advance(self, tick:int, date:int) -> None:
+        """
+        The game has advanced to this tick and date. Run the jobs that
+        are due.
+
+        If the tick counter went backwards, the game was restarted or
+        loaded; jobs are then moved so that they're due after the same
+        number of ticks as before. Dates are absolute and stay as they are.
+        """
+        last,self.tick = self.tick,tick
+        self.date = date
+
+        buckets = self._buckets
+        if last is not None and tick < last:
+            # The counter was reset: a new game was started, or a
+            # savegame loaded. Keep the jobs' remaining waiting times.
+            shift = tick - last
+            self._buckets = buckets = {t + shift: jobs for t, jobs in buckets.items()}
+            for jobs in buckets.values():
+                for job in jobs:
+                    job.due += shift
+            last = tick
+        if last is not None and tick - last <= len(buckets):
+            due = [t for t in range(last + 1, tick + 1) if t in buckets]
+        else:
+            due = sorted(t for t in buckets if t <= tick)
+        for t in due:
+            for job in buckets.pop(t):
+                if job.cancelled:
+                    continue
+                if job.interval:
+                    # if we skipped ticks, run once and continue from now
+                    self._add(job, max(t + job.interval, tick + 1))
+                else:
+                    self.jobs.discard(job)
+                job._fire()
+
+        dates = self._dates
+        while dates and dates[0][0] <= date:
+            job = heapq.heappop(dates)[2]
+            if not job.cancelled:
+                self.jobs.discard(job)
+                job._fire()
+
+    def info(self) -> str:
+        n_per = sum(1 for j in self.jobs if j.interval)
+        skipped = sum(j.skipped for j in self.jobs)
+        return f"{len(self.jobs)} jobs ({n_per} periodic), {len(self._buckets)} ticks and {len(self._dates)} dates pending, {skipped} runs skipped"
+
 
 @contextmanager
 def test_mode():
@@ -98,14 +595,190 @@ def real_mode():
     finally:
         estimating.reset(token)
 
+@contextmanager
+def game_lock(max_hold:float=0.05):
+    """
+    Keep the game locked while running many API queries.
+
+    API calls within this block skip most of the per-call locking
+    overhead. The lock is released temporarily after @max_hold seconds
+    so that the game doesn't stall, and whenever a call sends a
+    command.
+
+    The lock is per thread. Don't use this in async mode: awaiting
+    something while holding it would block the game.
 
-@define(hash=True,eq=True)
+    Calling `test_stop` releases the lock if it has been held for more
+    than @max_hold; sleeping or waiting for the event loop (e.g. for a
+    command or a subthread) always releases it. Other Python code in the
+    block doesn't, so don't run long computations between API calls
+    without calling `test_stop`, and don't call ``anyio.from_thread.*``
+    directly within the block.
+
+    Scripts aren't throttled (see `openttd.base.Budget`) while they hold
+    the lock. Leaving the block checks, i.e. it calls `test_stop`.
+    """
+    if _async.get():
+        raise RuntimeError("The game lock can't be held in async mode")
+    with _ttd.object.LockSession(max_hold):
+        yield
+    # A script that overran its budget within the block waits now.
+    _STOP.get()()
+
+
+def _from_thread(proc, *a):
+    """
+    ``anyio.from_thread.run`` for script threads.
+
+    The thread's game lock (see `game_lock`) is released first: the
+    event loop might be waiting for it.
+    """
+    _ttd.object.LockSession.release_all()
+    return anyio.from_thread.run(proc, *a)
+
+def _from_thread_sync(proc, *a):
+    """
+    ``anyio.from_thread.run_sync`` for script threads. See `_from_thread`.
+    """
+    _ttd.object.LockSession.release_all()
+    return anyio.from_thread.run_sync(proc, *a)
+
+
+class CommandBatch:
+    """
+    Commands collected by `command_batch`.
+
+    When the batch is done, `results` contains the commands' results,
+    in order.
+    """
+    results: list|None = None
+
+    def __init__(self, main: Main):
+        self._main = main
+        self._queued: list[tuple[CmdR, CmdWindow]] = []
+        self._replies: list[tuple[CmdR, VEvent]] = []
+
+    def add(self, cmdr: CmdR, evt: VEvent, window: CmdWindow):
+        self._queued.append((cmdr, window))
+        self._replies.append((cmdr, evt))
+
+    async def flush(self):
+        """
+        Send the commands queued so far.
+
+        The batch takes a slot in its window for each command, but no
+        more than the window has: a batch that's larger than its window
+        would otherwise wait for itself. The other commands don't hold
+        a slot.
+        """
+        if not self._queued:
+            return
+        queued, self._queued = self._queued, []
+
+        slots = {}
+        for _, window in queued:
+            slots[window] = min(slots.get(window, 0) + 1, window.size)
+        got = {}
+        try:
+            for window, n in slots.items():
+                await window.acquire_many(n)
+                got[window] = n
+        except BaseException:
+            for window, n in got.items():
+                for _ in range(n):
+                    window.release()
+            for cmdr, _ in queued:
+                self._main._drop_reply(cmdr.seq)
+            raise
+
+        msg = openttd.internal.msg.CmdBatch()
+        for cmdr, window in queued:
+            if slots[window]:
+                slots[window] -= 1
+                cmdr.window = window
+            msg.add(cmdr.cmd, cmdr.data, cmdr.company, cmdr.seq)
+            cmdr.sent = True
+        self._main.send(msg)
+
+    def discard(self):
+        """
+        Forget the commands that haven't been sent yet.
+        """
+        for cmdr, _ in self._queued:
+            self._main._drop_reply(cmdr.seq)
+        self._queued = []
+
+    async def wait(self, timeout: float):
+        await self.flush()
+        try:
+            for cmdr, evt in self._replies:
+                try:
+                    await self._main._wait_unpaused(evt.event, timeout)
+                except TimeoutError:
+                    if cmdr.window is not None:
+                        cmdr.window.timeouts += 1
+                    raise
+        finally:
+            for cmdr, _ in self._replies:
+                self._main._forget_cmd(cmdr)
+        self.results = [evt.value for _,evt in self._replies]
+
+
+@asynccontextmanager
+async def command_batch(timeout: float = 10):
+    """
+    Send the commands issued within this block to OpenTTD as a single
+    message.
+
+    This saves some per-message overhead. It doesn't make the commands
+    run any sooner: OpenTTD processes all messages that are waiting
+    at the start of a game frame anyway.
+
+    Commands return their awaitables as usual. Awaiting one within the
+    block sends the commands collected so far. Otherwise they're sent when
+    the block ends, which then waits for all of them; their raw results
+    are available as the batch's `results` attribute.
+
+    A batch takes as many slots in the script's command window as it
+    has commands, up to the window's size.
+
+    You still need to await each command's awaitable; that's what turns
+    a failure into an exception. After the block, that doesn't wait.
+
+    Usage::
+
+        async with openttd.command_batch() as batch:
+            res = [a.build_road_to(b) for a,b in pairs]
+        for r in res:
+            await r
+
+    This only works in async mode.
+    """
+    if not _async.get():
+        raise RuntimeError("Command batches only work in async mode")
+    batch = CommandBatch(_main.get())
+    token = _batch.set(batch)
+    try:
+        yield batch
+    except BaseException:
+        batch.discard()
+        raise
+    finally:
+        _batch.reset(token)
+    await batch.wait(timeout)
+
+
+@define
 class CmdR:
     cmd:Command
     data:bytes
-    company:CompanyID=field(eq=False,hash=False)
-    callback: int=field(eq=False,hash=False)
-    storage:Storage=field(factory=_storage.get,eq=False,hash=False)
+    company:CompanyID
+    callback: int
+    seq: int=0
+    storage:Storage=field(factory=_storage.get)
+    sent: bool=False
+    window: CmdWindow|None=None
+    queued: anyio.Event|None=None
 
 
 @define
@@ -137,7 +810,8 @@ class Main:
     The central control object.
     """
     _tg: anyio.abc.TaskGroup
-    _replies:dict[CmdR, VEvent]
+    _dispatch: Dispatcher
+    _replies:dict[int, tuple[CmdR, VEvent]]
     _code:dict[int,BaseScript]
     _game_mode:GameMode = None
     _pause_state:PauseState = None
@@ -146,13 +820,38 @@ class Main:
 
     signs:PlusSet[openttd.sign.Sign]
 
+    # Worker threads for scripts' subthreads. See `JobPool`.
+    JOB_THREADS:int = 8
+
+    # Concurrent handlers per message type. See `Dispatcher`.
+    MSG_WORKERS:int = 10
+    MSG_LIMITS:dict[str,int] = {"CmdTrace": 1}
+    MSG_ORDERED:set[str] = {"CmdResult", "ModeChange", "PauseState"}
+
+    # Commands that haven't been answered this many ticks after their
+    # caller gave up are assumed to be lost. OpenTTD expires them after
+    # the same time.
+    ABANDON_TICKS:int = 1000
+
     def __init__(self):
         self._replies = {}
+        self._abandoned = {}  # seq: tick when the caller gave up
+        # Commands are sent from several threads. `next` on this is atomic.
+        self._seq = itertools.count()
+        self._window = CmdWindow(100, "main")
+        self._recorder = None
+        self._windows = weakref.WeakSet((self._window,))
+        self.jobs = JobPool(self.JOB_THREADS, "main")
+        self._pools = weakref.WeakSet((self.jobs,))
         self._globals = {}
         self._code = {}
         self._code_next = 1
         self.logger = logger
         self._pause_change = anyio.Event()
+        self._tick = None
+        self._timers = []  # heap of (tick, seq, Event)
+        self._timer_seq = 0
+        self.timers = TickScheduler()
         self.signs = PlusSet()
 
     def get_free_index(self):
@@ -180,34 +879,55 @@ class Main:
     async def _ttd_reader(self, queue, *, task_status):
         """
         Asynchronously read messages from OpenTTD.
-        """
-        def _read_queue():
-            t = openttd.internal.task
 
-            gen = t.wait(0)
+        If the queue has a file descriptor, the event loop watches it
+        directly. Otherwise a thread waits for messages.
+        """
+        t = openttd.internal.task
+        fd = t.fileno()
 
-            anyio.from_thread.run_sync(task_status.started, gen)
+        async def _read_loop():
+            task_status.started(0)
             while True:
-                while True:
-                    msg = t.recv()
-                    if msg is None:
-                        break
+                await _wait_readable(fd)
+                t.clear_wakeup()
+                msgs = t.recv_many()
+                for i,msg in enumerate(msgs):
                     if isinstance(msg, openttd.internal.msg.Stop):
+                        if i:
+                            await queue.send(msgs[:i])
                         return
+                if msgs:
+                    await queue.send(msgs)
+
+        def _read_queue():
+            gen = t.wait(0)
 
-                    anyio.from_thread.run(queue.send,msg)
+            anyio.from_thread.run_sync(task_status.started, gen)
+            while True:
+                while msgs := t.recv_many():
+                    for i,msg in enumerate(msgs):
+                        if isinstance(msg, openttd.internal.msg.Stop):
+                            if i:
+                                anyio.from_thread.run(queue.send,msgs[:i])
+                            return
+
+                    anyio.from_thread.run(queue.send,msgs)
                 gen = t.wait(gen)
 
 
-        async def _run_thread():
+        async def _run_reader():
             try:
-                await anyio.to_thread.run_sync(_read_queue, abandon_on_cancel=False)
+                if fd >= 0:
+                    await _read_loop()
+                else:
+                    await anyio.to_thread.run_sync(_read_queue, abandon_on_cancel=False)
             finally:
                 openttd.internal.task.stop()  # assuming there was an exception
                 self._tg.cancel_scope.cancel()  # assuming we're told to shut down
 
         async with anyio.create_task_group() as tg:
-            tg.start_soon(_run_thread)
+            tg.start_soon(_run_reader)
             try:
                 await anyio.sleep_forever()
             finally:
@@ -215,16 +935,31 @@ class Main:
 
     async def _process(self, q):
         """
-        Process messages from OpenTTD.
+        Process messages from OpenTTD. They arrive in batches.
         """
         async def hdl(msg):
-            try:
-                res = await maybe_async(msg.work, self)
-            except Exception:
-                logger.exception("Error processing %r", msg)
+            await maybe_async(msg.work, self)
+
+        self._dispatch = d = Dispatcher(self._tg, hdl, self.MSG_LIMITS, self.MSG_ORDERED, default=self.MSG_WORKERS)
+        async for msgs in q:
+            for msg in msgs:
+                await d.put(msg, self.msg_key(msg))
 
-        async for msg in q:
-            res = self._tg.start_soon(hdl,msg)
+    def msg_key(self, msg):
+        """
+        Messages of `MSG_ORDERED` types with the same key are handled
+        in sequence.
+
+        OpenTTD delivers command results and control messages (mode and
+        pause changes) in the order they happened, so their handlers are
+        started in that order, even though they use different keys.
+        """
+        if isinstance(msg, openttd.internal.msg.CmdResult):
+            # per script
+            if (reply := self._replies.get(msg.seq)) is not None:
+                return reply[0].window
+            return None
+        return "control"
 
     async def handle_run(self, msg):
         """
@@ -309,15 +1044,16 @@ class Main:
         Callback for our command results.
         """
         self.debug(5,"RES:",msg)
-        for cmdr in self._replies.keys():
-            if cmdr.cmd == msg.cmd and cmdr.data == msg.data:
-                break
-        else:
+        # This part may not await
+        if (reply := self._drop_reply(msg.seq)) is None:
             self.debug(0,"Spurious callback:",msg)
             return
+        cmdr,evt = reply
+        # the command may have changed the map
+        estimate_cache.clear()
+        if self._recorder is not None:
+            self._recorder.record(_ttd.support.get_game_tick(), int(cmdr.cmd), int(cmdr.company), msg.result.success, int(msg.result.cost), cmdr.data)
 
-        # This part may not await
-        evt = self._replies.pop(cmdr)
         if not msg.result.success:
             evt.value = msg.result
 
@@ -333,35 +1069,45 @@ class Main:
             msg = _ttd.msg._done_cb(cmdr.callback, st)
             if msg is not None:
                 # The callback enqueued another command.
-                # Wait for that before continuing.
-                try:
-                    r2 = await msg
-
-                except BaseException:
-                    evt.value = CancelledError()
-                    evt.event.set()
-                    raise
-                else:
-                    self.debug(5,"Subcommand:",r2)
+                # Wait for that in a separate task: its result is
+                # handled by the same worker as this one.
+                self._tg.start_soon(self._chain_result, msg, st, evt)
+                return
             # We return the original result because that's what matters.
-            res = st.result  # can only be read once!
-            evt.value = res
+            evt.value = st.result  # can only be read once!
         else:
             evt.value = msg.result.success
         evt.event.set()
 
+    async def _chain_result(self, msg, st, evt):
+        """
+        Wait for a command that a callback has sent, then complete the
+        original one.
+        """
+        try:
+            r2 = await msg
+
+        except BaseException:
+            evt.value = CancelledError()
+            evt.event.set()
+            raise
+        else:
+            self.debug(5,"Subcommand:",r2)
+        evt.value = st.result  # can only be read once!
+        evt.event.set()
+
     async def handle_result2(self, msg):
         """
         Callback for local command results.
         """
         breakpoint()
-        for k,evt in self._replies.items():
+        for seq,(k,evt) in self._replies.items():
             if k.cmd == msg.cmd and k.company == msg.company:
                 break
         else:
             self.debug(0,"Spurious callback",msg)
             return
-        evt = self._replies.pop(k)
+        self._drop_reply(seq)
         evt.value = msg.result
         evt.event.set()
 
@@ -371,27 +1117,16 @@ class Main:
         Callback for local command results.
         """
         breakpoint()
-        for k,evt in self._replies.items():
+        for seq,(k,evt) in self._replies.items():
             if k.cmd == msg.cmd and k.company == msg.company:
                 break
         else:
             self.debug(0,"Spurious callback",msg)
             return
-        evt = self._replies.pop(k)
+        self._drop_reply(seq)
         evt.value = msg.result
         evt.event.set()
 
-    def check_pending(self, cmd, data):
-        """
-        Check whether this command is ours.
-
-        DANGER: this is called from the main task.
-        """
-        for cmdr in self._replies.keys():
-            if cmdr.cmd == cmd and cmdr.data == data:
-                return True
-        return False
-
     async def cmd_start(self, args) -> VEvent:
         """Start a game script or an AI.
 
@@ -491,6 +1226,7 @@ class Main:
             await anyio.sleep_forever()
         finally:
             self.stopping = True
+            self._stop_recording()
 
     def _send_cmd(self, cmd, buf, cb) -> Awaitable[CommandResult]:
         # called from the command hook
@@ -506,28 +1242,125 @@ class Main:
         if company is None:
             company = _storage.get().company
 
-        cmdr = CmdR(openttd.internal.Command(cmd), buf, company, cb)
-        if cmdr in self._replies:
-            raise ValueError(f"Command {cmd} ({buf}) is already queued")
+        window = _cmd_window.get() or self._window
+        timeout = _cmd_timeout.get()
+
+        seq = next(self._seq) % 0xFFFFFFFF + 1
+        cmdr = CmdR(openttd.internal.Command(cmd), buf, company, cb, seq)
         evt = VEvent()
-        self._replies[cmdr] = evt
+        self._replies[cmdr.seq] = (cmdr, evt)
 
         self.debug(5,"SEND",cmd, company)
-        self.send(openttd.internal.msg.CmdRelay(cmd, cmdr.data, company))
+        batch = _batch.get() if _async.get() else None
+        if batch is not None:
+            batch.add(cmdr, evt, window)
+        elif _async.get():
+            if window.try_acquire():
+                self._send_cmd_relay(cmdr, window)
+            else:
+                # Send it even if the caller never awaits the result.
+                cmdr.queued = anyio.Event()
+                self._tg.start_soon(self._send_queued, cmdr, window)
 
         if _async.get():
-            return self._wait_cmd(cmdr,evt)
-        return anyio.from_thread.run(self._wait_cmd,cmdr,evt)
+            return self._wait_cmd(cmdr,evt,window,timeout,batch)
+        return _from_thread(self._wait_cmd,cmdr,evt,window,timeout)
+
+    def _send_cmd_relay(self, cmdr, window):
+        cmdr.window = window
+        cmdr.sent = True
+        self.send(openttd.internal.msg.CmdRelay(cmdr.cmd, cmdr.data, cmdr.company, cmdr.seq))
 
-    async def _wait_cmd(self, cmdr, evt):
+    async def _send_queued(self, cmdr, window):
+        """
+        Send a command as soon as its window has room.
+        """
+        try:
+            await window.acquire()
+            if cmdr.seq not in self._replies:
+                # the caller gave up
+                window.release()
+                return
+            self._send_cmd_relay(cmdr, window)
+        finally:
+            cmdr.queued.set()
+
+    def _drop_reply(self, seq) -> tuple[CmdR, VEvent]|None:
+        """
+        Forget a command reply; return it. Releases the command's slot in
+        its window.
+        """
         try:
-            with anyio.fail_after(10):
-                await evt.event.wait()
+            cmdr,evt = self._replies.pop(seq)
+        except KeyError:
+            return None
+        self._abandoned.pop(seq, None)
+        if cmdr.window is not None:
+            cmdr.window.release()
+            cmdr.window = None
+        return cmdr,evt
+
+    def _forget_cmd(self, cmdr):
+        """
+        The caller no longer waits for this command.
+
+        If it hasn't been sent, it's dropped. Otherwise it keeps its
+        window slot until its reply arrives, or until OpenTTD has
+        surely forgotten it (see ABANDON_TICKS).
+        """
+        if not cmdr.sent:
+            self._drop_reply(cmdr.seq)
+        elif cmdr.seq in self._replies:
+            self._abandoned[cmdr.seq] = self.tick
+
+    async def _wait_cmd(self, cmdr, evt, window, timeout, batch=None):
+        if batch is not None:
+            await batch.flush()
+        try:
+            if not cmdr.sent:
+                if cmdr.queued is not None:
+                    await cmdr.queued.wait()
+                else:
+                    await window.acquire()
+                    self._send_cmd_relay(cmdr, window)
+            try:
+                await self._wait_unpaused(evt.event, timeout)
+            except TimeoutError:
+                window.timeouts += 1
+                raise
             return evt.value
 
         finally:
-            if cmdr in self._replies:
-                del self._replies[cmdr]
+            self._forget_cmd(cmdr)
+
+    @property
+    def paused(self) -> bool:
+        """
+        Is the game paused?
+        """
+        return self._pause_state is not None and self._pause_state != openttd.internal.PauseState.UNPAUSED
+
+    async def _wait_unpaused(self, event: anyio.Event, timeout: float):
+        """
+        Wait for @event, with a timeout that only counts while the game
+        is running.
+        """
+        while not event.is_set():
+            pc = self._pause_change
+            if self.paused:
+                async with anyio.create_task_group() as tg:
+                    async def _w(e):
+                        await e.wait()
+                        tg.cancel_scope.cancel()
+                    tg.start_soon(_w, event)
+                    tg.start_soon(_w, pc)
+                continue
+
+            with anyio.move_on_after(timeout) as sc:
+                await event.wait()
+            if sc.cancelled_caught and pc is self._pause_change:
+                raise TimeoutError("No reply from OpenTTD")
+            # otherwise the game was paused in between: start over
 
     @property
     def game_mode(self):
@@ -569,17 +1402,58 @@ class Main:
                 for v in list(self._code.values()):
                     tg.start_soon(maybe_async, v.set_pause_state, mode)
 
+    @property
+    def tick(self) -> int:
+        """
+        The game tick counter, as last reported by OpenTTD.
+        """
+        if self._tick is None:
+            self._tick = _ttd.support.get_game_tick()
+        return self._tick
+
+    def handle_tick(self, msg):
+        """
+        The game tick counter advanced. Wake up the tasks that waited
+        for it, and run the scheduled jobs.
+        """
+        tick = msg.tick
+        if self._tick is not None:
+            if tick == self._tick:
+                return
+            if tick < self._tick:
+                # The counter was reset: a new game was started, or a
+                # savegame loaded. Keep the remaining waiting times.
+                # A uniform shift doesn't change the heap's order.
+                shift = tick - self._tick
+                self._timers = [(t + shift, seq, evt) for t, seq, evt in self._timers]
+                self._abandoned = {seq: t + shift for seq, t in self._abandoned.items()}
+        self._tick = tick
+
+        timers = self._timers
+        while timers and timers[0][0] <= tick:
+            heapq.heappop(timers)[2].set()
+
+        if self._abandoned:
+            for seq, t in list(self._abandoned.items()):
+                if t + self.ABANDON_TICKS < tick:
+                    self._drop_reply(seq)
+
+        self.timers.advance(tick, msg.date)
+
     async def tick_wait(self, ticks):
         """
         Wait for this number of game ticks to pass.
 
-        TODO. For the moment we're lazy and ignore both fast-forward mode
-        and getting paused while sleeping.
+        The game's tick counter doesn't advance while it's paused, and
+        runs faster in fast-forward mode.
         """
-        while self.pause_state is None or self.pause_state != openttd.internal.PauseState.UNPAUSED:
-            await self._pause_change.wait()
-
-        await anyio.sleep(ticks/74)
+        if ticks <= 0:
+            await anyio.sleep(0)
+            return
+        evt = anyio.Event()
+        self._timer_seq += 1
+        heapq.heappush(self._timers, (self.tick + ticks, self._timer_seq, evt))
+        await evt.wait()
 
     @property
     @contextmanager
@@ -669,6 +1543,18 @@ class Main:
             else:
                 self.print(f"{a}: Unknown script ID.")
 
+    def cmd_cpu(self, args):
+        """Show the scripts' CPU and game lock usage.
+
+        Scripts that exceed their per-tick budget (CPU_BUDGET and
+        LOCK_BUDGET) are throttled.
+        """
+        if not self._code:
+            self.print("No scripts are active.")
+            return
+        for id_,scr in self._code.items():
+            self.print(f"{id_}:", scr.budget.info())
+
     def cmd_state(self, args):
         """Show script status (as suitable for restoring).
 
@@ -689,6 +1575,97 @@ class Main:
             raise ValueError("Usage: py state ID")
         self.pprint(self.code[int(args[0])].dump())
 
+    def cmd_stats(self, args):
+        """Show API call statistics.
+
+        Arguments:
+        * the number of functions to show (default 20)
+        * "all" to show all of them
+        * "reset" to clear the counters afterwards
+        * "wait" or "calls" to sort by that instead of lock time
+        """
+        n = 20
+        reset = False
+        key = "hold"
+        for a in args:
+            if a == "reset":
+                reset = True
+            elif a == "all":
+                n = None
+            elif a in ("wait", "calls"):
+                key = a
+            else:
+                n = int(a)
+
+        stats = _ttd.support.stats(reset=reset)
+        if not stats:
+            self.print("No API calls.")
+            return
+        stats.sort(key=lambda st: st[key], reverse=True)
+        if n is not None:
+            stats = stats[:n]
+
+        maxlen = max(len(st["name"]) for st in stats)
+        self.print(f"{'function' :{maxlen}s}    calls   hold/ms avg/us max/us  wait/ms  nogil/ms")
+        for st in stats:
+            self.print(f"{st['name'] :{maxlen}s} {st['calls'] :8d} {st['hold']*1e3 :9.1f} {st['hold']/st['calls']*1e6 :6.1f} {st['max_hold']*1e6 :6.0f} {st['wait']*1e3 :8.1f} {st['released']*1e3 :9.1f}")
+
+    def cmd_cmds(self, args):
+        """Show the scripts' command windows, the estimate cache, and
+        the messages waiting for Python."""
+        for w in sorted(self._windows, key=lambda w: w.name):
+            self.print(f"{w.name}: {w.info()}")
+        c = estimate_cache
+        self.print(f"Estimates: {c.hits} cached, {c.misses} computed")
+        q = openttd.internal.task.queue_stats()
+        dropped = q.pop("dropped")
+        self.print("Queue: " + ", ".join(f"{k} {v}" for k,v in q.items()) + f"; {dropped} traces dropped")
+
+    def cmd_jobs(self, args):
+        """Show the worker pools for subthreads."""
+        for p in sorted(self._pools, key=lambda p: p.name):
+            self.print(f"{p.name}: {p.info()}")
+
+    def cmd_timers(self, args):
+        """Show the scheduled jobs.
+
+        Arguments:
+        * "all": list them.
+        """
+        self.print(self.timers.info())
+        if args[:1] == ["all"]:
+            for job in sorted(self.timers.jobs, key=lambda j: (j.interval is None, j.due)):
+                self.print(f"  {job !r}: {job.runs} runs, {job.skipped} skipped")
+
+    def cmd_msgs(self, args):
+        """Show the message handlers' load."""
+        for line in self._dispatch.info():
+            self.print(line)
+
+    def cmd_record(self, args):
+        """Record the commands our scripts execute.
+
+        Arguments:
+        * the file to write to; without one, stop recording.
+
+        Use the script "openttd.lib.cmdlog" to replay the log.
+        """
+        if (rec := self._stop_recording()) is not None:
+            self.print(f"{rec.path}: {rec.count} commands recorded.")
+        if args:
+            from openttd.lib.cmdlog import Recorder
+            self._recorder = Recorder(args[0])
+            self.print(f"{args[0]}: recording.")
+
+    def _stop_recording(self) -> Recorder|None:
+        """
+        Close the command recorder, if any; return it.
+        """
+        rec, self._recorder = self._recorder, None
+        if rec is not None:
+            rec.close()
+        return rec
+
     def cmd_reload(self, args):
         """Reload Python module(s).
 
@@ -37,6 +37,9 @@ def ModeChange(self,main) -> _Awaitable:
 def PauseState(self,main) -> _Awaitable:
     return main.set_pause_state(self.paused)
 
+def Tick(self,main) -> None:
+    main.handle_tick(self)
+
 def Stop(self,main) -> _Never:
     raise RuntimeError("This message must be caught earlier!")
 
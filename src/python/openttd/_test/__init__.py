@@ -50,6 +50,17 @@ class TestScript(BaseScript):
         raise NotImplementedError(f"Please fix test {self.__module__ !r}")
 
 
+def _missing(modules) -> list[str]:
+    # A test's module may list the optional modules it needs in REQUIRES.
+    res = []
+    for m in modules:
+        try:
+            import_module(m)
+        except ImportError:
+            res.append(m)
+    return res
+
+
 async def run(main, *tests):
     if not tests:
         print("Available tests ('all' runs them in-order):")
@@ -84,6 +95,9 @@ error       triggers an exception (to test error handling)""")
             continue
         print(f"* Test: {t}{' (final, exiting)' if t == 'delay' else ''}", file=sys.stderr)
         mod = import_module(f"openttd._test.{t}")
+        if (missing := _missing(getattr(mod, "REQUIRES", ()))):
+            print(f"  … SKIPPED: {', '.join(missing)} not available.", file=sys.stderr)
+            continue
         script = mod.Script
         val = await main.do_start(script, company=getattr(mod,"COMPANY",Company(1)))
         await val.event.wait()
@@ -98,5 +112,20 @@ TESTS = [
     "company",
     "town",
     "roadpath",
+    "getters",
+    "lists",
+    "bulk",
+    "mapsnap",
+    "roadpool",
+    "pipeline",
+    "paused",
+    "window",
+    "estimate",
+    "cmdlog",
+    "msgs",
+    "dispatch",
+    "budget",
+    "jobs",
+    "timers",
     "delay",  # must be last, as it shuts down OpenTTD
 ]
@@ -0,0 +1,80 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+CPU and lock budgets: busy subthreads get throttled.
+"""
+
+from __future__ import annotations
+
+import time
+import openttd
+from openttd._main import _main
+from openttd.base import BaseScript, Budget, test_stop
+from . import TestScript
+
+class Script(TestScript):
+    ASYNC=True
+    CPU_BUDGET=0.001
+    LOCK_BUDGET=0.001
+
+    async def test(self):
+        assert BaseScript.CPU_BUDGET is None, BaseScript.CPU_BUDGET
+        assert BaseScript.LOCK_BUDGET is None, BaseScript.LOCK_BUDGET
+
+        b = self.budget
+        await self.subthread(self.busy)
+        assert b.throttled > 0 and b.throttle_ticks > 0, b.info()
+
+        await self.subthread(self.locked)
+
+        # Timer jobs are measured too.
+        n = b.cpu_total
+        hits = []
+        self.at_tick(_main.get().tick+2, self.spin, hits)
+        await self.sleep(5)
+        assert hits, hits
+        assert 0.02 <= b.cpu_total - n < 1, (n, b.info())
+
+        self.reset()
+
+    def reset(self):
+        # Loading a game sets the tick counter back. An overrun from
+        # before doesn't keep the script waiting until the counter
+        # catches up.
+        b = Budget(0.001, None)
+        b._refill(1000)
+        b.cpu_used = 1.0
+        assert b._over()
+        b._refill(10)
+        assert b.tick == 10 and not b._over(), (b.tick, b.cpu_used)
+        b.cpu_used = 0.0025
+        b._refill(12)
+        assert b.tick == 12 and abs(b.cpu_used - 0.0005) < 1e-9, (b.tick, b.cpu_used)
+
+    def spin(self, hits):
+        t = time.thread_time()
+        while time.thread_time() - t < 0.03:
+            test_stop()
+        hits.append(1)
+
+    def busy(self):
+        t = time.thread_time()
+        while time.thread_time() - t < 0.2:
+            test_stop()
+
+    def locked(self):
+        # Inside the block the overrun is charged, but nobody sleeps.
+        b = self.budget
+        n, m = b.throttle_ticks, b.throttled
+        with openttd.game_lock():
+            t = time.thread_time()
+            while time.thread_time() - t < 0.05:
+                openttd._.Tile(10,10).min_height
+                test_stop()
+            assert b.throttle_ticks == n, (n, b.info())
+            assert b.throttled > m, (m, b.info())
+        assert b.throttle_ticks > n, (n, b.info())
@@ -0,0 +1,32 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test bulk tile queries against single API calls.
+"""
+from __future__ import annotations
+
+import openttd
+from . import TestScript
+
+REQUIRES = ["numpy"]
+
+PROPS = ["is_buildable", "slope", "min_height", "owner", "is_road", "terrain"]
+
+class Script(TestScript):
+    def test(self):
+        tiles = openttd.tile.Tiles()
+        for x in range(20,30):
+            for y in range(20,30):
+                tiles.add(openttd._.Tile(x,y))
+
+        res = tiles.query(PROPS)
+        assert len(res) == len(tiles), (len(res), len(tiles))
+        with openttd.game_lock():
+            for row in res:
+                t = openttd._.Tile(int(row["tile"]))
+                for p in PROPS:
+                    assert row[p] == int(getattr(t,p)), (t,p,row[p],getattr(t,p))
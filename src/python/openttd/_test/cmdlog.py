@@ -0,0 +1,47 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Command recorder: record a command and read it back.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import openttd
+from openttd._main import _main
+from openttd.lib.cmdlog import Recorder, read_log
+from . import TestScript
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        main = _main.get()
+        fd, path = tempfile.mkstemp(suffix=".cmdlog")
+        os.close(fd)
+        try:
+            main.cmd_record([path])
+            try:
+                sign = await openttd._.Tile(45,45).Sign("recorded")
+            finally:
+                main.cmd_record([])
+            assert main._recorder is None
+            await sign.remove()
+
+            recs = list(read_log(path))
+            assert len(recs) == 1, recs
+            assert recs[0].success and recs[0].data, recs[0]
+            assert recs[0].company == int(self.company), (recs[0], self.company)
+
+            # Companies like INVALID are negative
+            rec = Recorder(path)
+            rec.record(1, 2, -1, False, -5, b"xyz")
+            rec.close()
+            recs = list(read_log(path))
+            assert [(r.tick, r.cmd, r.company, r.success, r.cost, r.data) for r in recs] == [(1, 2, -1, False, -5, b"xyz")], recs
+        finally:
+            os.unlink(path)
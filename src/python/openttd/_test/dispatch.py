@@ -0,0 +1,93 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Message dispatcher: bounded queues, and ordered lanes per key.
+"""
+
+from __future__ import annotations
+
+import anyio
+import random
+from openttd._main import Dispatcher
+from . import TestScript
+
+class Free:
+    def __init__(self, n):
+        self.n = n
+
+class Ordered:
+    def __init__(self, key, n):
+        self.key = key
+        self.n = n
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        await self.bounded()
+        await self.ordered()
+
+    async def bounded(self):
+        gate = anyio.Event()
+        seen = []
+        async def handler(msg):
+            await gate.wait()
+            seen.append(msg.n)
+
+        async with anyio.create_task_group() as tg:
+            d = Dispatcher(tg, handler, {"Free": 1}, depth=2)
+            # one running, two queued
+            for n in range(3):
+                with anyio.fail_after(1):
+                    await d.put(Free(n))
+                await anyio.sleep(0.01)
+            with anyio.move_on_after(0.1) as sc:
+                await d.put(Free(99))
+            assert sc.cancelled_caught, "queue not bounded"
+
+            gate.set()
+            with anyio.fail_after(1):
+                await d.put(Free(3))
+                while len(seen) < 4:
+                    await anyio.sleep(0.01)
+            tg.cancel_scope.cancel()
+        assert seen == [0,1,2,3], seen
+
+    async def ordered(self):
+        seen = {"a": [], "b": []}
+        async def handler(msg):
+            await anyio.sleep(random.random() / 100)
+            seen[msg.key].append(msg.n)
+
+        async with anyio.create_task_group() as tg:
+            d = Dispatcher(tg, handler, {}, ordered={"Ordered"})
+            for n in range(20):
+                for k in "ab":
+                    await d.put(Ordered(k, n), k)
+            lane = d._serial["a"][0]
+
+            with anyio.fail_after(5):
+                while d.pending["Ordered"]:
+                    await anyio.sleep(0.01)
+            assert seen == {"a": list(range(20)), "b": list(range(20))}, seen
+
+            # Idle lanes are removed, and their streams closed
+            await anyio.sleep(0.01)
+            assert not d._serial, d._serial
+            try:
+                lane.send_nowait(Ordered("a", 99))
+            except anyio.ClosedResourceError:
+                pass
+            else:
+                raise AssertionError("idle lane not closed")
+
+            # A new lane starts when needed
+            await d.put(Ordered("a", 20), "a")
+            with anyio.fail_after(1):
+                while d.pending["Ordered"]:
+                    await anyio.sleep(0.01)
+            assert seen["a"][-1] == 20, seen
+            tg.cancel_scope.cancel()
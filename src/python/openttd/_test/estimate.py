@@ -0,0 +1,44 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test mode: cached results restore the last cost and error.
+"""
+from __future__ import annotations
+
+import openttd
+from openttd._main import _storage
+from openttd._util import estimate_cache
+from openttd.road import RoadType
+from . import TestScript
+
+class Script(TestScript):
+    def test(self):
+        spot = None
+        for y in range(20, 60):
+            for x in range(20, 60):
+                a, b = openttd._.Tile(x,y), openttd._.Tile(x+1,y)
+                if a.is_buildable and b.is_buildable and not a.slope and not b.slope:
+                    spot = a, b
+                    break
+            if spot:
+                break
+        assert spot is not None, "no space for a road"
+        a, b = spot
+        RoadType.set_current(RoadType.ROAD)
+        sto = _storage.get()
+
+        # Lock the game so that both calls happen in the same tick.
+        with openttd.game_lock(), openttd.test_mode():
+            hits = estimate_cache.hits
+            assert a.build_road_to(b)
+            cost, err = sto.last_cost, sto.last_error
+            assert cost > 0, cost
+
+            sto.last_cost = 0
+            assert a.build_road_to(b)
+            assert estimate_cache.hits == hits+1, (estimate_cache.hits, hits)
+            assert (sto.last_cost, sto.last_error) == (cost, err), (sto.last_cost, sto.last_error, cost, err)
@@ -0,0 +1,113 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test getters with and without the game lock, and from parallel threads.
+"""
+from __future__ import annotations
+
+import _ttd
+import anyio
+import openttd
+import time
+from openttd._main import _main
+from openttd.base import test_stop
+from openttd._util import _WrappedList
+from openttd.town import Town
+from . import TestScript
+
+N_THREADS = 4
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        await self.subthread(self.check_lock)
+        with anyio.fail_after(10):
+            await self.subthread(self.check_release)
+
+        # Several threads reading at the same time get the same data as
+        # one thread. Tile properties share the game lock, town names
+        # (strings) take it exclusively.
+        rows = range(10, 10+4*N_THREADS)
+        serial = await self.subthread(self.read_map, rows)
+        res = [None] * N_THREADS
+        async def reader(i):
+            res[i] = await self.subthread(self.read_map, rows[i::N_THREADS])
+        async with anyio.create_task_group() as tg:
+            for i in range(N_THREADS):
+                tg.start_soon(reader, i)
+        parallel = {}
+        for r in res:
+            parallel.update(r)
+        assert parallel == serial, (parallel, serial)
+
+    def read_map(self, rows):
+        res = {}
+        for y in rows:
+            test_stop()
+            for x in range(10, 60):
+                t = openttd._.Tile(x, y)
+                town = t.closest_town
+                res[x, y] = (t.min_height, t.slope, t.terrain, town, town.name)
+        return res
+
+    def check_release(self):
+        # A lock session lets the game run when the thread calls
+        # `test_stop` or waits for the event loop, even if it doesn't
+        # call the API.
+        main = _main.get()
+        with openttd.game_lock(max_hold=0.01):
+            openttd._.Tile(10, 10).min_height
+            tick = main.tick
+            self.sleep(2)
+            assert main.tick >= tick+2, (tick, main.tick)
+
+            openttd._.Tile(10, 10).min_height
+            tick = main.tick
+            t = time.monotonic()
+            while main.tick < tick+2:
+                assert time.monotonic() - t < 5, (tick, main.tick)
+                test_stop()
+
+    def check_lock(self):
+        m = _ttd.script.map
+        sx, sy = m.get_map_size_x(), m.get_map_size_y()
+        towns = [Town(t) for t in _WrappedList(_ttd.script.townlist.List())]
+        assert towns, "no towns"
+
+        # The map functions don't lock, thus they're not counted
+        _ttd.support.stats(reset=True)
+        tile = m.get_tile_index(30, 40)
+        assert (m.get_tile_x(tile), m.get_tile_y(tile)) == (30, 40), tile
+        assert m.get_map_size() == sx*sy, (m.get_map_size(), sx, sy)
+        assert m.is_valid_tile(tile) and not m.is_valid_tile(sx*sy), tile
+        names = {st["name"] for st in _ttd.support.stats()}
+        assert not any(n.startswith("map.") for n in names), names
+
+        def read():
+            return (
+                [(t.tile, Town.is_valid(t)) for t in towns],
+                [openttd._.Tile(x, 20).min_height for x in range(10, 40)],
+            )
+
+        # Same results within a lock session and outside of one
+        with openttd.game_lock():
+            inside = read()
+        outside = read()
+        assert inside == outside, (inside, outside)
+        assert not Town.is_valid(max(towns)+1000), max(towns)
+
+        st = {st["name"]: st for st in _ttd.support.stats(reset=True)}
+        assert st["town.get_location"]["calls"] == 2*len(towns), st["town.get_location"]
+        assert st["tile.get_min_height"]["calls"] == 60, st["tile.get_min_height"]
+        for s in st.values():
+            assert sum(s["hist"]) == s["calls"], s
+            assert 0 <= s["max_hold"] <= s["hold"], s
+            assert s["wait"] >= 0 and s["released"] >= 0, s
+
+        # the counters were reset
+        names = {st["name"] for st in _ttd.support.stats()}
+        assert "town.get_location" not in names, names
@@ -0,0 +1,55 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Job pools: nested subthreads don't deadlock, timer jobs use the pool.
+"""
+
+from __future__ import annotations
+
+import anyio
+from openttd._main import _main
+from openttd.base import test_stop
+from . import TestScript
+
+N = 4
+
+class Script(TestScript):
+    ASYNC=True
+    JOB_THREADS=2
+
+    async def test(self):
+        pool = self.jobs
+        assert pool.size == 2, pool.info()
+
+        # More parents than slots, and each waits for its children.
+        res = {}
+        async def one(i):
+            res[i] = await self.subthread(self.parent, i)
+        with anyio.fail_after(30):
+            async with anyio.create_task_group() as tg:
+                for i in range(N):
+                    tg.start_soon(one, i)
+        assert res == {i: [i*10, i*10+1+100] for i in range(N)}, res
+        assert pool.running == 0, pool.info()
+
+        # Timer jobs run in the script's pool.
+        n = pool.submitted
+        hits = []
+        self.at_tick(_main.get().tick+2, hits.append, 1)
+        await self.sleep(5)
+        assert hits == [1], hits
+        assert pool.submitted > n, pool.info()
+
+    def parent(self, i):
+        hlts = [self.subthread(self.child, i*10+j, j) for j in range(2)]
+        return [h.wait() for h in hlts]
+
+    def child(self, v, depth):
+        test_stop()
+        if depth:
+            return self.subthread(self.child, v+100, depth-1).wait()
+        return v
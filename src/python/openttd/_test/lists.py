@@ -0,0 +1,68 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test reading script lists in one go, and native list queries.
+"""
+from __future__ import annotations
+
+import _ttd
+import openttd
+from openttd._util import _WrappedList
+from openttd.town import Town
+from . import TestScript
+
+class Script(TestScript):
+    def test(self):
+        # the slow way
+        data = _ttd.script.townlist.List()
+        walked = []
+        item = data.begin()
+        while not data.is_end():
+            walked.append(item)
+            item = data.next()
+        assert len(walked) == data.count() > 1, walked
+
+        items = memoryview(data.to_array()).cast("q").tolist()
+        assert items == walked, (items, walked)
+
+        wl = _WrappedList(data)
+        assert len(wl) == len(walked), (len(wl), walked)
+        assert list(wl) == walked, (list(wl), walked)
+        assert wl[-1] == walked[-1], (wl[-1], walked)
+        assert wl.items() == [(i, data.get_value(i)) for i in walked], wl.items()
+
+        # native queries: same result as doing it in Python.
+        # Lock the game so that no town grows in between.
+        with openttd.game_lock():
+            pops = {t: Town(t).population for t in walked}
+            res = Town.query().valuate("town.population").top(3).run()
+            assert [p for _,p in res] == sorted(pops.values(), reverse=True)[:3], (res, pops)
+            assert all(isinstance(t, Town) and pops[t] == p for t,p in res), res
+
+            limit = sorted(pops.values())[len(pops)//2]
+            res = Town.query().valuate("town.population").keep_above(limit).run()
+            assert sorted(t for t,_ in res) == sorted(t for t,p in pops.items() if p > limit), (res, limit, pops)
+
+            tile = openttd._.Tile(30,30)
+            res = Town.query().valuate("town.distance_manhattan", tile).bottom(1).run()
+            best = min(Town(t).d_manhattan(tile) for t in walked)
+            assert len(res) == 1 and res[0][1] == best, (res, best)
+
+        # A wrapper that ran a query shows the list's new contents
+        wl = _WrappedList(_ttd.script.townlist.List())
+        assert len(wl) == len(walked), (len(wl), walked)
+        res = wl.query().valuate("town.population").top(2).run()
+        assert len(wl) == 2, (list(wl), res)
+        assert sorted(wl) == sorted(t for t,_ in res), (list(wl), res)
+        assert wl[0] in (t for t,_ in res), (list(wl), res)
+
+        try:
+            Town.query().valuate("town.no_such_thing").run()
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("Unknown valuator accepted")
@@ -0,0 +1,96 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test map snapshots against single API calls, and incremental updates.
+"""
+from __future__ import annotations
+
+import _ttd
+import openttd
+import openttd.map
+from openttd.road import RoadType
+from . import TestScript
+
+REQUIRES = ["numpy"]
+
+PROPS = ["min_height", "slope", "owner"]
+
+class Script(TestScript):
+    def test(self):
+        snap = openttd.map.snapshot(PROPS)
+        try:
+            sx, sy = snap.size_x, snap.size_y
+            assert (sx, sy) == (_ttd.script.map.get_map_size_x(), _ttd.script.map.get_map_size_y()), (sx, sy)
+
+            spots = ((1,1), (20,30), (sx-2,sy-2))
+            with openttd.game_lock():
+                for x,y in spots:
+                    t = openttd._.Tile(x,y)
+                    for p in PROPS:
+                        v = snap.layer(p)[y,x]
+                        assert v == int(getattr(t,p)), (t,p,v,getattr(t,p))
+
+            # refreshing a rectangle touches that rectangle only
+            layer = snap.layer("min_height")
+            for y in range(10,14):
+                for x in range(10,14):
+                    layer[y,x] = 255
+            snap.refresh(11, 11, 2, 2, layers=["min_height"])
+            with openttd.game_lock():
+                for x,y in ((11,11), (12,12)):
+                    assert layer[y,x] == openttd._.Tile(x,y).min_height, (x,y,layer[y,x])
+            assert layer[10,10] == 255, layer[10,10]
+            assert layer[13,12] == 255, layer[13,12]
+            del layer
+            snap.refresh()
+
+            for x,y,w,h in ((sx-1,0,2,1), (0,sy-1,1,2), (1,0,2**32-1,1), (0,1,1,2**32-1)):
+                try:
+                    snap.refresh(x,y,w,h)
+                except ValueError:
+                    pass
+                else:
+                    raise AssertionError(f"Rectangle {(x,y,w,h)} is out of bounds")
+
+            try:
+                _ttd.bulk.fill_map(["slope"], [bytearray(10)], 0, 0, 1, 1)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("Wrong buffer size accepted")
+        finally:
+            snap.close()
+            snap.unlink()
+
+        # Dropping a tracking snapshot frees its slot
+        for _ in range(10):
+            snap = openttd.map.snapshot(["slope"], track=True)
+            snap.unlink()
+            del snap
+
+        # A new road shows up in the next update
+        snap = openttd.map.snapshot(["road_bits", "is_buildable", "slope"], track=True)
+        try:
+            bld, sl = snap.layer("is_buildable"), snap.layer("slope")
+            spot = next(((x,y) for y in range(20, snap.size_y-20) for x in range(20, snap.size_x-20)
+                    if bld[y,x] and bld[y,x+1] and not sl[y,x] and not sl[y,x+1]), None)
+            del bld, sl
+            assert spot is not None, "no space for a road"
+            x,y = spot
+
+            RoadType.set_current(RoadType.ROAD)
+            a = openttd._.Tile(x,y)
+            assert a.build_road_to(a+(1,0))
+
+            rects = snap.update()
+            assert any(rx <= x < rx+rw and ry <= y < ry+rh for rx,ry,rw,rh in rects), (x,y,rects)
+            assert snap.layer("road_bits")[y,x], (x,y)
+            # nothing changed since
+            assert not any(rx <= x < rx+rw and ry <= y < ry+rh for rx,ry,rw,rh in snap.update()), (x,y)
+        finally:
+            snap.close()
+            snap.unlink()
@@ -0,0 +1,53 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Message delivery from OpenTTD: many results at once, game ticks, and
+prompt wakeups of the event loop.
+"""
+
+from __future__ import annotations
+
+import anyio
+import openttd
+import sys
+from openttd._main import _main
+from . import TestScript
+
+N = 50
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        main = _main.get()
+        pos = openttd._.Tile(60,60)
+
+        # Many results arrive in a few batches; none may get lost.
+        with anyio.fail_after(10):
+            res = [(pos+(i%10,i//10)).Sign(f"msg {i}") for i in range(N)]
+            signs = [await r for r in res]
+        assert all(signs) and len(set(signs)) == N, signs
+        for s in signs:
+            assert await s.remove()
+        st = openttd.internal.task.queue_stats()
+        assert st["result"] == 0, st
+
+        # The tick counter keeps going.
+        tick = main.tick
+        with anyio.fail_after(10):
+            await self.sleep(3)
+        assert main.tick >= tick+3, (main.tick, tick)
+
+        # The event loop watches a descriptor, except on Windows, and
+        # wakes up as soon as a result is queued.
+        if sys.platform != "win32":
+            assert openttd.internal.task.fileno() >= 0
+        for _ in range(5):
+            t = anyio.current_time()
+            sign = await pos.Sign("quick")
+            t = anyio.current_time() - t
+            assert t < 0.5, t
+            assert await sign.remove()
@@ -0,0 +1,69 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Commands that are rejected while the game is paused fail right away,
+and don't steal the result of a later identical command. Results don't
+overtake pause changes.
+"""
+
+from __future__ import annotations
+
+import _ttd
+import anyio
+import openttd
+from openttd._main import _main
+from openttd._util import with_
+from openttd.error import TTDCommandError
+from openttd.road import RoadType
+from . import TestScript
+
+# Pausing requires a game script.
+COMPANY = None
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        main = _main.get()
+        spot = None
+        for y in range(20, 60):
+            for x in range(20, 60):
+                a, b = openttd._.Tile(x,y), openttd._.Tile(x+1,y)
+                if a.is_buildable and b.is_buildable and not a.slope and not b.slope:
+                    spot = a, b
+                    break
+            if spot:
+                break
+        assert spot is not None, "no space for a road"
+        a, b = spot
+        RoadType.set_current(RoadType.ROAD)
+
+        await with_(None, _ttd.script.game.pause)
+        try:
+            with anyio.fail_after(5):
+                # Signs may be placed while paused. OpenTTD reports the
+                # pause before it runs this command, so the pause change
+                # has been handled when the result arrives.
+                sign = await a.Sign("paused")
+                assert main.paused
+                assert await sign.remove()
+
+                # Landscaping isn't allowed while paused. The command
+                # never runs, but we still get an answer.
+                try:
+                    await a.build_road_to(b)
+                except TTDCommandError:
+                    pass
+                else:
+                    raise AssertionError("Built a road while paused")
+        finally:
+            await with_(None, _ttd.script.game.unpause)
+
+        with anyio.fail_after(5):
+            while main.paused:
+                await anyio.sleep(0.05)
+        assert await a.build_road_to(b)
+        assert a.is_road, a
@@ -0,0 +1,41 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Command pipelining test: identical commands may be in flight concurrently,
+and commands can be sent in batches.
+"""
+
+from __future__ import annotations
+
+import openttd
+from . import TestScript
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        pos = openttd._.Tile(40,40)
+
+        # Don't await the first before sending the second
+        r1 = pos.Sign("twin")
+        r2 = pos.Sign("twin")
+        s1 = await r1
+        s2 = await r2
+        assert s1 and s2 and s1 != s2, (s1,s2)
+
+        signs = pos.signs
+        assert len(signs) == 2, signs
+        for s in signs:
+            res = await s.remove()
+            assert res
+
+        async with openttd.command_batch() as batch:
+            res = [(pos+(i,0)).Sign(f"batch {i}") for i in range(5)]
+        assert len(batch.results) == 5, batch.results
+        signs = [await r for r in res]
+        assert all(signs), signs
+        for s in signs:
+            assert await s.remove()
@@ -0,0 +1,74 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Road path searches in worker processes, on a map snapshot.
+"""
+from __future__ import annotations
+
+import anyio
+from openttd.tile import Tile
+from openttd.lib.pathfinder.pool import RoadPathPool
+from . import TestScript
+
+ROUTES = [
+    ((50,105), (70,100)),
+    ((40,55), (45,75)),
+    ((80,31), (67,32)),
+]
+
+class Crash:
+    # The worker can't unpickle this: it doesn't import openttd.
+    pass
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        with anyio.fail_after(60):
+            async with RoadPathPool(workers=2) as pool:
+                # one at a time
+                paths = []
+                for a,b in ROUTES:
+                    path = await pool.find([Tile(*a)], [Tile(*b)])
+                    assert path is not None, (a,b)
+                    steps = list(path)
+                    assert steps[0].t == Tile(*a), (a, steps[0])
+                    assert steps[-1].t == Tile(*b), (b, steps[-1])
+                    paths.append([s.t for s in steps])
+
+                # more at once than there are workers: same result, and
+                # the snapshot isn't updated under running searches
+                update = pool.snapshot.update
+                def checked_update():
+                    assert not pool._pending, pool._pending
+                    return update()
+                pool.snapshot.update = checked_update
+                res = {}
+                async def one(i, a, b):
+                    res[i] = [s.t for s in await pool.find([Tile(*a)], [Tile(*b)])]
+                async with anyio.create_task_group() as tg:
+                    for i,(a,b) in enumerate(ROUTES):
+                        tg.start_soon(one, i, a, b)
+                assert [res[i] for i in range(len(ROUTES))] == paths, (res, paths)
+                assert pool.searches == pool.found == 2*len(ROUTES), (pool.searches, pool.found)
+
+        # A worker that dies fails the search instead of leaving the
+        # caller hanging, and the pool refuses further work.
+        a,b = ROUTES[0]
+        with anyio.fail_after(30):
+            async with RoadPathPool(workers=1) as pool:
+                try:
+                    await pool.find([Tile(*a)], [Tile(*b)], cost_turn=Crash())
+                except RuntimeError:
+                    pass
+                else:
+                    raise AssertionError("A dead worker found a path")
+                try:
+                    await pool.find([Tile(*a)], [Tile(*b)])
+                except RuntimeError:
+                    pass
+                else:
+                    raise AssertionError("A broken pool found a path")
@@ -0,0 +1,106 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Tick timers: sleep, periodic and one-shot jobs, and counter resets.
+"""
+
+from __future__ import annotations
+
+import anyio
+from openttd._main import _main, Main, TickScheduler
+from . import TestScript
+
+class Tick:
+    # a fake tick message
+    def __init__(self, tick, date=0):
+        self.tick = tick
+        self.date = date
+
+class Script(TestScript):
+    ASYNC=True
+    async def test(self):
+        main = _main.get()
+
+        t = main.tick
+        await self.sleep(5)
+        assert main.tick >= t+5, (t, main.tick)
+
+        hits = []
+        job = self.every(2, hits.append, "x", first=1)
+        await self.sleep(10)
+        job.cancel()
+        assert 4 <= len(hits) <= 6, hits
+        n = len(hits)
+        await self.sleep(4)
+        assert len(hits) == n, hits
+
+        once = []
+        self.at_tick(main.tick+3, once.append, 1)
+        await self.sleep(6)
+        assert once == [1], once
+
+        await self.sleep_reset()
+        await self.job_reset()
+
+    async def sleep_reset(self):
+        # A separate Main, so that we don't confuse the real one
+        m = Main()
+        m.handle_tick(Tick(1000))
+        woke = []
+        async def sleeper(n):
+            await m.tick_wait(n)
+            woke.append(n)
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(sleeper, 5)
+            tg.start_soon(sleeper, 50)
+            await anyio.sleep(0.01)
+            m.handle_tick(Tick(1002))
+
+            # New game: 3 and 48 ticks to go
+            m.handle_tick(Tick(10))
+            await anyio.sleep(0.01)
+            assert woke == [], woke
+            m.handle_tick(Tick(13))
+            await anyio.sleep(0.01)
+            assert woke == [5], woke
+            m.handle_tick(Tick(57))
+            await anyio.sleep(0.01)
+            assert woke == [5], woke
+            m.handle_tick(Tick(58))
+            await anyio.sleep(0.01)
+            assert woke == [5, 50], woke
+
+    async def job_reset(self):
+        sched = TickScheduler()
+        hits = []
+        async def wait_for(n):
+            with anyio.fail_after(2):
+                while len(hits) < n:
+                    await anyio.sleep(0.01)
+            await anyio.sleep(0.05)
+            assert len(hits) == n, hits
+
+        async with anyio.create_task_group() as tg:
+            sched.advance(1000, 0)
+            job = sched.every(10, hits.append, ("p",), first=10, tg=tg)
+            sched.at_tick(1005, hits.append, ("o",), tg=tg)
+            sched.advance(1002, 0)
+
+            # New game: 3 and 8 ticks to go
+            sched.advance(20, 0)
+            await wait_for(0)
+            sched.advance(23, 0)
+            await wait_for(1)
+            assert hits == ["o"], hits
+            sched.advance(28, 0)
+            await wait_for(2)
+            assert job.due == 38, job
+            sched.advance(38, 0)
+            await wait_for(3)
+            assert hits == ["o", "p", "p"], hits
+            job.cancel()
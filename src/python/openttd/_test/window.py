@@ -0,0 +1,78 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Command window test: a flood of commands, and batches, never have more
+than CMD_WINDOW commands in flight, and threads sending commands at
+the same time get the right results.
+"""
+
+from __future__ import annotations
+
+import anyio
+import openttd
+from openttd._main import _cmd_window
+from . import TestScript
+
+N = 20
+N_THREADS = 4
+
+class Script(TestScript):
+    ASYNC=True
+    CMD_WINDOW=4
+
+    async def test(self):
+        window = _cmd_window.get()
+        assert window.size == self.CMD_WINDOW, window.size
+        pos = openttd._.Tile(50,50)
+        peak = 0
+
+        # Commands beyond the window are sent even if nobody awaits them.
+        sent = window.sent
+        res = []
+        for i in range(N):
+            res.append((pos+(i,0)).Sign(f"flood {i}"))
+            peak = max(peak, window.in_flight)
+        with anyio.fail_after(10):
+            while window.in_flight or window.sent < sent+N:
+                peak = max(peak, window.in_flight)
+                await anyio.sleep(0.01)
+        assert peak == self.CMD_WINDOW, peak
+        assert window.waited > 0, window.info()
+
+        signs = [await r for r in res]
+        assert all(signs), signs
+        for s in signs:
+            assert await s.remove()
+
+        # A batch takes as many slots as the window has, not more.
+        sent = window.sent
+        async with openttd.command_batch() as batch:
+            res = [(pos+(i,1)).Sign(f"batch {i}") for i in range(N)]
+        assert window.sent == sent+self.CMD_WINDOW, (window.sent, sent)
+        assert window.in_flight == 0, window.info()
+        assert len(batch.results) == N, batch.results
+
+        signs = [await r for r in res]
+        assert all(signs), signs
+        for s in signs:
+            assert await s.remove()
+
+        # Threads sending at the same time get their own results.
+        res = {}
+        async def one(k):
+            res[k] = await self.subthread(self.place, pos+(0,2+k), k)
+        with anyio.fail_after(30):
+            async with anyio.create_task_group() as tg:
+                for k in range(N_THREADS):
+                    tg.start_soon(one, k)
+        for k in range(N_THREADS):
+            for i, s in enumerate(res[k]):
+                assert s.text == f"thread {k} {i}", (k, i, s.text)
+                assert await s.remove()
+
+    def place(self, pos, k):
+        return [(pos+(i,0)).Sign(f"thread {k} {i}") for i in range(N//N_THREADS)]
@@ -19,7 +19,7 @@ from attrs import define,field,validators
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from typing import Callable
+    from typing import Any, Callable
 
 _assigned = set()
 
@@ -59,6 +59,75 @@ class StringTab:
         return res
 
 
+class _EstimateCache:
+    """
+    Results of API calls in test mode.
+
+    Entries are valid for one game tick. `Main.handle_result` clears the
+    cache whenever one of our commands has been executed, as it may have
+    changed the map.
+
+    A cache hit restores the storage's `last_cost` and `last_error`, as
+    the original call left them. Cached calls don't add to the storage's
+    cost accounting (`costs`), though.
+    """
+    def __init__(self):
+        self.tick = None
+        self.data = {}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.data.clear()
+
+    def key(self, sto, proc, a, kw):
+        # The current road and rail type affect some results.
+        try:
+            rt = sto.road_type
+        except ValueError:
+            rt = None
+        try:
+            tt = sto.rail_type
+        except ValueError:
+            tt = None
+        key = (proc, a, tuple(kw.items()), sto.company, rt, tt)
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def call(self, proc, a, kw):
+        tick = _ttd.support.get_game_tick()
+        if tick != self.tick:
+            self.data.clear()
+            self.tick = tick
+
+        from openttd._main import _storage
+        try:
+            sto = _storage.get()
+        except LookupError:
+            return proc(*a,**kw)
+
+        key = self.key(sto, proc, a, kw)
+        if key is None:
+            return proc(*a,**kw)
+        try:
+            res, sto.last_cost, sto.last_error = self.data[key]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            return res
+        self.misses += 1
+        res = proc(*a,**kw)
+        if not hasattr(res,"__await__"):
+            self.data[key] = (res, sto.last_cost, sto.last_error)
+        return res
+
+estimate_cache = _EstimateCache()
+
+
 def with_(Wrap:type, proc, *a, **kw):
     """
     Generate a result type or an error, whether or not we're in async context.
@@ -110,6 +179,9 @@ def with_(Wrap:type, proc, *a, **kw):
             breakpoint()
             raise TTDCommandError(proc,a,kw,result)
 
+    from openttd._main import estimating
+    if estimating.get():
+        return _resolve(estimate_cache.call(proc,a,kw))
     return _resolve(proc(*a,**kw))
 
 def unless(err, proc, *a, **kw):
@@ -160,35 +232,116 @@ class _Sub:
 class _WrappedList(Sequence):
     def __init__(self, data):
         self._data = data
-        self._cache = []
-        self._len = self._data.count()
+        self._cache = None
 
-    def _fill(self, i:int=None):
-        while len(self._cache) < self._len and (i is None or i >= len(self._cache)):
-            if self._cache:
-                nx = self._data.next()
-            else:
-                nx = self._data.begin()
-            self._cache.append(nx)
+    def _fill(self):
+        # Read the whole list in one go.
+        if self._cache is None:
+            self._cache = memoryview(self._data.to_array()).cast("q").tolist()
+        return self._cache
 
     def __getitem__(self, i):
-        if i < 0:
-            i = self._len + i
-        if len(self._cache) <= i:
-            self._fill(i)
-        return self._cache[i]
+        return self._fill()[i]
 
     def __len__(self):
-        return self._len
+        return len(self._fill())
 
     def __iter__(self):
-        self._fill()
-        return iter(self._cache)
+        return iter(self._fill())
 
     def get_value(self, k):
         "Retrieve the value associated with an item, *not* an index!"
         return self._data.get_value(k)
 
+    def items(self) -> list[tuple[int,int]]:
+        "Return all (item, value) pairs"
+        data = memoryview(self._data.items()).cast("q")
+        return list(zip(data[0::2], data[1::2]))
+
+    def query(self, wrap:Callable|None=None) -> ListQuery:
+        "Start a native query on this list"
+        return ListQuery(self._data, wrap, self._changed)
+
+    def _changed(self):
+        # a query modified the list
+        self._cache = None
+
+
+class ListQuery:
+    """
+    A chain of valuations and filters on a script list. The whole chain
+    runs natively, under a single game lock; only the surviving items
+    are returned.
+
+    Usage::
+
+        for town,pop in Town.query().valuate("town.population").keep_above(500).top(5):
+            ...
+
+    `valuate` uses a built-in valuator such as "town.population" or
+    "tile.distance_manhattan"; ``_ttd.script.list.List.valuators`` lists
+    them, with their number of arguments. Arguments may be objects that
+    convert to int, like tiles, towns or cargoes.
+
+    Note that running the query modifies the underlying list.
+    @changed, if given, is called when that happens.
+    """
+    def __init__(self, data, wrap:Callable|None=None, changed:Callable|None=None):
+        self._data = data
+        self._wrap = wrap
+        self._changed = changed
+        self._steps = []
+
+    def _add(self, *step):
+        self._steps.append(step)
+        return self
+
+    def valuate(self, valuator:str, *args) -> ListQuery:
+        "Set each item's value"
+        return self._add("valuate", valuator, *args)
+
+    def keep_above(self, value:int) -> ListQuery:
+        return self._add("keep_above", value)
+
+    def keep_below(self, value:int) -> ListQuery:
+        return self._add("keep_below", value)
+
+    def keep_between(self, low:int, high:int) -> ListQuery:
+        "Keep items with values between (excluding) @low and @high"
+        return self._add("keep_between", low, high)
+
+    def keep_value(self, value:int) -> ListQuery:
+        return self._add("keep_value", value)
+
+    def remove_value(self, value:int) -> ListQuery:
+        return self._add("remove_value", value)
+
+    def sort(self, by_value:bool=True, ascending:bool=True) -> ListQuery:
+        return self._add("sort", by_value, ascending)
+
+    def top(self, n:int) -> ListQuery:
+        "Keep the @n items with the highest values, largest first"
+        return self._add("sort", True, False)._add("keep_top", n)
+
+    def bottom(self, n:int) -> ListQuery:
+        "Keep the @n items with the lowest values, smallest first"
+        return self._add("sort", True, True)._add("keep_top", n)
+
+    def run(self) -> list[tuple[Any,int]]:
+        "Execute the query. Returns a list of (item, value) tuples."
+        try:
+            data = memoryview(self._data.query(self._steps)).cast("q")
+        finally:
+            if self._changed is not None:
+                self._changed()
+        items = data[0::2]
+        if self._wrap is not None:
+            items = map(self._wrap, items)
+        return list(zip(items, data[1::2]))
+
+    def __iter__(self):
+        return iter(self.run())
+
 class _ListWrap:
     def __init__(self, cls):
         self.cls = cls
@@ -273,7 +426,7 @@ def _cmd_data_repr(self):
 
 def _cmd_res_repr(self):
     "__repr__ for CmdResult"
-    return f"‹CmdRes:{self.cmd.name}:{self.resultdata !r}›"
+    return f"‹CmdRes:{self.seq}:{self.cmd.name}:{self.resultdata !r}›"
 
 
 def _importer(_ttd):
@@ -382,11 +535,14 @@ def _importer(_ttd):
 def _import2():
     "Adjustments that are also don in stub mode"
     from .base import test_stop
-    from ._main import test_mode, estimating
+    from ._main import test_mode, estimating, game_lock, command_batch, command_timeout
     import openttd as t
     import openttd.tile
     t.test_stop = test_stop
     t.test_mode = test_mode
+    t.game_lock = game_lock
+    t.command_batch = command_batch
+    t.command_timeout = command_timeout
     t.estimating = estimating
 
 #    t.tile.Transport = t.tile.TransportType
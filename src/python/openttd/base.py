@@ -12,23 +12,26 @@ This module implements basic modular scripting support.
 from __future__ import annotations
 
 import anyio
+import datetime
 import logging
 import threading
-from contextvars import ContextVar
+import time
+from contextvars import ContextVar, copy_context
+from functools import partial
 from contextlib import contextmanager
 from concurrent.futures import CancelledError
 
 import _ttd
 import openttd
-from ._main import _async, _storage, _main, estimating, VEvent, test_mode, _STOP
+from ._main import _async, _storage, _main, estimating, VEvent, test_mode, _STOP, _cmd_window, _cmd_timeout, _jobs, _budget, _from_thread, _from_thread_sync, CmdWindow, TimerJob, JobPool
 from .util import maybe_async_threaded
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
-    from typing import ClassVar
+    from typing import Callable, ClassVar
 
 
-__all__ = ["GameScript","AIScript"]
+__all__ = ["GameScript","AIScript","Budget"]
 
 SELF = ContextVar("SELF")
 
@@ -37,7 +40,11 @@ def test_stop():
     Test whether your code should stop.
 
     If so, it raises a cancellation error.
+
+    Within `openttd.game_lock`, this also lets the game run if the lock
+    has been held for too long.
     """
+    _ttd.object.LockSession.expire_all()
     _STOP.get()()
 
 def sleep(ticks:int):
@@ -59,7 +66,9 @@ class HLT:
 
         If it raised an exception, that exception will be re-raised.
         """
-        anyio.from_task.run(self.evt.wait)
+        # Don't hog a pool slot the subthread may need.
+        with JobPool.released():
+            _from_thread(self.evt.wait)
         if isinstance(self.res, Exception):
             # this includes CancelledError
             raise self.res
@@ -78,6 +87,122 @@ class HLT:
             raise CancelledError
 
 
+class Budget:
+    """
+    Tracks a script's CPU time and game lock time, and throttles it when
+    it uses more than its share per game tick.
+
+    Time is measured per thread whenever the script's synchronous code
+    calls `test_stop`. Unused budget doesn't accumulate beyond one tick;
+    an overrun is paid back by sleeping until enough ticks have passed.
+    Within a `game_lock` block the overrun is only charged; the thread
+    sleeps when the block ends.
+    When the tick counter goes back (a game was loaded), the account is
+    cleared.
+
+    Code running in the event loop isn't measured; it can't be throttled
+    anyway.
+    """
+    def __init__(self, cpu:float|None, lock:float|None):
+        self.cpu = cpu
+        self.lock = lock
+        self._local = threading.local()
+        self._mutex = threading.Lock()
+
+        self.tick = None
+        self.cpu_used = 0.0
+        self.lock_used = 0.0
+
+        self.cpu_total = 0.0
+        self.lock_total = 0.0
+        self.throttled = 0
+        self.throttle_ticks = 0
+
+    def _refill(self, tick):
+        # called with the mutex held
+        if self.tick is None or tick < self.tick:
+            # first call, or a game was loaded: start over
+            self.tick = tick
+            self.cpu_used = 0.0
+            self.lock_used = 0.0
+        elif tick > self.tick:
+            n = tick - self.tick
+            self.tick = tick
+            if self.cpu is not None:
+                self.cpu_used = max(0.0, self.cpu_used - n*self.cpu)
+            if self.lock is not None:
+                self.lock_used = max(0.0, self.lock_used - n*self.lock)
+
+    def _over(self) -> bool:
+        # called with the mutex held
+        return (self.cpu is not None and self.cpu_used > self.cpu) or \
+               (self.lock is not None and self.lock_used > self.lock)
+
+    def start(self):
+        """
+        A job starts running in this thread. Time the thread has used
+        before, possibly for some other script, doesn't count.
+        """
+        loc = self._local
+        loc.cpu = time.thread_time()
+        loc.lock = _ttd.support.lock_time()
+
+    def check(self, stop=None):
+        """
+        Account for the time used by this thread since its last check,
+        and wait for the next tick if the budget is exhausted.
+
+        While waiting, @stop is called periodically; it should raise
+        an exception if the thread needs to end.
+        """
+        if _async.get():
+            return
+        loc = self._local
+        cpu = time.thread_time()
+        lock = _ttd.support.lock_time()
+        try:
+            d_cpu = cpu - loc.cpu
+            d_lock = lock - loc.lock
+        except AttributeError:  # not started by us
+            d_cpu = d_lock = 0.0
+        loc.cpu = cpu
+        loc.lock = lock
+
+        main = _main.get()
+        with self._mutex:
+            self.cpu_total += d_cpu
+            self.lock_total += d_lock
+            self._refill(main.tick)
+            self.cpu_used += d_cpu
+            self.lock_used += d_lock
+            if not self._over():
+                return
+            self.throttled += 1
+
+        if _ttd.object.LockSession.active():
+            # Sleeping would stall the game. `game_lock` checks again
+            # when the session ends.
+            return
+        while True:
+            # Don't sleep through a pause without checking @stop.
+            _from_thread(self._wait_tick, main)
+            if stop is not None:
+                stop()
+            with self._mutex:
+                self.throttle_ticks += 1
+                self._refill(main.tick)
+                if not self._over():
+                    break
+
+    @staticmethod
+    async def _wait_tick(main):
+        with anyio.move_on_after(0.1):
+            await main.tick_wait(1)
+
+    def info(self) -> str:
+        return f"CPU {self.cpu_total:.3f} s, lock {self.lock_total:.3f} s, throttled {self.throttled}x for {self.throttle_ticks} ticks"
+
+
 class BaseScript:
     """
     This is the base class for scripts interfacing with OpenTTD.
@@ -114,11 +239,30 @@ class BaseScript:
 
     ATTRS:ClassVar[list[tuple[str,Any]]]=()  # (var,default), tuples
 
+    # The number of commands that may be in flight at the same time,
+    # and the default time to wait for a command's result (in seconds,
+    # not counting pauses). See `openttd.command_timeout`.
+    CMD_WINDOW:ClassVar[int] = 100
+    CMD_TIMEOUT:ClassVar[float] = 10
+
+    # CPU and game lock time (in seconds) per game tick that the script's
+    # threads may use before they're throttled. None disables the limit.
+    # See `Budget`.
+    CPU_BUDGET:ClassVar[float|None] = None
+    LOCK_BUDGET:ClassVar[float|None] = None
+
+    # The number of subthreads (including ``@sync`` calls) that may run
+    # at the same time. None shares the global pool (`Main.JOB_THREADS`).
+    # A subthread that waits for another one (`HLT.wait`) frees its slot
+    # meanwhile, so nesting doesn't need a larger pool.
+    JOB_THREADS:ClassVar[int|None] = None
+
     def __init__(self, id, company, state=None, /, **kw):
         self.__id = id
         self.__company = company
         self.__kw = kw
         self.__state = state
+        self.__budget = Budget(self.CPU_BUDGET, self.LOCK_BUDGET)
 
         self.log = logging.getLogger(self.__module__)
 
@@ -139,16 +283,69 @@ class BaseScript:
         if _async.get():
             return self._sleep(ticks)
         else:
-            anyio.from_thread.run(self._sleep,ticks)
+            _from_thread(self._sleep,ticks)
 
     async def _sleep(self, ticks):
         await _main.get().tick_wait(ticks)
 
+    ### Timers
+
+    def _timer(self, fn, when, proc, a, **kw) -> TimerJob:
+        kw["tg"] = self.taskgroup
+        kw["ctx"] = self.__ctx
+        if _async.get():
+            return fn(when, proc, a, **kw)
+        return _from_thread_sync(partial(fn, when, proc, a, **kw))
+
+    def every(self, ticks:int, proc:Callable, *a, first:int|None = None) -> TimerJob:
+        """
+        Call ``proc(*a)`` every @ticks game ticks, until the script ends
+        or you cancel the returned job.
+
+        By default the first call happens after a random number of ticks
+        (at most @ticks), so that periodic jobs don't all run at the same
+        time. Use @first to set it.
+
+        @proc may be sync or async. If it's still running when it's due
+        again, that call is skipped.
+        """
+        return self._timer(_main.get().timers.every, ticks, proc, a, first=first)
+
+    def at_tick(self, tick:int, proc:Callable, *a) -> TimerJob:
+        """
+        Call ``proc(*a)`` when the game tick counter reaches @tick.
+        """
+        return self._timer(_main.get().timers.at_tick, tick, proc, a)
+
+    def at_date(self, date:int|datetime.date, proc:Callable, *a) -> TimerJob:
+        """
+        Call ``proc(*a)`` when the game date reaches @date.
+        """
+        return self._timer(_main.get().timers.at_date, date, proc, a)
+
     ### Subthread handling
 
+    @property
+    def budget(self) -> Budget:
+        """This script's CPU and lock time accounting."""
+        return self.__budget
+
+    @property
+    def jobs(self) -> JobPool:
+        """The pool this script's subthreads run in."""
+        return self.__jobs
+
+    def _stop_hook(self, prev):
+        # the `_STOP` hook for our code: check the budget, too
+        budget = self.__budget
+        def hook():
+            prev()
+            budget.check(prev)
+        return hook
+
     def _in_thr(self,hlt,proc,a,kw):
         # in-thread wrapper: stops on HLT, clears async
-        _STOP.set(hlt._STOP)
+        _STOP.set(self._stop_hook(hlt._STOP))
         _async.set(False)
         estimating.set(False)
 
@@ -170,9 +367,9 @@ class BaseScript:
         return proc(*a,**kw)
 
     async def _run_thr(self,hlt,proc,a,kw):
-        # Starts the thread, triggers HLT when done
+        # Runs the job in our pool, triggers HLT when done
         try:
-            hlt.res = await anyio.to_thread.run_sync(self._in_thr,hlt,proc,a,kw, abandon_on_cancel=False)
+            hlt.res = await self.__jobs.run(self._in_thr,hlt,proc,a,kw)
         except* CancelledError:
             pass
         finally:
@@ -202,7 +399,7 @@ class BaseScript:
             return self._subthread(hlt,proc,a,kw)
         else:
             # run _run_thr in our taskgroup,
-            anyio.from_thread.run_sync(self.taskgroup.start_soon,self._subthread,hlt,proc,a,kw)
+            _from_thread_sync(self.taskgroup.start_soon,self._subthread,hlt,proc,a,kw)
             return hlt
 
     # TODO typing
@@ -297,6 +494,21 @@ class BaseScript:
         SELF.set(self)
 
         task = _main.get()
+        window = CmdWindow(self.CMD_WINDOW, str(self.__id))
+        task._windows.add(window)
+        if self.JOB_THREADS is None:
+            self.__jobs = task.jobs
+        else:
+            self.__jobs = JobPool(self.JOB_THREADS, str(self.__id))
+            task._pools.add(self.__jobs)
+        _cmd_window.set(window)
+        _cmd_timeout.set(self.CMD_TIMEOUT)
+        _STOP.set(self._stop_hook(_STOP.get()))
+        _budget.set(self.__budget)
+        self.__ctx = copy_context()
+        # Timer jobs run in our pool. `main` doesn't: it'd hold a slot
+        # for the script's whole lifetime.
+        self.__ctx.run(_jobs.set, self.__jobs)
 
         async with anyio.create_task_group() as self.taskgroup:
             try:
@@ -340,6 +552,7 @@ class BaseScript:
                 self.print("Script terminated.")
             finally:
                 self.stop()
+                task.timers.drop(self.taskgroup)
                 task.script_done(self.__id)
                 evt.event.set()
 
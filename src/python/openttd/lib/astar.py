@@ -17,7 +17,7 @@ __all__ = ["AStar"]
 
 TilePath=openttd.tile.TilePath
 
-from openttd._main import _async, test_mode
+from openttd._main import _async, test_mode, game_lock
 
 @define
 class Cache:
@@ -148,7 +148,7 @@ class AStar:
             tile.cache = Cache(gscore=0, fscore=self.estimate(tile))
             todo.push(tile)
 
-        with test_mode():
+        with test_mode(), game_lock():
             return self._run(todo)
 
     def _run(self, todo):
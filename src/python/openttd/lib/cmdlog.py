@@ -0,0 +1,116 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Record the commands our scripts execute, and replay them.
+
+Start recording with ``py record FILE``, stop with ``py record``.
+
+To replay, load the savegame the recording started with, then
+``py start openttd.lib.cmdlog path=FILE``. Run OpenTTD headless
+(``openttd -D -g SAVEGAME``) for a benchmark of command execution.
+
+The log starts with `MAGIC`; each record is a `RECORD` header followed
+by the command's data.
+"""
+
+from __future__ import annotations
+
+import _ttd
+import anyio
+import struct
+from attrs import define
+
+from openttd.base import GameScript
+from openttd._main import _main, command_batch
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import BinaryIO, Iterator
+
+__all__ = ["Record", "Recorder", "read_log", "Script"]
+
+MAGIC = b"OTTDcmd\x01"
+
+# tick, command, company, success, cost, data length
+RECORD = struct.Struct("<QHbBqI")
+
+
+@define
+class Record:
+    tick: int
+    cmd: int
+    company: int
+    success: bool
+    cost: int
+    data: bytes
+
+
+class Recorder:
+    """
+    Write command records to a file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self._f: BinaryIO = open(path, "wb")
+        self._f.write(MAGIC)
+
+    def record(self, tick: int, cmd: int, company: int, success: bool, cost: int, data: bytes) -> None:
+        self._f.write(RECORD.pack(tick, cmd, company, success, cost, len(data)))
+        self._f.write(data)
+        self.count += 1
+
+    def close(self) -> None:
+        self._f.close()
+
+
+def read_log(path: str) -> Iterator[Record]:
+    """
+    Read a command log.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path !r} is not a command log")
+        while hdr := f.read(RECORD.size):
+            tick, cmd, company, success, cost, n = RECORD.unpack(hdr)
+            yield Record(tick, cmd, company, bool(success), cost, f.read(n))
+
+
+class Script(GameScript):
+    """
+    Replay a command log as fast as possible.
+
+    Arguments:
+    * path: the log file
+    * batch: the number of commands to send at once (default 100)
+    """
+    def setup(self, path: str, batch: int = 100):
+        super().setup()
+        self.path = path
+        self.batch = batch
+        self.done = 0
+        self.mismatch = 0
+
+    def get_info(self):
+        return f"Replay {self.path}: {self.done} done, {self.mismatch} different"
+
+    async def main(self):
+        main = _main.get()
+        records = list(read_log(self.path))
+
+        t = anyio.current_time()
+        for i in range(0, len(records), self.batch):
+            chunk = records[i:i+self.batch]
+            async with command_batch():
+                replies = [main.send_cmd(r.cmd, r.data, _ttd.support.CompanyID(r.company)) for r in chunk]
+            for r, reply in zip(chunk, replies):
+                if bool(await reply) != r.success:
+                    self.mismatch += 1
+            self.done += len(chunk)
+        t = anyio.current_time() - t
+
+        self.print(f"Replayed {self.done} commands in {t:.2f} s ({self.done / t if t else 0:.0f}/s), {self.mismatch} with a different result")
@@ -0,0 +1,354 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Road path search in a worker process.
+
+`openttd.lib.pathfinder.pool` runs this file with a plain Python
+interpreter. It must not import anything from `openttd`, which needs
+OpenTTD. The map is read from a snapshot (see `openttd.map`).
+
+The cost model follows `openttd.lib.pathfinder.road.RoadPath`, but
+whether a road, bridge or tunnel can actually be built is estimated from
+the map data; nothing is test-built.
+
+Protocol, on stdin/stdout: frames of a 4-byte little-endian length and a
+pickle. The first frame is the snapshot's `MapSnapshot.layout`. Every
+further frame is a job ``(id, sources, goals, cfg)``; sources and goals
+are lists of ``(tile index, direction)``, direction being -1 for "any".
+The reply is ``(id, True, (tiles, dirs))`` with the leg ends of the
+path, ``(id, False, None)`` if there is none, or ``(id, None, message)``
+on error. ``dirs[i]`` is the direction of the leg ending at ``tiles[i]``,
+plus 8 for a bridge or tunnel; ``dirs[0]`` is 255.
+"""
+
+import heapq
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+HDR = struct.Struct("<I")
+
+# Direction values as in openttd.tile.Dir. Only the four axes are used.
+NE, SE, SW, NW = 1, 3, 5, 7
+DIRS = (NE, SE, SW, NW)
+SAME = 8
+OFFSETS = {NE: (-1, 0), SE: (0, 1), SW: (1, 0), NW: (0, -1)}
+
+# ScriptRoad bits, by direction
+ROAD_BIT = {NW: 1, SW: 2, SE: 4, NE: 8}
+
+# ScriptTile slopes
+FLAT, STEEP = 0, 16
+SLOPE_NW, SLOPE_SW, SLOPE_SE, SLOPE_NE = 9, 3, 6, 12
+CORNERS = {1, 2, 4, 8}
+# a tunnel heading this way starts on this slope
+RISING = {NE: SLOPE_NE, SE: SLOPE_SE, SW: SLOPE_SW, NW: SLOPE_NW}
+
+COAST = 16  # in the "water" layer
+
+COST = dict(
+    max_cost=10000000,
+    cost_tile=100,
+    cost_no_existing_road=40,
+    cost_turn=50,
+    cost_slope=500,
+    cost_bridge=200,
+    cost_tunnel=50,
+    cost_bridge_per_tile=150,
+    cost_tunnel_per_tile=120,
+    cost_coast=20,
+    max_bridge_length=10,
+    max_tunnel_length=20,
+)
+
+
+def back(d):
+    return (d + 4) % 8
+
+
+class Map:
+    """
+    Read access to a snapshot, by layout.
+    """
+    def __init__(self, layout):
+        self.size_x = layout["size_x"]
+        self.size_y = layout["size_y"]
+        n = self.size_x * self.size_y
+
+        if "shm" in layout:
+            try:
+                self._shm = shared_memory.SharedMemory(name=layout["shm"], track=False)
+            except TypeError:  # Python < 3.13
+                self._shm = shared_memory.SharedMemory(name=layout["shm"])
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+            buf = self._shm.buf
+        else:
+            fd = os.open(layout["path"], os.O_RDONLY)
+            try:
+                self._mmap = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+            buf = memoryview(self._mmap)
+
+        for name, (off, fmt) in layout["offsets"].items():
+            size = struct.calcsize(fmt)
+            setattr(self, name, buf[off:off + n * size].cast(fmt))
+
+    def step(self, t, d, n=1):
+        """The tile @n steps from @t in direction @d, or None."""
+        dx, dy = OFFSETS[d]
+        x = t % self.size_x + dx * n
+        y = t // self.size_x + dy * n
+        if 0 < x < self.size_x - 1 and 0 < y < self.size_y - 1:
+            return y * self.size_x + x
+        return None
+
+    def distance(self, a, b):
+        sx = self.size_x
+        return abs(a % sx - b % sx) + abs(a // sx - b // sx)
+
+
+class Search:
+    """
+    One A* search. Nodes are (tile, direction) tuples.
+    """
+    def __init__(self, m, sources, goals, cfg):
+        self.m = m
+        self.sources = [(t, SAME if d < 0 else d) for t, d in sources]
+        self.goals = [(t, SAME if d < 0 else d) for t, d in goals]
+        self.goal_tiles = {t for t, _ in self.goals}
+        self.c = dict(COST)
+        for k, v in cfg.items():
+            if k not in COST:
+                raise ValueError(f"Unknown attribute: {k !r}")
+            self.c[k] = v
+
+    def is_goal(self, t, d):
+        for gt, gd in self.goals:
+            if gt == t and (gd == SAME or back(gd) == d):
+                return True
+        return False
+
+    def estimate(self, t):
+        return self.c["cost_tile"] * min(self.m.distance(t, g) for g in self.goal_tiles)
+
+    def connected(self, a, b, d):
+        rb = self.m.road_bits
+        return bool(rb[a] & ROAD_BIT[d]) and bool(rb[b] & ROAD_BIT[back(d)])
+
+    def sloped(self, t, d_in, d_out):
+        # Is the road across @t sloped? Cf. RoadPath.is_sloped_road.
+        if d_in != d_out:
+            return False
+        slope = self.m.slope[t]
+        if slope & STEEP or slope in CORNERS:
+            return True
+        if d_in in (NW, SE):
+            return slope in (SLOPE_NW, SLOPE_SE)
+        return slope in (SLOPE_NE, SLOPE_SW)
+
+    def other_end(self, t, d, layer):
+        # Existing bridge or tunnel: the next head in this direction.
+        for i in range(1, max(self.c["max_bridge_length"], self.c["max_tunnel_length"]) + 1):
+            e = self.m.step(t, d, i)
+            if e is None:
+                return None
+            if layer[e]:
+                return e
+        return None
+
+    def tunnel_end(self, t, d):
+        # A new tunnel ends at the first tile at the entry's height.
+        m = self.m
+        h = m.min_height[t]
+        for i in range(1, self.c["max_tunnel_length"] + 1):
+            e = m.step(t, d, i)
+            if e is None or m.min_height[e] < h:
+                return None
+            if m.min_height[e] == h:
+                if i >= 2 and m.slope[e] == RISING[back(d)] and m.is_buildable[e]:
+                    return e
+                return None
+        return None
+
+    def neighbors(self, t, d, jumped):
+        """
+        Yield (tile, direction, jump, cost) for the nodes reachable from
+        here. Cf. RoadPath.neighbors.
+        """
+        m, c = self.m, self.c
+
+        if jumped:
+            # exit a bridge or tunnel straight ahead
+            n = m.step(t, d)
+            if n is not None and (self.connected(t, n, d) or m.is_buildable[n] or m.is_road[n]):
+                yield n, d, False, self.step_cost(t, d, n, d)
+            return
+
+        if d != SAME and (m.has_bridge[t] or m.has_tunnel[t]):
+            # existing bridge or tunnel: cross it or give up
+            e = self.other_end(t, d, m.has_bridge if m.has_bridge[t] else m.has_tunnel)
+            if e is not None:
+                yield e, d, True, m.distance(t, e) * c["cost_tile"]
+            return
+
+        dirs = DIRS if d == SAME else (d, (d + 2) % 8, (d + 6) % 8)
+        for nd in dirs:
+            n = m.step(t, nd)
+            if n is None:
+                continue
+            if self.connected(t, n, nd) or (
+                    (m.is_buildable[n] or m.is_road[n] or m.has_bridge[n] or m.has_tunnel[n])
+                    and not m.slope[n] & STEEP):
+                yield n, nd, False, self.step_cost(t, d, n, nd)
+
+        if d == SAME or not m.is_buildable[t]:
+            return
+        slope = m.slope[t]
+        if slope == FLAT:
+            return
+
+        # a new bridge: both heads at the same height, nothing higher between
+        h = m.max_height[t]
+        for i in range(2, c["max_bridge_length"]):
+            e = m.step(t, d, i)
+            if e is None:
+                break
+            if m.max_height[m.step(t, d, i - 1)] > h:
+                break
+            if m.is_buildable[e] and m.max_height[e] == h:
+                yield e, d, True, c["cost_bridge"] + i * (c["cost_tile"] + c["cost_bridge_per_tile"])
+
+        if slope == RISING[d] and (e := self.tunnel_end(t, d)) is not None:
+            yield e, d, True, c["cost_tunnel"] + m.distance(t, e) * (c["cost_tile"] + c["cost_tunnel_per_tile"])
+
+    def step_cost(self, t, d, n, nd):
+        m, c = self.m, self.c
+        cost = c["cost_tile"]
+        if d != SAME and d != nd:
+            cost += c["cost_turn"]
+        if m.water[n] & COAST:
+            cost += c["cost_coast"]
+        if d != SAME and self.sloped(t, d, nd):
+            cost += c["cost_slope"]
+        if not self.connected(t, n, nd):
+            cost += c["cost_no_existing_road"]
+        return cost
+
+    def run(self):
+        todo = []
+        g = {}
+        came = {}  # node > (previous node, jump)
+        done = set()
+        seq = 0
+
+        for node in self.sources:
+            if self.is_goal(*node):
+                return [node], [False]
+            g[node] = 0
+            came[node] = (None, False)
+            heapq.heappush(todo, (self.estimate(node[0]), seq, node, False))
+            seq += 1
+
+        max_cost = self.c["max_cost"]
+        while todo:
+            f, _, node, jumped = heapq.heappop(todo)
+            if node in done:
+                continue
+            t, d = node
+            if self.is_goal(t, d):
+                return self.path(came, node)
+            if t in self.goal_tiles:
+                # reached from the wrong direction
+                continue
+            done.add(node)
+            if f > max_cost:
+                continue
+
+            for n, nd, jump, cost in self.neighbors(t, d, jumped):
+                nn = (n, nd)
+                if nn in done:
+                    continue
+                gs = g[node] + cost
+                if gs >= g.get(nn, max_cost + 1):
+                    continue
+                g[nn] = gs
+                came[nn] = (node, jump)
+                heapq.heappush(todo, (gs + self.estimate(n), seq, nn, jump))
+                seq += 1
+        return None
+
+    def path(self, came, node):
+        nodes = []
+        jumps = []
+        while node is not None:
+            nodes.append(node)
+            node, jump = came[node]
+            jumps.append(jump)
+        nodes.reverse()
+        jumps.reverse()
+        # jumps[i] says whether nodes[i] was reached by jumping
+        return nodes, jumps
+
+
+def encode(path):
+    """
+    Reduce the path to the ends of its legs.
+    """
+    nodes, jumps = path
+    tiles = array("I", [nodes[0][0]])
+    dirs = bytearray([255])
+    for i in range(1, len(nodes)):
+        t, d = nodes[i]
+        jump = jumps[i]
+        if not jump and dirs[-1] == d:
+            # straight on: extend the current leg
+            tiles[-1] = t
+        else:
+            tiles.append(t)
+            dirs.append(d | (8 if jump else 0))
+    return tiles.tobytes(), bytes(dirs)
+
+
+def read_frame(f):
+    hdr = f.read(HDR.size)
+    if len(hdr) < HDR.size:
+        return None
+    return pickle.loads(f.read(HDR.unpack(hdr)[0]))
+
+
+def write_frame(f, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    f.write(HDR.pack(len(data)))
+    f.write(data)
+    f.flush()
+
+
+def main():
+    rd = sys.stdin.buffer
+    wr = sys.stdout.buffer
+    m = Map(read_frame(rd))
+
+    while (job := read_frame(rd)) is not None:
+        jid, sources, goals, cfg = job
+        try:
+            path = Search(m, sources, goals, cfg).run()
+        except Exception as exc:
+            write_frame(wr, (jid, None, repr(exc)))
+        else:
+            if path is None:
+                write_frame(wr, (jid, False, None))
+            else:
+                write_frame(wr, (jid, True, encode(path)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Road path searches in worker processes.
+
+`RoadPathPool` runs searches like `openttd.lib.pathfinder.road.RoadPath`
+in separate Python processes, which read the map from a shared snapshot
+(`openttd.map`). They neither need the GIL nor the game lock, so many
+routes can be planned on all cores at once.
+
+Usage, in async mode::
+
+    async with RoadPathPool() as pool:
+        path = await pool.find(sources, goals, cost_turn=30)
+
+The workers estimate whether roads, bridges and tunnels can be built
+from the map data. Building the resulting path may thus still fail.
+
+The workers need a plain Python interpreter: ``$TTDPYTHON``, or else
+the one OpenTTD's Python is based on, or ``python3``.
+"""
+
+from __future__ import annotations
+
+import anyio
+import os
+import pickle
+import shutil
+import struct
+import sys
+from array import array
+from contextlib import AsyncExitStack, suppress
+from subprocess import PIPE
+from anyio.streams.buffered import BufferedByteReceiveStream
+
+import openttd
+import openttd.map
+from openttd.tile import Tile, TilePath, Dir, Turn
+from openttd._main import VEvent, _main
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Iterable
+
+__all__ = ["RoadPathPool", "ROAD_LAYERS"]
+
+# The map layers the workers need
+ROAD_LAYERS = (
+    "slope",
+    "min_height",
+    "max_height",
+    "is_buildable",
+    "is_road",
+    "road_bits",
+    "water",
+    "has_bridge",
+    "has_tunnel",
+)
+
+WORKER = os.path.join(os.path.dirname(__file__), "_road_worker.py")
+HDR = struct.Struct("<I")
+
+
+def _python() -> str:
+    if (exe := os.environ.get("TTDPYTHON")):
+        return exe
+    # Within OpenTTD, sys.executable may well be OpenTTD itself.
+    for exe in (getattr(sys, "_base_executable", None), sys.executable):
+        if exe and os.path.basename(exe).startswith("python"):
+            return exe
+    v = sys.version_info
+    return shutil.which(f"python{v.major}.{v.minor}") or shutil.which("python3") or "python3"
+
+
+def _encode(tile) -> tuple[int, int]:
+    if isinstance(tile, TilePath):
+        return tile.t.value, (-1 if tile.d is Dir.SAME else tile.d.value)
+    return Tile(tile).value, -1
+
+
+def _decode(data) -> TilePath:
+    tiles = array("I")
+    tiles.frombytes(data[0])
+    dirs = data[1]
+
+    path = TilePath(Tile(tiles[0]), Dir.SAME)
+    for t, d in zip(tiles[1:], dirs[1:]):
+        t = Tile(t)
+        n = abs(t.x - path.x) + abs(t.y - path.y)
+        if d & 8:
+            # bridge or tunnel
+            path = path + Dir(d & 7) * n
+            continue
+        d = Dir(d)
+        if path.d is Dir.SAME:
+            path = path + d
+        else:
+            path = path + (d - path.d)
+        for _ in range(n - 1):
+            path = path + Turn.S
+    return path
+
+
+async def _send(stream, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    await stream.send(HDR.pack(len(data)) + data)
+
+
+async def _recv(stream):
+    n, = HDR.unpack(await stream.receive_exactly(HDR.size))
+    return pickle.loads(await stream.receive_exactly(n))
+
+
+class RoadPathPool:
+    """
+    A pool of worker processes for road path searches.
+
+    @snapshot is a `openttd.map.MapSnapshot` with (at least) the layers
+    in `ROAD_LAYERS`. By default the pool creates one, tracks changes
+    to the map, and updates it before a search.
+
+    The workers read the snapshot while they search, so it's only
+    updated while no search is running. A search that starts while
+    others are running thus uses the same, possibly outdated, map data,
+    unless that's more than @max_stale ticks old: then it waits for the
+    running searches to end so that the snapshot can be updated.
+
+    If you supply the snapshot, don't change it while searches are
+    running.
+
+    @workers defaults to the number of CPUs.
+    """
+    def __init__(self, snapshot: openttd.map.MapSnapshot|None = None, workers: int|None = None, python: str|None = None, max_stale: int = 100):
+        self.snapshot = snapshot
+        self.workers = workers or os.cpu_count() or 1
+        self.python = python or _python()
+        self.max_stale = max_stale
+        self._updated = None  # tick
+        self._idle = None  # Event, set when no search runs
+        self._own = snapshot is None
+        self._stack = None
+        self._jobs_w = None
+        self._seq = 0
+        self._pending = {}  # seq > VEvent
+        self._broken = None
+
+        self.searches = 0
+        self.found = 0
+
+    async def __aenter__(self):
+        if self._own:
+            self.snapshot = openttd.map.snapshot(ROAD_LAYERS, track=True)
+        layout = self.snapshot.layout()
+
+        async with AsyncExitStack() as stack:
+            self._jobs_w, jobs_r = anyio.create_memory_object_stream(self.workers)
+            stack.push_async_callback(self._jobs_w.aclose)
+            tg = await stack.enter_async_context(anyio.create_task_group())
+            for _ in range(self.workers):
+                proc = await stack.enter_async_context(await anyio.open_process([self.python, WORKER], stdin=PIPE, stdout=PIPE))
+                await _send(proc.stdin, layout)
+                tg.start_soon(self._worker, proc, jobs_r.clone())
+            jobs_r.close()
+            self._stack = stack.pop_all()
+        return self
+
+    async def __aexit__(self, *tb):
+        try:
+            return await self._stack.__aexit__(*tb)
+        finally:
+            if self._own:
+                self.snapshot.close()
+                self.snapshot.unlink()
+                self.snapshot = None
+
+    async def _worker(self, proc, jobs):
+        rd = BufferedByteReceiveStream(proc.stdout)
+        try:
+            async with jobs:
+                async for job, evt in jobs:
+                    await _send(proc.stdin, job)
+                    reply = await _recv(rd)
+                    if reply[0] != job[0]:
+                        raise RuntimeError(f"Worker out of sync: {reply[0]} != {job[0]}")
+                    if not evt.event.is_set():
+                        evt.value = reply[1:]
+                        evt.event.set()
+        except Exception as exc:
+            # Nobody else would answer our job, and maybe not the queued
+            # ones either.
+            self._fail(f"worker died: {exc!r}")
+        finally:
+            with suppress(OSError, anyio.BrokenResourceError):
+                await proc.stdin.aclose()
+
+    def _fail(self, msg):
+        self._broken = msg
+        for evt in self._pending.values():
+            if not evt.event.is_set():
+                evt.value = (None, msg)
+                evt.event.set()
+
+    async def _refresh(self):
+        # Don't change the map data under a running search.
+        while True:
+            tick = _main.get().tick
+            if not self._pending:
+                self.snapshot.update()
+                self._updated = tick
+                return
+            if 0 <= tick - self._updated < self.max_stale:
+                return
+            if self._idle is None:
+                self._idle = anyio.Event()
+            await self._idle.wait()
+
+    async def find(self, sources: Iterable[Tile|TilePath], goals: Iterable[Tile|TilePath], **cfg) -> TilePath|None:
+        """
+        Find a road from one of the @sources to one of the @goals.
+
+        The keywords are `RoadPath` attributes, e.g. ``cost_turn=30``.
+
+        Returns the path's last tile (like `RoadPath.run`), or None if
+        there is no route. Raises `RuntimeError` if the search failed or a
+        worker process died; the pool can't be used after that.
+        """
+        if self._broken is not None:
+            raise RuntimeError(f"Path search failed: {self._broken}")
+        if self._own:
+            await self._refresh()
+
+        self._seq += 1
+        job = (self._seq, [_encode(t) for t in sources], [_encode(t) for t in goals], cfg)
+        evt = VEvent()
+        self._pending[self._seq] = evt
+        try:
+            try:
+                await self._jobs_w.send((job, evt))
+            except anyio.BrokenResourceError:
+                raise RuntimeError(f"Path search failed: {self._broken}") from None
+            await evt.event.wait()
+        finally:
+            del self._pending[job[0]]
+            if not self._pending and self._idle is not None:
+                self._idle.set()
+                self._idle = None
+
+        self.searches += 1
+        ok, data = evt.value
+        if ok is None:
+            raise RuntimeError(f"Path search failed: {data}")
+        if not ok:
+            return None
+        self.found += 1
+        return _decode(data)
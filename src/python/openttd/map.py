@@ -0,0 +1,264 @@
+#
+# This file is part of OpenTTD.
+# OpenTTD is free software; you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, version 2.
+# OpenTTD is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details. You should have received a copy of the GNU General Public License along with OpenTTD. If not, see <http://www.gnu.org/licenses/>.
+#
+
+"""
+This module exports (parts of) the map.
+
+A snapshot copies some layers of the whole map to shared memory, or to a
+memory-mapped file, under a single game lock. Other threads or processes
+can then read them without touching the game.
+
+Layers are stored in tile index order, i.e. ``layer[y, x]``.
+
+A snapshot can be kept current incrementally: OpenTTD records which areas
+of the map have changed (in blocks of 16x16 tiles), and `MapSnapshot.update`
+re-reads only those. Changes are taken from the tiles the game redraws,
+plus town and owner changes. A new or loaded map causes a full refresh.
+Changes that only redraw the whole screen (zooming, resizing a window, a
+new palette) don't; neither do changed settings or reloaded NewGRFs, so
+call `MapSnapshot.refresh` after those if your layers depend on them.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import weakref
+from multiprocessing import resource_tracker, shared_memory
+
+import _ttd
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from typing import Iterable, Self
+
+__all__ = ["MapSnapshot", "snapshot", "LAYERS"]
+
+# The default layers. Any name from `_ttd.bulk.tile_columns` works.
+LAYERS = (
+    "min_height",
+    "slope",
+    "tile_type",
+    "owner",
+    "road_bits",  # road: bits 0…3, tram: bits 4…7
+    "water",  # water, sea, river, canal, coast: bits 0…4
+    "authority_town",
+)
+
+# NumPy type string to buffer format and item size
+_formats = {"?": ("?",1), "u1": ("B",1), "i2": ("h",2), "u2": ("H",2), "u4": ("I",4)}
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+class MapSnapshot:
+    """
+    A copy of some layers of the map.
+
+    Don't instantiate this class directly; use `snapshot` or `attach`.
+
+    The snapshot is described by its `spec`, a picklable dict, which you
+    can send to another process and use with `MapSnapshot.attach` there.
+    Only the creator should call `unlink`.
+    """
+
+    def __init__(self, spec: dict, create: bool = False):
+        self.spec = spec
+        self.size_x = spec["size_x"]
+        self.size_y = spec["size_y"]
+        self.layers = tuple(name for name, _ in spec["layers"])
+        self._dtypes = dict(spec["layers"])
+
+        n = self.size_x * self.size_y
+        self._offsets = {}
+        size = 0
+        for name, dtype in spec["layers"]:
+            self._offsets[name] = size
+            size = _align(size + n * _formats[dtype][1])
+        self.nbytes = size
+
+        self._shm = None
+        self._mmap = None
+        self._slot = None
+        self._untrack = None
+        if "shm" in spec:
+            if create:
+                self._shm = shared_memory.SharedMemory(name=spec["shm"], create=True, size=size)
+            else:
+                try:
+                    # don't let the resource tracker destroy the creator's data
+                    self._shm = shared_memory.SharedMemory(name=spec["shm"], track=False)
+                except TypeError:  # Python < 3.13
+                    self._shm = shared_memory.SharedMemory(name=spec["shm"])
+                    resource_tracker.unregister(self._shm._name, "shared_memory")
+            self._buf = self._shm.buf
+        else:
+            path = spec["path"]
+            fd = os.open(path, os.O_RDWR | (os.O_CREAT | os.O_TRUNC if create else 0), 0o600)
+            try:
+                if create:
+                    os.ftruncate(fd, size)
+                self._mmap = mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+            self._buf = memoryview(self._mmap)
+
+    def layout(self) -> dict:
+        """
+        Describe the snapshot for readers that can't import this module,
+        e.g. worker processes without OpenTTD.
+
+        Returns a copy of `spec` with an additional "offsets" entry,
+        which maps each layer to its byte offset and `struct` format.
+        """
+        res = dict(self.spec)
+        res["offsets"] = {name: (self._offsets[name], _formats[dtype][0]) for name, dtype in self.spec["layers"]}
+        return res
+
+    @classmethod
+    def attach(cls, spec: dict) -> Self:
+        """
+        Access a snapshot that has been created elsewhere.
+        """
+        return cls(spec)
+
+    def raw(self, name: str) -> memoryview:
+        """
+        Return a layer as a flat memoryview.
+        """
+        off = self._offsets[name]
+        n = self.size_x * self.size_y * _formats[self._dtypes[name]][1]
+        return self._buf[off:off + n]
+
+    def layer(self, name: str) -> memoryview:
+        """
+        Return a layer as a two-dimensional memoryview, indexed [y, x].
+        """
+        return self.raw(name).cast(_formats[self._dtypes[name]][0], shape=(self.size_y, self.size_x))
+
+    def array(self, name: str):
+        """
+        Return a layer as a two-dimensional NumPy array, indexed [y, x].
+
+        The array shares memory with the snapshot.
+        """
+        import numpy as np
+
+        return np.frombuffer(self.raw(name), dtype=self._dtypes[name]).reshape(self.size_y, self.size_x)
+
+    __getitem__ = array
+
+    def refresh(self, x: int = 0, y: int = 0, w: int | None = None, h: int | None = None, layers: Iterable[str] | None = None) -> None:
+        """
+        Re-read a rectangle of the map (default: all of it).
+
+        This must be called from within OpenTTD.
+        """
+        if w is None:
+            w = self.size_x - x
+        if h is None:
+            h = self.size_y - y
+        names = list(self.layers if layers is None else layers)
+        _ttd.bulk.fill_map(names, [self.raw(n) for n in names], x, y, w, h)
+
+    def track(self) -> None:
+        """
+        Start recording changes to the map, for `update`.
+
+        This must be called from within OpenTTD. It does not refresh
+        the snapshot.
+        """
+        if self._slot is None:
+            self._slot = _ttd.bulk.dirty_register()
+            # There are only a few tracking slots. Don't leak them when a
+            # snapshot is dropped without calling `close`.
+            self._untrack = weakref.finalize(self, _ttd.bulk.dirty_unregister, self._slot)
+            self._untrack.atexit = False
+
+    def untrack(self) -> None:
+        """
+        Stop recording changes to the map.
+        """
+        if self._slot is not None:
+            self._untrack()
+            self._untrack = None
+            self._slot = None
+
+    def update(self) -> list[tuple[int,int,int,int]]:
+        """
+        Re-read the parts of the map that changed since the last call, or
+        since `track` was called.
+
+        Returns a list of (x, y, w, h) rectangles whose data have actually
+        changed. Areas that have merely been redrawn are not included.
+        """
+        if self._slot is None:
+            raise RuntimeError("This snapshot doesn't track changes")
+        names = list(self.layers)
+        return _ttd.bulk.refresh_dirty(self._slot, names, [self.raw(n) for n in names])
+
+    def close(self) -> None:
+        """
+        Release this process's access to the snapshot.
+
+        Views returned by `raw`, `layer` or `array` must be gone by then.
+        """
+        self.untrack()
+        self._buf.release()
+        if self._shm is not None:
+            self._shm.close()
+        if self._mmap is not None:
+            self._mmap.close()
+
+    def unlink(self) -> None:
+        """
+        Destroy the snapshot's storage. Call `close` as well.
+        """
+        if self._shm is not None:
+            self._shm.unlink()
+        else:
+            os.unlink(self.spec["path"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *tb):
+        self.close()
+
+
+def snapshot(layers: Iterable[str] = LAYERS, path: str | None = None, name: str | None = None, track: bool = False) -> MapSnapshot:
+    """
+    Copy some layers of the map.
+
+    The data are stored in a new shared memory block, or in a memory-mapped
+    file if you pass a @path. @name is the shared memory block's name;
+    by default a random name is used.
+
+    If @track is set, the snapshot records changes to the map, so that
+    you can call `MapSnapshot.update` to keep it current.
+    """
+    layers = list(layers)
+    spec = dict(
+        size_x=_ttd.script.map.get_map_size_x(),
+        size_y=_ttd.script.map.get_map_size_y(),
+        layers=[(n, _ttd.bulk.tile_columns[n]) for n in layers],
+    )
+    if path is not None:
+        spec["path"] = path
+    else:
+        if name is None:
+            name = f"ottd_map_{os.getpid()}_{os.urandom(4).hex()}"
+        spec["shm"] = name
+
+    snap = MapSnapshot(spec, create=True)
+    if track:
+        # start tracking first, so that we don't miss any changes
+        snap.track()
+    snap.refresh()
+    return snap
@@ -26,7 +26,7 @@ from typing import overload
 if typing.TYPE_CHECKING:
     from openttd.town import Town
     from openttd.road import RoadType
-    from typing import Callable,Self
+    from typing import Callable,Iterable,Self
 
 
 _offsets = (
@@ -245,7 +245,17 @@ class Tiles(PlusSet["Tile"]):
     NB: unlike all other collective functions, instantiating this class directly
     returns an empty set.
     """
-    pass
+    def query(self, props:list[str]):
+        """
+        Read some properties of all tiles in this set at once.
+
+        Returns a NumPy structured array. Its "tile" field contains the
+        tile index, the other fields are named after the properties.
+        See `query_tiles` for details.
+        """
+        if "tile" not in props:
+            props = ["tile", *props]
+        return query_tiles(self, props)
 
 
 @extension_of(_ttd.support.Tile_)
@@ -745,6 +755,33 @@ class Tile[Collection:Tiles]:
         return res
 
 
+def query_tiles(tiles:Iterable[Tile|int], props:list[str]):
+    """
+    Read some properties of many tiles at once, under a single game lock.
+
+    @tiles may be a NumPy array of tile indices.
+
+    @props are the names of `Tile` properties; `_ttd.bulk.tile_columns`
+    lists the ones that are supported. "tile" returns the tile index.
+
+    Returns a NumPy structured array with one field per property.
+    """
+    import numpy as np
+
+    if not isinstance(tiles, np.ndarray):
+        tiles = [Tile(t).value for t in tiles]
+    idx = np.ascontiguousarray(tiles, dtype=np.uint32)
+
+    dtype = [(p, "u4" if p == "tile" else _ttd.bulk.tile_columns[p]) for p in props]
+    res = np.empty(len(idx), dtype=dtype)
+    names = [p for p in props if p != "tile"]
+    for p, col in zip(names, _ttd.bulk.query_tiles(idx, names)):
+        res[p] = np.frombuffer(col, dtype=res.dtype[p])
+    if "tile" in props:
+        res["tile"] = idx
+    return res
+
+
 @define
 class TilePath:
     """
@@ -17,7 +17,7 @@ from .util import PlusSet
 import enum
 from attrs import define,field
 from ._support.id import _ID
-from ._util import _WrappedList, with_
+from ._util import _WrappedList, ListQuery, with_
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -148,7 +148,16 @@ class Towns(PlusSet[Town]):
         for t in source:
             self.add(Town(t))
 
+    @staticmethod
+    def query() -> ListQuery:
+        """
+        Start a native query on all towns, e.g.
+        ``Towns.query().valuate("town.population").top(5).run()``.
+        """
+        return ListQuery(_ttd.script.townlist.List(), Town)
+
     # XXX maybe add classmethods for adjacency
 
 
 Town.List = staticmethod(Towns)
+Town.query = staticmethod(Towns.query)
@@ -137,7 +137,11 @@ async def maybe_async_threaded(fn, *a, **kw):
 
     This is useful if you need to call user-supplied code and you don't
     know whether it's async or not.
+
+    Within a script's timer jobs this uses the script's job pool (see
+    `openttd._main.JobPool`), otherwise anyio's default thread limiter.
     """
+    from ._main import _jobs
     # The capture/unwrap wrapper is required for Trio: returning an Awaitable
     # from a subthread smells like an async function call that ended up in
     # a thread, thus Trio raises an exception instead of returning it to us.
@@ -145,7 +149,11 @@ async def maybe_async_threaded(fn, *a, **kw):
         from ._main import _async
         _async.set(False)
         return fn(*a,**kw)
-    res = (await anyio.to_thread.run_sync(capture,syn,fn,a,kw)).unwrap()
+    if (pool := _jobs.get()) is None:
+        res = await anyio.to_thread.run_sync(capture,syn,fn,a,kw)
+    else:
+        res = await pool.run(capture,syn,fn,a,kw)
+    res = res.unwrap()
     if hasattr(res,"__await__"):
         res = await res
     return res
@@ -158,7 +166,7 @@ def maybe_sync(fn, *a, **kw):
     Use this in ``@sync``-wrapped functions when you don't know the type of
     a callback or similar.
     """
-    from ._main import _async
+    from ._main import _async, _from_thread
     if _async.get():
         raise RuntimeError("Can only be used in a subthread")
     res = fn(*a,**kw)
@@ -166,7 +174,7 @@ def maybe_sync(fn, *a, **kw):
         return res
     async def hdl(res):
         return await res
-    return anyio.from_thread.run(hdl,res)
+    return _from_thread(hdl,res)
 
 
 def testmode_if(flag:bool):
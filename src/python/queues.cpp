@@ -9,9 +9,44 @@
 
 #include <memory>
 
+#if defined(__linux__)
+#	include <sys/eventfd.h>
+#	include <unistd.h>
+#elif !defined(_WIN32)
+#	include <fcntl.h>
+#	include <unistd.h>
+#endif
+
 using namespace PyTTD;
 
 namespace PyTTD {
+	QToPy::QToPy()
+	{
+#if defined(__linux__)
+		wake_rd = wake_wr = eventfd(0, EFD_NONBLOCK | EFD_CLOEXEC);
+#elif !defined(_WIN32)
+		int fds[2];
+		if (pipe(fds) == 0) {
+			for (int fd : fds) {
+				fcntl(fd, F_SETFL, fcntl(fd, F_GETFL) | O_NONBLOCK);
+				fcntl(fd, F_SETFD, FD_CLOEXEC);
+			}
+			wake_rd = fds[0];
+			wake_wr = fds[1];
+		}
+#endif
+	}
+
+	QToPy::~QToPy()
+	{
+#if !defined(_WIN32)
+		if (wake_wr != wake_rd && wake_wr >= 0)
+			close(wake_wr);
+		if (wake_rd >= 0)
+			close(wake_rd);
+#endif
+	}
+
 	void QToPy::notify() {
 		{
 			std::unique_lock lk(lock);
@@ -19,6 +54,31 @@ namespace PyTTD {
 				gen = 1;
 		}
 		trigger.notify_one();
+
+#if defined(__linux__)
+		if (wake_wr >= 0)
+			eventfd_write(wake_wr, 1);
+#elif !defined(_WIN32)
+		if (wake_wr >= 0) {
+			char c = 0;
+			if (write(wake_wr, &c, 1) < 0) {
+				/* The pipe is full, thus readable anyway. */
+			}
+		}
+#endif
+	}
+
+	void QToPy::clear_wakeup() {
+#if defined(__linux__)
+		eventfd_t val;
+		if (wake_rd >= 0)
+			eventfd_read(wake_rd, &val);
+#elif !defined(_WIN32)
+		char buf[64];
+		if (wake_rd >= 0)
+			while (read(wake_rd, buf, sizeof(buf)) > 0)
+				;
+#endif
 	}
 
 	void LockedQ::send(MsgPtr elem) {
@@ -27,10 +87,72 @@ namespace PyTTD {
 	}
 
 	void QToPy::send(MsgPtr elem) {
-		LockedQ::send(std::move(elem));
+		{
+			std::unique_lock lk(lock);
+			auto &lane = lanes[static_cast<size_t>(elem->Lane())];
+			if (elem->Lane() == MsgLane::TRACE && lane.size() >= MAX_TRACE) {
+				lane.pop();
+				dropped++;
+			} else if (elem->Lane() == MsgLane::TICK && !lane.empty()) {
+				lane.pop();
+			}
+			lane.push({seq++, std::move(elem)});
+		}
 		notify();
 	}
 
+	/**
+	 * The lane to read the next message from, or nullptr if all are empty.
+	 * Call with the lock held.
+	 */
+	QToPy::Lane *QToPy::NextLane() {
+		// Results and control messages keep their relative order.
+		auto &res = lanes[static_cast<size_t>(MsgLane::RESULT)];
+		auto &ctl = lanes[static_cast<size_t>(MsgLane::CONTROL)];
+		if (!res.empty() && (ctl.empty() || res.front().seq < ctl.front().seq))
+			return &res;
+		if (!ctl.empty())
+			return &ctl;
+
+		for (auto &lane : lanes) {
+			if (!lane.empty())
+				return &lane;
+		}
+		return nullptr;
+	}
+
+	MsgPtr QToPy::recv() {
+		std::unique_lock lk(lock);
+
+		Lane *lane = NextLane();
+		if (lane == nullptr)
+			return {};
+		MsgPtr res = std::move(lane->front().msg);
+		lane->pop();
+		return res;
+	}
+
+	std::vector<MsgPtr> QToPy::recv_many() {
+		std::vector<MsgPtr> res;
+		std::unique_lock lk(lock);
+
+		for (Lane *lane; (lane = NextLane()) != nullptr; ) {
+			res.push_back(std::move(lane->front().msg));
+			lane->pop();
+		}
+		return res;
+	}
+
+	QToPy::Stats QToPy::stats() {
+		std::unique_lock lk(lock);
+		Stats res;
+
+		for (size_t i = 0; i < N_LANES; i++)
+			res.depth[i] = lanes[i].size();
+		res.dropped = dropped;
+		return res;
+	}
+
 	MsgPtr LockedQ::recv() {
 		std::unique_lock lk(lock);
 
@@ -41,6 +163,18 @@ namespace PyTTD {
 		return res;
 	}
 
+	std::vector<MsgPtr> LockedQ::recv_many() {
+		std::vector<MsgPtr> res;
+		std::unique_lock lk(lock);
+
+		res.reserve(queue.size());
+		while (!queue.empty()) {
+			res.push_back(std::move(queue.front()));
+			queue.pop();
+		}
+		return res;
+	}
+
 	uint32_t QToPy::wait(uint32_t gen) {
 		std::unique_lock lk(lock);
 		if (gen == this->gen) {
@@ -10,7 +10,9 @@
 
 #include "python/msg_base.hpp"
 
+#include <array>
 #include <queue>
+#include <vector>
 #include <mutex>
 #include <condition_variable>
 
@@ -36,26 +38,77 @@ namespace PyTTD {
 
 	public:
 		MsgPtr recv();
+		std::vector<MsgPtr> recv_many();
 		void flush();
 		void send(MsgPtr elem);
 	};
 
 	 /**
 	  * Allow a Python thread to sleep on the incoming queue.
+	  *
+	  * Alternately, the Python event loop can watch a file descriptor
+	  * which becomes readable when a message is queued. That's an eventfd
+	  * on Linux and a pipe on other POSIX systems. On Windows there is
+	  * none; Python needs to use `wait` in a thread.
+	  *
+	  * Messages are sorted into lanes by their `MsgBase::Lane`. Readers
+	  * get them in lane order, so command results are not stuck behind
+	  * a heap of traces. At most `MAX_TRACE` traces are kept; older ones
+	  * are dropped. A new tick message replaces one that's still queued.
+	  *
+	  * Command results and control messages are delivered first, but in
+	  * the order they were sent, so that a result never overtakes the
+	  * pause or mode change that preceded it.
 	  */
-	class QToPy : public LockedQ {
+	class QToPy {
 	public:
-		QToPy() {}
-		~QToPy() = default;
+		QToPy();
+		~QToPy();
+
+		static constexpr size_t N_LANES = static_cast<size_t>(MsgLane::END);
+		static constexpr size_t MAX_TRACE = 1000;
+
+		struct Stats {
+			std::array<size_t, N_LANES> depth;
+			size_t dropped;
+		};
 
 	private:
+		struct Entry {
+			uint64_t seq; // order of sending, across lanes
+			MsgPtr msg;
+		};
+		using Lane = std::queue<Entry>;
+
+		std::mutex lock;
+		std::array<Lane, N_LANES> lanes;
+		uint64_t seq = 0;
+		size_t dropped = 0;
+
+		Lane *NextLane();
+
 		std::condition_variable trigger;
 		uint32_t gen = 0;
+		int wake_rd = -1;
+		int wake_wr = -1;
 		void notify();
 
 	public:
+		MsgPtr recv();
+		std::vector<MsgPtr> recv_many();
 		uint32_t wait(uint32_t gen);
 		void send(MsgPtr elem);
+		Stats stats();
+
+		/**
+		 * The descriptor to watch, or -1 if there is none.
+		 */
+		int fileno() const { return wake_rd; }
+
+		/**
+		 * Reset the descriptor. Call this before reading the queue.
+		 */
+		void clear_wakeup();
 	};
 
 	 /**
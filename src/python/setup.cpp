@@ -21,6 +21,7 @@ namespace PyTTD {
 	extern void init_ttd_support(py::module_ &);
 	extern void init_ttd_modules(py::module_ &);
 	extern void init_ttd_string_id(py::module_ &);
+	extern void init_ttd_bulk(py::module_ &);
 
 	PyObject *init_ttd()
 	{
@@ -35,6 +36,7 @@ namespace PyTTD {
 		init_ttd_enums(m);
 		init_ttd_modules(m);
 		init_ttd_string_id(m);
+		init_ttd_bulk(m);
 
 		// magic incantation 2
 		return m.release().ptr();
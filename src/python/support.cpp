@@ -11,6 +11,7 @@
 #include "python/object.hpp"
 #include "python/instance.hpp"
 #include "python/task.hpp"
+#include "python/wrap.hpp"
 
 #include "script/api/script_object.hpp"
 #include "script/script_instance.hpp"
@@ -18,6 +19,7 @@
 #include "script/api/script_date.hpp"
 #include "script/api/script_controller.hpp"
 #include "script/api/script_company.hpp"
+#include "timer/timer_game_tick.h"
 
 namespace PyTTD {
 	namespace py = nanobind;
@@ -26,6 +28,11 @@ namespace PyTTD {
 		auto m = mg.def_submodule("support", "Various supporting classes and enums");
 
 		m.def("get_tick", &ScriptController::GetTick);
+		m.def("get_game_tick", []() -> uint64_t {
+			// No lock: this is a single word. Loading a game resets it,
+			// so callers must handle it going back.
+			return TimerGameTick::counter;
+		});
 		m.def("set_command_delay", &ScriptController::SetCommandDelay);
 		m.def("get_setting", &ScriptController::GetSetting, nanobind::arg("name"));
 		m.def("get_version", &ScriptController::GetVersion);
@@ -39,6 +46,35 @@ namespace PyTTD {
 		m.def("leakage_warning", [](bool warn) {
 			py::set_leak_warnings(warn);
 		});
+		m.def("stats", [](bool reset) {
+			// Per-function call statistics, see CallStats.
+			// Times are returned in seconds.
+			py::list res;
+			for (auto st : CallStats::All()) {
+				uint64_t calls = st->calls;
+				if (calls) {
+					py::dict d;
+					d["name"] = st->name;
+					d["calls"] = calls;
+					d["hold"] = st->hold / 1e9;
+					d["max_hold"] = st->max_hold / 1e9;
+					d["wait"] = st->wait / 1e9;
+					d["released"] = st->released / 1e9;
+					py::list hist;
+					for (auto &h : st->hist)
+						hist.append((uint64_t)h);
+					d["hist"] = hist;
+					res.append(d);
+				}
+				if (reset)
+					st->Reset();
+			}
+			return res;
+		}, py::arg("reset") = false);
+		m.def("lock_time", []() {
+			// No lock: this is per thread.
+			return CallStats::thread_hold / 1e9;
+		}, "Seconds the current thread has held the game lock in API calls");
 
 		py::enum_<DirDiff>(m, "DirDiff" ,py::is_arithmetic())
 			.value("S", DirDiff::DIRDIFF_SAME)
@@ -29,6 +29,8 @@
 #include "command_type.h"
 #include "network/network_internal.h"
 #include "core/backup_type.hpp"
+#include "timer/timer_game_tick.h"
+#include "timer/timer_game_economy.h"
 
 #include <string>
 #include <memory>
@@ -70,7 +72,11 @@ namespace PyTTD {
 
 	void Task::_PyRunner()
 	{
-		// TODO use a subinterpreter with py3.12+
+		// No per-script subinterpreters (py3.12+, own GIL) yet: _ttd is a
+		// single-phase module, which CPython refuses to load into such an
+		// interpreter, and nanobind keeps its type registry per process.
+		// CPU-heavy work goes to worker processes instead; see
+		// openttd.map and openttd.lib.pathfinder.pool.
 		Debug(python, 3, "In Python thread");
 		PyStatus status;
 
@@ -301,6 +307,10 @@ namespace PyTTD {
 			Task::current->pause_state = _pause_mode;
 			Task::current->QueueToPy.send(NewMsg<Msg::PauseState>(_pause_mode));
 		}
+		if (Task::current->tick != TimerGameTick::counter) {
+			Task::current->tick = TimerGameTick::counter;
+			Task::current->QueueToPy.send(NewMsg<Msg::Tick>(TimerGameTick::counter, TimerGameEconomy::date.base()));
+		}
 
 		while(true) {
 			if(Task::current == nullptr || Task::current->stopped)
@@ -362,5 +372,25 @@ namespace PyTTD {
 	{
 		return QueueToPy.recv();
 	}
+
+	std::vector<MsgPtr> Task::PyRecvMany()
+	{
+		return QueueToPy.recv_many();
+	}
+
+	QToPy::Stats Task::PyQueueStats()
+	{
+		return QueueToPy.stats();
+	}
+
+	int Task::PyFileno() const
+	{
+		return QueueToPy.fileno();
+	}
+
+	void Task::PyClearWakeup()
+	{
+		QueueToPy.clear_wakeup();
+	}
 }
 
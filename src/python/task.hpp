@@ -47,6 +47,7 @@ namespace PyTTD {
 
 		GameMode game_mode = GM_BOOTSTRAP;
 		PauseMode pause_state = PM_PAUSED_ERROR;  // initial nonsense(we hope) state
+		uint64_t tick = 0;
 
 	  public:
 		/**
@@ -109,10 +110,31 @@ namespace PyTTD {
 		 */
 	 	MsgPtr PyRecv();
 
+		/**
+		 * Retrieve all pending messages for Python
+		 */
+	 	std::vector<MsgPtr> PyRecvMany();
+
 		/**
 		 * Block a Python tread until the next message arrives
 		 */
 		uint32_t PyWaitNewMsg(uint32_t counter);
+
+		/**
+		 * Queue depth per lane, and the number of dropped traces
+		 */
+		QToPy::Stats PyQueueStats();
+
+		/**
+		 * A file descriptor that becomes readable when messages arrive,
+		 * or -1.
+		 */
+		int PyFileno() const;
+
+		/**
+		 * Reset the descriptor, before calling `PyRecvMany`.
+		 */
+		void PyClearWakeup();
 	};
 }
 
@@ -8,8 +8,11 @@
 #include <nanobind/nanobind.h>
 #include <nanobind/stl/shared_ptr.h>
 
+#include <condition_variable>
 #include <iostream>
 #include <memory>
+#include <stdexcept>
+#include <thread>
 
 #include "python/wrap.hpp"
 
@@ -34,6 +37,220 @@ namespace PyTTD {
 		cur_company.Restore();
 	}
 
+	void LockGame::SetStorage(StoragePtr storage)
+	{
+		storage_set.Change(storage);
+		cur_company.Change(storage->company);
+	}
+
+	LockGameRO::LockGameRO(StoragePtr storage)
+		: drv(reinterpret_cast<VDriver *>(VDriver::GetInstance()))
+		, lock(drv->GetStateMutex())
+		, active(&instance)
+		, storage_set(instance,storage)
+		, cur_company(_current_company)
+	{
+		cur_company.Change(instance.py_storage->company);
+	}
+
+	LockGameRO::~LockGameRO()
+	{
+		cur_company.Restore();
+	}
+
+	namespace {
+		struct ReadRound {
+			std::mutex mutex;
+			std::condition_variable cond;
+			enum { IDLE, PENDING, OPEN, CLOSED } state = IDLE;
+			StoragePtr storage;
+			int followers = 0;
+		} read_round;
+	}
+
+	LockGameShared::LockGameShared(StoragePtr storage)
+	{
+		std::unique_lock<std::mutex> rl(read_round.mutex);
+		for (;;) {
+			if (read_round.state == ReadRound::OPEN && read_round.storage == storage) {
+				read_round.followers++;
+				return;
+			}
+			if (read_round.state == ReadRound::IDLE)
+				break;
+			read_round.cond.wait(rl);
+		}
+
+		// We lead this round. Others with the same storage wait for us
+		// to get the game lock.
+		read_round.state = ReadRound::PENDING;
+		read_round.storage = storage;
+		rl.unlock();
+
+		this->lock = std::make_unique<LockGameRO>(storage);
+
+		rl.lock();
+		read_round.state = ReadRound::OPEN;
+		read_round.cond.notify_all();
+	}
+
+	LockGameShared::~LockGameShared()
+	{
+		std::unique_lock<std::mutex> rl(read_round.mutex);
+		if (!this->lock) {
+			if (--read_round.followers == 0)
+				read_round.cond.notify_all();
+			return;
+		}
+
+		read_round.state = ReadRound::CLOSED;
+		read_round.cond.wait(rl, []{ return read_round.followers == 0; });
+		rl.unlock();
+
+		this->lock.reset();
+
+		rl.lock();
+		read_round.state = ReadRound::IDLE;
+		read_round.storage = nullptr;
+		read_round.cond.notify_all();
+	}
+
+	thread_local uint64_t CallStats::thread_hold = 0;
+
+	std::vector<CallStats *> &CallStats::All()
+	{
+		static std::vector<CallStats *> all;
+		return all;
+	}
+
+	CallStats::CallStats(const char *name) : name(name)
+	{
+		All().push_back(this);
+	}
+
+	void CallStats::Add(std::chrono::steady_clock::duration hold, std::chrono::steady_clock::duration wait, std::chrono::steady_clock::duration released)
+	{
+		uint64_t ns = std::chrono::duration_cast<std::chrono::nanoseconds>(hold).count();
+
+		CallStats::thread_hold += ns;
+		this->calls.fetch_add(1, std::memory_order_relaxed);
+		this->hold.fetch_add(ns, std::memory_order_relaxed);
+		this->wait.fetch_add(std::chrono::duration_cast<std::chrono::nanoseconds>(wait).count(), std::memory_order_relaxed);
+		this->released.fetch_add(std::chrono::duration_cast<std::chrono::nanoseconds>(released).count(), std::memory_order_relaxed);
+
+		uint64_t max = this->max_hold.load(std::memory_order_relaxed);
+		while (ns > max && !this->max_hold.compare_exchange_weak(max, ns, std::memory_order_relaxed)) {}
+
+		size_t bucket = 0;
+		for (uint64_t us = ns / 1000; us > 0 && bucket < HIST_SIZE - 1; us >>= 1)
+			bucket++;
+		this->hist[bucket].fetch_add(1, std::memory_order_relaxed);
+	}
+
+	void CallStats::Reset()
+	{
+		this->calls = 0;
+		this->hold = 0;
+		this->max_hold = 0;
+		this->wait = 0;
+		this->released = 0;
+		for (auto &h : this->hist)
+			h = 0;
+	}
+
+	thread_local LockSession *LockSession::current = nullptr;
+
+	LockSession::LockSession(double max_hold)
+		: max_hold(std::chrono::duration_cast<std::chrono::steady_clock::duration>(std::chrono::duration<double>(max_hold)))
+	{
+	}
+
+	LockSession::~LockSession()
+	{
+		// The session must have been exited. If not, at least don't
+		// keep the game locked.
+		if (this->lock) {
+			auto state = PyEval_SaveThread();
+			this->lock.reset();
+			PyEval_RestoreThread(state);
+		}
+	}
+
+	void LockSession::Enter()
+	{
+		if (this->active)
+			throw std::runtime_error("This lock session is already active");
+		this->prev = LockSession::current;
+		LockSession::current = this;
+		this->active = true;
+	}
+
+	void LockSession::Exit()
+	{
+		if (LockSession::current != this)
+			throw std::runtime_error("Lock sessions must be exited in reverse order, in the same thread");
+		this->Release();
+		LockSession::current = this->prev;
+		this->prev = nullptr;
+		this->active = false;
+	}
+
+	void LockSession::Acquire(StoragePtr storage)
+	{
+		// The game thread takes the GIL while it holds the state lock,
+		// so we must not hold the GIL while waiting for the latter.
+		auto state = PyEval_SaveThread();
+		this->lock = std::make_unique<LockGame>(storage);
+		PyEval_RestoreThread(state);
+
+		this->storage = storage;
+		this->since = std::chrono::steady_clock::now();
+	}
+
+	void LockSession::Release()
+	{
+		if (!this->lock)
+			return;
+		// Unlocking doesn't block, so we can keep the GIL.
+		this->lock.reset();
+		this->storage = nullptr;
+	}
+
+	void LockSession::Expire()
+	{
+		if (this->lock && std::chrono::steady_clock::now() - this->since > this->max_hold) {
+			// Let the game loop (and the GUI) have a go.
+			auto state = PyEval_SaveThread();
+			this->lock.reset();
+			std::this_thread::sleep_for(std::chrono::milliseconds(1));
+			PyEval_RestoreThread(state);
+			this->storage = nullptr;
+		}
+	}
+
+	void LockSession::ReleaseAll()
+	{
+		for (auto s = LockSession::current; s != nullptr; s = s->prev)
+			s->Release();
+	}
+
+	void LockSession::ExpireAll()
+	{
+		for (auto s = LockSession::current; s != nullptr; s = s->prev)
+			s->Expire();
+	}
+
+	void LockSession::Refresh(StoragePtr storage)
+	{
+		this->Expire();
+		if (!this->lock) {
+			this->Acquire(storage);
+		} else if (this->storage != storage) {
+			this->lock->SetStorage(storage);
+			this->storage = storage;
+		}
+	}
+
 	// command hook
 	py::object cmd_hook(CommandDataPtr cb)
 	{
@@ -13,6 +13,12 @@
 #include <nanobind/stl/unique_ptr.h>
 #include <nanobind/stl/shared_ptr.h>
 
+#include <array>
+#include <atomic>
+#include <chrono>
+#include <optional>
+#include <vector>
+
 #include "script/script_instance.hpp"
 #include "script/script_storage.hpp"
 #include "video/video_driver.hpp"
@@ -58,6 +64,7 @@ namespace PyTTD {
 	public:
 		StorageSetter(Instance &instance, StoragePtr storage) : storage(storage),instance(instance) { instance.SetStorage(storage); }
 		~StorageSetter() { instance.SetStorage(nullptr); }
+		inline void Change(StoragePtr storage) { this->storage = storage; instance.SetStorage(storage); }
 	private:
 		StoragePtr storage;
 		Instance &instance;
@@ -73,6 +80,9 @@ namespace PyTTD {
 		LockGame(LockGame &&) = delete;
 		LockGame& operator=(LockGame const&) = delete;
 
+		// Switch to a different storage (and thus company) while locked.
+		void SetStorage(StoragePtr);
+
 	private:
 		// Pointer to the Driver, necessary for accessing the game lock.
 		VDriver *drv;
@@ -103,10 +113,172 @@ namespace PyTTD {
 		// processing by the "real" game loop.
 	};
 
+	/**
+	 * A lighter version of LockGame, for API calls that only read the
+	 * game state, i.e. static getters. These can't generate commands, so
+	 * we skip the script mode, and they're cheap, so we skip the
+	 * performance measurement.
+	 *
+	 * The script instance and its storage are still required because
+	 * most getters check the current company's view of things.
+	 */
+	class LockGameRO {
+	public:
+		LockGameRO(StoragePtr);
+		~LockGameRO();
+
+		// copy/move/assign is forbidden
+		LockGameRO(LockGameRO const&) = delete;
+		LockGameRO(LockGameRO &&) = delete;
+		LockGameRO& operator=(LockGameRO const&) = delete;
+
+	private:
+		VDriver *drv;
+		std::lock_guard<std::mutex> lock;
+		SObject::AInstance active;
+		StorageSetter storage_set;
+		Backup<CompanyID> cur_company;
+	};
+
+	/**
+	 * Shared read access, for getters that only read the map array or
+	 * pool items (see `shared_getters` in export.py). Anything that
+	 * might run a NewGRF callback, format a string, or set the script's
+	 * last error isn't safe to run concurrently.
+	 *
+	 * The first reader leads a "read round": it takes a LockGameRO.
+	 * Readers on other threads that use the same storage (i.e. the same
+	 * script and company) join the round and run concurrently, without
+	 * waiting for the game lock. When the leader is done the round is
+	 * closed to newcomers, so the game loop isn't starved; the leader then
+	 * waits for the remaining readers and releases the lock.
+	 *
+	 * Readers with a different storage wait for the next round.
+	 */
+	class LockGameShared {
+	public:
+		LockGameShared(StoragePtr);
+		~LockGameShared();
+
+		// copy/move/assign is forbidden
+		LockGameShared(LockGameShared const&) = delete;
+		LockGameShared(LockGameShared &&) = delete;
+		LockGameShared& operator=(LockGameShared const&) = delete;
+
+	private:
+		// Set if we lead the round.
+		std::unique_ptr<LockGameRO> lock;
+	};
+
+	/**
+	 * A lock session keeps the game locked across multiple API calls,
+	 * so that a batch of queries only pays for setting up a LockGame once.
+	 *
+	 * The lock is taken lazily by the first API call in the session. It is
+	 * dropped, and re-taken by the next call, when
+	 * - it has been held for longer than "max_hold" seconds, so that the
+	 *   game loop doesn't starve;
+	 * - an API call generated a command, which needs the game loop to
+	 *   run before its result can arrive;
+	 * - the thread calls `test_stop` after "max_hold" (see Expire);
+	 * - the thread calls into the event loop, or sleeps (see ReleaseAll):
+	 *   the event loop may itself be waiting for the game lock.
+	 *
+	 * Plain Python code between API calls doesn't check "max_hold", so it
+	 * shouldn't run for long within a session. Sessions must not span
+	 * awaits or other cross-thread calls that don't go through the
+	 * openttd package.
+	 *
+	 * Sessions are per thread and may be nested.
+	 */
+	class LockSession {
+	public:
+		LockSession(double max_hold);
+		~LockSession();
+
+		// copy/move/assign is forbidden
+		LockSession(LockSession const&) = delete;
+		LockSession(LockSession &&) = delete;
+		LockSession& operator=(LockSession const&) = delete;
+
+		// Start/end the session. Both are called with the GIL held.
+		void Enter();
+		void Exit();
+
+		// Called by the API wrapper, with the GIL held, before accessing the game.
+		void Refresh(StoragePtr storage);
+
+		// Drop the game lock, if held.
+		void Release();
+
+		// Drop the game lock if it has been held for longer than max_hold.
+		void Expire();
+
+		// Release / Expire all sessions of the current thread.
+		static void ReleaseAll();
+		static void ExpireAll();
+
+		// The innermost session of the current thread.
+		static thread_local LockSession *current;
+
+	private:
+		// Take the game lock. The GIL is released while waiting.
+		void Acquire(StoragePtr storage);
+
+		std::chrono::steady_clock::duration max_hold;
+		std::chrono::steady_clock::time_point since;
+
+		std::unique_ptr<LockGame> lock;
+		StoragePtr storage;
+
+		LockSession *prev = nullptr;
+		bool active = false;
+	};
+
 	py::object cmd_hook(CommandDataPtr cb);
 
 	void cmd_setup();
 
+	/**
+	 * Call statistics of an exported API function.
+	 *
+	 * Times are in nanoseconds. "hold" is the time the game was locked
+	 * on our behalf, "wait" the time spent waiting for the lock, and
+	 * "released" the time the GIL was released. Calls within a
+	 * LockSession don't wait and don't release the GIL.
+	 *
+	 * The histogram counts hold times in powers of two, starting at
+	 * one microsecond.
+	 */
+	struct CallStats {
+		static constexpr size_t HIST_SIZE = 16;
+
+		CallStats(const char *name);
+
+		// Register a call.
+		void Add(std::chrono::steady_clock::duration hold, std::chrono::steady_clock::duration wait, std::chrono::steady_clock::duration released);
+
+		void Reset();
+
+		const char *name;
+		std::atomic<uint64_t> calls = 0;
+		std::atomic<uint64_t> hold = 0;
+		std::atomic<uint64_t> max_hold = 0;
+		std::atomic<uint64_t> wait = 0;
+		std::atomic<uint64_t> released = 0;
+		std::array<std::atomic<uint64_t>, HIST_SIZE> hist = {};
+
+		// All of them, in order of registration.
+		static std::vector<CallStats *> &All();
+
+		// Lock hold time of all calls by the current thread, in ns.
+		static thread_local uint64_t thread_hold;
+	};
+
+	// Code that's not a wrapped API function doesn't collect statistics.
+	// The wrappers below shadow this with their own pointer.
+	inline constexpr CallStats *call_stats = nullptr;
+
 	/**
 	 * This is the nanobind wrapper that allows us to call Python.
 	 * We need to fetch the storage with the GIL held, and we cannot
@@ -114,21 +286,49 @@ namespace PyTTD {
 	 * throw an exception, so the first two lines of this wrapper
 	 * must be open-coded.
 	 *
+	 * Within a LockSession the game is already locked, so we keep the
+	 * GIL and let the session do the work.
+	 *
 	 * TODO somebody might want to convert this to a template …
 	 */
 
-#define _WRAP1                                 \
-	CommandDataPtr cmd = nullptr;              \
+#define _WRAP1_LOCKED(L)                       \
 	{                                          \
 		auto storage = Storage::from_python(); \
-		auto state = PyEval_SaveThread();      \
+		auto session = LockSession::current;   \
+		PyThreadState *state = nullptr;        \
+		std::optional<L> lock;                 \
+		auto t_start = std::chrono::steady_clock::now(); \
+		if (session) {                         \
+			session->Refresh(storage);         \
+		} else {                               \
+			state = PyEval_SaveThread();       \
+			lock.emplace(storage);             \
+		}                                      \
+		auto t_locked = std::chrono::steady_clock::now(); \
 		{                                      \
-			LockGame lock(storage);            \
+
+#define _WRAP_STATS                            \
+		if (call_stats) {                      \
+			auto t_done = std::chrono::steady_clock::now(); \
+			call_stats->Add(t_done - t_locked, t_locked - t_start, \
+				session ? std::chrono::steady_clock::duration{} : t_done - t_start); \
+		}                                      \
+
+#define _WRAP1                                 \
+	CommandDataPtr cmd = nullptr;              \
+	_WRAP1_LOCKED(LockGame)
 
 #define _WRAP2                                 \
 		}                                      \
 		cmd = std::move(instance.currentCmd);  \
-		PyEval_RestoreThread(state);           \
+		if (session) {                         \
+			if (cmd) session->Release();       \
+		} else {                               \
+			lock.reset();                      \
+			PyEval_RestoreThread(state);       \
+		}                                      \
+		_WRAP_STATS                            \
 	}                                          \
 	if (cmd) {                                 \
 		return cmd_hook(std::move(cmd));       \
@@ -136,18 +336,33 @@ namespace PyTTD {
 
 	// Trimmed-down wrapper for object instantiation
 	//
-#define _WRAP1_NEW                             \
-	{                                          \
-		auto storage = Storage::from_python(); \
-		auto state = PyEval_SaveThread();      \
-		{                                      \
-			LockGame lock(storage);            \
+#define _WRAP1_NEW _WRAP1_LOCKED(LockGame)
 
 #define _WRAP2_NEW                             \
 		}                                      \
-		PyEval_RestoreThread(state);           \
+		if (!session) {                        \
+			lock.reset();                      \
+			PyEval_RestoreThread(state);       \
+		}                                      \
+		_WRAP_STATS                            \
 	}                                          \
 
+	// Trimmed-down wrappers for getters. A getter that generates a
+	// command anyway is a bug, but we'd rather not drop the command.
+	//
+	// Shared readers run concurrently, so they don't touch
+	// 'instance.currentCmd' at all.
+	//
+#define _WRAP1_RO                              \
+	CommandDataPtr cmd = nullptr;              \
+	_WRAP1_LOCKED(LockGameRO)
+
+#define _WRAP2_RO _WRAP2
+
+#define _WRAP1_SHARED _WRAP1_LOCKED(LockGameShared)
+
+#define _WRAP2_SHARED _WRAP2_NEW
+
 	// ... and a modified copy of nanobind's "new_" template as a wrap for
 	// *that*:
 	//
@@ -206,7 +421,8 @@ namespace PyTTD {
 	{
 		using funct_type = R(*)(Args...);
 		funct_type func;
-		wrap(funct_type f): func(f) {};
+		CallStats *call_stats;
+		wrap(funct_type f, const char *name): func(f), call_stats(new CallStats(name)) {};
 		py::object operator()(Args&&... args) const
 		{
 			R ret;
@@ -224,8 +440,9 @@ namespace PyTTD {
 	private:
 		using funct_type = R(T:: *)(Args...);
 		funct_type func;
+		CallStats *call_stats;
 	public:
-		wrap(funct_type f): func(f) {};
+		wrap(funct_type f, const char *name): func(f), call_stats(new CallStats(name)) {};
 		py::object operator()(T &self, Args&&... args) const
 		{
 			R ret;
@@ -242,7 +459,8 @@ namespace PyTTD {
 	{
 		using funct_type = void(*)(Args...);
 		funct_type func;
-		wrap(funct_type f): func(f) {};
+		CallStats *call_stats;
+		wrap(funct_type f, const char *name): func(f), call_stats(new CallStats(name)) {};
 		py::object operator()(Args&&... args) const
 		{
 			_WRAP1
@@ -259,8 +477,9 @@ namespace PyTTD {
 	private:
 		using funct_type = void(T:: *)(Args...);
 		funct_type func;
+		CallStats *call_stats;
 	public:
-		wrap(funct_type f): func(f) {};
+		wrap(funct_type f, const char *name): func(f), call_stats(new CallStats(name)) {};
 		py::object operator()(T &self, Args&&... args) const
 		{
 			_WRAP1
@@ -269,6 +488,56 @@ namespace PyTTD {
 			return py::none();
 		}
 	};
+
+	// static getter, see LockGameRO
+	template <typename R, typename... Args>
+	struct wrap_ro
+	{
+		using funct_type = R(*)(Args...);
+		funct_type func;
+		CallStats *call_stats;
+		wrap_ro(funct_type f, const char *name): func(f), call_stats(new CallStats(name)) {};
+		py::object operator()(Args&&... args) const
+		{
+			R ret;
+			_WRAP1_RO
+			ret = func(std::forward<Args>(args)...);
+			_WRAP2_RO
+			return py::cast<const R>((const R)ret);
+		}
+	};
+
+	// static getter that only reads the map or pools, see LockGameShared
+	template <typename R, typename... Args>
+	struct wrap_shared
+	{
+		using funct_type = R(*)(Args...);
+		funct_type func;
+		CallStats *call_stats;
+		wrap_shared(funct_type f, const char *name): func(f), call_stats(new CallStats(name)) {};
+		py::object operator()(Args&&... args) const
+		{
+			R ret;
+			_WRAP1_SHARED
+			ret = func(std::forward<Args>(args)...);
+			_WRAP2_SHARED
+			return py::cast<const R>((const R)ret);
+		}
+	};
+
+	// static, only reads data that can't change while the game runs
+	// (map size, tile coordinates …): no locking at all
+	template <typename R, typename... Args>
+	struct wrap_const
+	{
+		using funct_type = R(*)(Args...);
+		funct_type func;
+		wrap_const(funct_type f): func(f) {};
+		py::object operator()(Args&&... args) const
+		{
+			return py::cast<const R>((const R)func(std::forward<Args>(args)...));
+		}
+	};
 #pragma GCC diagnostic pop
 
 }
@@ -61,6 +61,10 @@
 #include "table/strings.h"
 #include "table/town_land.h"
 
+#ifdef WITH_PYTHON
+#include "python/call_py.hpp"
+#endif
+
 #include "safeguards.h"
 
 /* Initialize the town-pool */
@@ -111,6 +115,10 @@ Town::~Town()
 {
 	if (CleaningPool()) return;
 
+#ifdef WITH_PYTHON
+	PyTTD::MarkTownChanged(this->xy);
+#endif
+
 	/* Delete town authority window
 	 * and remove from list of sorted towns */
 	CloseWindowById(WC_TOWN_VIEW, this->index);
@@ -2032,6 +2040,9 @@ static void DoCreateTown(Town *t, TileIndex tile, uint32_t townnameparts, TownSi
 	t->show_zone = false;
 
 	_town_kdtree.Insert(t->index);
+#ifdef WITH_PYTHON
+	PyTTD::MarkTownChanged(tile);
+#endif
 
 	/* Set the default cargo requirement for town growth */
 	switch (_settings_game.game_creation.landscape) {
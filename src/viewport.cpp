@@ -97,6 +97,10 @@
 #include "table/strings.h"
 #include "table/string_colours.h"
 
+#ifdef WITH_PYTHON
+#include "python/call_py.hpp"
+#endif
+
 #include "safeguards.h"
 
 Point _tile_fract_coords;
@@ -2056,6 +2060,9 @@ void ConstrainAllViewportsZoom()
  */
 void MarkTileDirtyByTile(TileIndex tile, int bridge_level_offset, int tile_height_override)
 {
+#ifdef WITH_PYTHON
+	PyTTD::MarkTileDirty(tile);
+#endif
 	Point pt = RemapCoords(TileX(tile) * TILE_SIZE, TileY(tile) * TILE_SIZE, tile_height_override * TILE_HEIGHT);
 	MarkAllViewportsDirty(
 			pt.x - MAX_TILE_EXTENT_LEFT,